@@ -0,0 +1,276 @@
+"""
+Incremental build runner for the backend ETL scripts.
+
+Stages:
+  - clean_cre, clean_hud_fmr, clean_erap_fmr, clean_fema_declarations, fire_perimeters:
+    raw CSVs -> data/intermediate/
+  - build_canonical_dataframe: cleaned tables -> data/final/
+
+Each stage declares its input and output files, plus optional inputs it uses when present.
+A stage is skipped when its outputs exist and the hashes of its inputs and of its code (its
+module plus every backend module it imports) match the last successful run (recorded in
+data/intermediate/build_manifest.json, with paths relative to the repo root). Stages whose
+inputs are all available run in parallel processes; a stage waits for the stages that write
+its inputs, and is skipped if one of them fails.
+
+Usage:
+  python build.py                 # build whatever is out of date
+  python build.py --force         # rebuild everything
+  python build.py clean_cre       # build one stage (and anything it depends on)
+"""
+
+import argparse
+import ast
+import hashlib
+import importlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import build_canonical_dataframe
+import clean_cre
+import clean_erap_fmr
+import clean_fema_declarations
+import clean_hud_fmr
+import county_index
+import fire_perimeters
+from intermediate import INTERMEDIATE_DIR, intermediate_path
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BACKEND_DIR)
+MANIFEST_PATH = os.path.join(INTERMEDIATE_DIR, "build_manifest.json")
+
+SKIPPED = "skipped (upstream failed)"
+
+STAGES = {
+    "clean_cre": {
+        "entry": "main",
+        "inputs": [clean_cre.CRE_INPUT_PATH],
+        "outputs": [intermediate_path("cre_clean"), intermediate_path("cre_clean", "csv")],
+    },
+    "clean_hud_fmr": {
+        "entry": "main",
+        "inputs": [clean_hud_fmr.FY23_PATH, clean_hud_fmr.FY25_PATH],
+        "outputs": [intermediate_path("hud_fmr_clean"), intermediate_path("hud_fmr_clean", "csv")],
+    },
+    "clean_erap_fmr": {
+        "entry": "main",
+        "inputs": [clean_erap_fmr.ERAP_FMR_PATH],
+        "outputs": [
+            intermediate_path("erap_fmr_clean"),
+            intermediate_path("erap_fmr_clean", "csv"),
+            clean_erap_fmr.ZIP_INDEX_PATH,
+            clean_erap_fmr.ZIP_AREAS_PATH,
+        ],
+    },
+    "clean_fema_declarations": {
+        "entry": "clean_fema_declarations",
+        "inputs": [str(clean_fema_declarations.INPUT_FILE)],
+        "outputs": [intermediate_path("fema_fire_declarations"), intermediate_path("fema_fire_declarations", "csv")],
+    },
+    "fire_perimeters": {
+        "entry": "main",
+        "inputs": [fire_perimeters.PERIMETER_INPUT_PATH],
+        "outputs": [intermediate_path("fire_perimeter_series"), intermediate_path("fire_perimeter_series", "csv")],
+    },
+    "build_canonical_dataframe": {
+        "entry": "main",
+        "inputs": [
+            build_canonical_dataframe.FEMA_INPUT_PATH,
+            build_canonical_dataframe.HUD_FMR_INPUT_PATH,
+            build_canonical_dataframe.CRE_INPUT_PATH,
+        ],
+        # Used if present; the canonical dataset is built without the WatchDuty mapping otherwise
+        "optional_inputs": [build_canonical_dataframe.WATCHDUTY_INPUT_PATH, county_index.COUNTY_BOUNDARIES_PATH],
+        "outputs": [
+            build_canonical_dataframe.OUTPUT_PATH,
+            build_canonical_dataframe.MAPPING_LOG_PATH,
+            build_canonical_dataframe.COVERAGE_SUMMARY_PATH,
+        ],
+    },
+}
+
+
+def file_hash(path):
+    """sha256 of a file's contents, read in 1 MB chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def code_files(name):
+    """A stage's module and the backend modules it imports, directly or through each other (sorted)."""
+    found = set()
+    pending = [name]
+    while pending:
+        module = pending.pop()
+        path = os.path.join(BACKEND_DIR, f"{module}.py")
+        if module in found or not os.path.exists(path):
+            continue  # already seen, or not a backend module (stdlib, pandas, ...)
+        found.add(module)
+        with open(path) as f:
+            tree = ast.parse(f.read(), filename=path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                pending.extend(alias.name.split(".")[0] for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                pending.append(node.module.split(".")[0])
+    return [f"{module}.py" for module in sorted(found)]
+
+
+def manifest_key(path):
+    """A path as recorded in the manifest: relative to the repo root, so a moved checkout stays valid."""
+    return os.path.relpath(os.path.abspath(path), REPO_ROOT).replace(os.sep, "/")
+
+
+def stage_fingerprint(name):
+    """Hashes of a stage's inputs and code, as stored in the manifest."""
+    stage = STAGES[name]
+    optional = stage.get("optional_inputs", [])
+    return {
+        "code": {filename: file_hash(os.path.join(BACKEND_DIR, filename)) for filename in code_files(name)},
+        "inputs": {
+            manifest_key(path): file_hash(path) if os.path.exists(path) else None
+            for path in stage["inputs"] + optional
+        },
+    }
+
+
+def producers():
+    """Map of output path -> name of the stage that writes it."""
+    return {os.path.normpath(path): name for name, stage in STAGES.items() for path in stage["outputs"]}
+
+
+def dependencies(name):
+    """Stages that write any of this stage's inputs."""
+    writers = producers()
+    return {writers[os.path.normpath(path)] for path in STAGES[name]["inputs"] if os.path.normpath(path) in writers}
+
+
+def load_manifest():
+    if not os.path.exists(MANIFEST_PATH):
+        return {}
+    with open(MANIFEST_PATH) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest):
+    os.makedirs(INTERMEDIATE_DIR, exist_ok=True)
+    tmp = MANIFEST_PATH + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, MANIFEST_PATH)
+
+
+def run_stage(name):
+    """Run one stage in a worker process. Returns the elapsed seconds."""
+    sys.path.insert(0, BACKEND_DIR)
+    module = importlib.import_module(name)
+    start = time.perf_counter()
+    getattr(module, STAGES[name]["entry"])()
+    return time.perf_counter() - start
+
+
+def select_stages(targets):
+    """The requested stages plus everything they depend on (all stages if none are requested)."""
+    if not targets:
+        return list(STAGES)
+    selected = set()
+    pending = list(targets)
+    while pending:
+        name = pending.pop()
+        if name not in selected:
+            selected.add(name)
+            pending.extend(dependencies(name))
+    return [name for name in STAGES if name in selected]
+
+
+def build(targets=None, force=False, jobs=None):
+    """
+    Build the requested stages, skipping up-to-date ones and running independent ones in parallel.
+    Returns {stage: status} where status is "built", "up to date", "missing inputs", "failed" or
+    "skipped (upstream failed)".
+    """
+    selected = select_stages(targets)
+    manifest = load_manifest()
+    status = {}
+    timings = {}
+    remaining = set(selected)
+    running = {}
+    fingerprints = {}   # recorded in the manifest only once the stage succeeds
+
+    with ProcessPoolExecutor(max_workers=jobs or len(selected)) as pool:
+        while remaining or running:
+            # Start every stage whose dependencies have all finished
+            for name in [n for n in selected if n in remaining]:
+                deps = dependencies(name) & set(selected)
+                if any(d in remaining or d in running.values() for d in deps):
+                    continue
+                remaining.discard(name)
+                if any(status.get(d) in ("failed", SKIPPED) for d in deps):
+                    print(f"[{name}] {SKIPPED}")
+                    status[name] = SKIPPED
+                    continue
+                if any(status.get(d) == "missing inputs" for d in deps):
+                    status[name] = "missing inputs"
+                    continue
+                missing = [path for path in STAGES[name]["inputs"] if not os.path.exists(path)]
+                if missing:
+                    print(f"[{name}] missing inputs: {', '.join(missing)}")
+                    status[name] = "missing inputs"
+                    continue
+                fingerprint = stage_fingerprint(name)
+                outputs_exist = all(os.path.exists(path) for path in STAGES[name]["outputs"])
+                if not force and outputs_exist and manifest.get(name) == fingerprint:
+                    print(f"[{name}] up to date")
+                    status[name] = "up to date"
+                    continue
+                print(f"[{name}] building...")
+                running[pool.submit(run_stage, name)] = name
+                fingerprints[name] = fingerprint
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    timings[name] = future.result()
+                    status[name] = "built"
+                    manifest[name] = fingerprints[name]
+                except Exception as e:
+                    print(f"[{name}] failed: {e}")
+                    status[name] = "failed"
+                    manifest.pop(name, None)
+                save_manifest(manifest)
+
+    print("\n" + "=" * 80)
+    print("Build summary")
+    print("=" * 80)
+    for name in selected:
+        timing = f" in {timings[name]:.2f}s" if name in timings else ""
+        print(f"  {name:<28} {status[name]}{timing}")
+    return status
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the backend datasets, skipping up-to-date stages")
+    parser.add_argument("stages", nargs="*", help=f"stages to build (default: all of {', '.join(STAGES)})")
+    parser.add_argument("--force", action="store_true", help="rebuild even if inputs and code are unchanged")
+    parser.add_argument("--jobs", type=int, default=None, help="max stages to run at once")
+    args = parser.parse_args()
+    unknown = [name for name in args.stages if name not in STAGES]
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)}")
+
+    status = build(args.stages, force=args.force, jobs=args.jobs)
+    if any(s in ("failed", SKIPPED) for s in status.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,98 +3,104 @@ Build canonical recovery dataset by joining multiple data sources.
 
 Input:
   - WatchDuty cleaned data (geo_events_geoevent table)
-  - FEMA Disaster Declarations
+  - County boundaries (to place WatchDuty events in a county)
+  - FEMA fire declarations (cleaned by clean_fema_declarations.py)
   - HUD FMR data
   - CRE data
 
 Join Logic:
-  - Join on County (normalized)
+  - Join on County (FIPS; normalized name for CRE)
+  - HUD FMR is reduced to one row per county first: the latest year, with rents averaged over the
+    county's FMR subdivisions (New England towns), so the join keeps one row per FEMA declaration
   - Overlapping date windows
   - Explicitly document WatchDuty-to-FEMA mappings
   - Document cases with no FEMA declaration
 
 Output:
   data/final/canonical_recovery_dataset.csv
+  data/final/watchduty_fema_mapping.csv (one row per event/declaration match, plus unmatched events)
+  data/final/declaration_coverage_summary.csv
 
 BIG NOTE: NEED TO ADD GINA RESULT'S HERE LATER
 """
 
+import numpy as np
 import pandas as pd
 import os
-from datetime import datetime, timedelta
+from datetime import timedelta
 import json
 
-# Define input and output paths
-DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
-INTERMEDIATE_DIR = os.path.join(DATA_DIR, "intermediate")
-FINAL_DIR = os.path.join(DATA_DIR, "final")
+from canonical_dataset import (COVERAGE_SUMMARY_PATH, FINAL_DIR, MAPPING_LOG_PATH, OUTPUT_PATH,
+                               normalize_county_name)
+from county_index import COUNTY_BOUNDARIES_PATH, CountyIndex
+from intermediate import DATA_DIR, intermediate_path, read_intermediate, zero_pad
 
-WATCHDUTY_INPUT_PATH = os.path.join(DATA_DIR, "watch_duty_data.md")  # Will be parsed from raw data
-FEMA_INPUT_PATH = os.path.join(DATA_DIR, "DisasterDeclarationsSummaries.csv")
-HUD_FMR_INPUT_PATH = os.path.join(INTERMEDIATE_DIR, "hud_fmr_clean.csv")
-CRE_INPUT_PATH = os.path.join(INTERMEDIATE_DIR, "cre_clean.csv")
+# Define input paths (outputs are in canonical_dataset.py, shared with the API)
+WATCHDUTY_INPUT_PATH = os.path.join(DATA_DIR, "geo_events_geoevent.csv")  # WatchDuty export, see watch_duty_data.md
+FEMA_INPUT_PATH = intermediate_path("fema_fire_declarations")
+HUD_FMR_INPUT_PATH = intermediate_path("hud_fmr_clean")
+CRE_INPUT_PATH = intermediate_path("cre_clean")
 
-OUTPUT_PATH = os.path.join(FINAL_DIR, "canonical_recovery_dataset.csv")
-MAPPING_LOG_PATH = os.path.join(FINAL_DIR, "watchduty_fema_mapping.csv")
+MAPPING_COLUMNS = [
+    "geo_event_id", "name", "fips", "event_date", "fema_declaration_id", "fema_disaster_number",
+    "declaration_type", "window_start", "window_end", "match_status",
+]
 
 # Create final directory if it doesn't exist
 os.makedirs(FINAL_DIR, exist_ok=True)
 
 
-def normalize_county_name(county_name):
-    """Normalize county name for consistent joining."""
-    if pd.isna(county_name):
-        return None
-    return str(county_name).strip().lower().replace(" county", "").replace(" parish", "")
-
-
 def load_fema_data():
-    """Load and process FEMA Disaster Declarations data."""
-    print("Loading FEMA Disaster Declarations...")
-    df = pd.read_csv(FEMA_INPUT_PATH)
-    
-    # Select relevant columns
-    fema_cols = [
-        "femaDeclarationString",
-        "disasterNumber",
-        "state",
-        "declarationType",
-        "declarationDate",
-        "incidentType",
-        "declarationTitle",
-        "incidentBeginDate",
-        "incidentEndDate",
-        "fipsStateCode",
-        "fipsCountyCode",
-        "designatedArea",
-    ]
-    
-    df = df[fema_cols].copy()
-    
-    # Parse dates
-    df["declarationDate"] = pd.to_datetime(df["declarationDate"], errors="coerce")
-    df["incidentBeginDate"] = pd.to_datetime(df["incidentBeginDate"], errors="coerce")
-    df["incidentEndDate"] = pd.to_datetime(df["incidentEndDate"], errors="coerce")
+    """
+    Load the cleaned FEMA fire declarations (typed dates and zero-padded FIPS, see intermediate.py)
+    and add the county name the CRE data is joined on.
+    """
+    print("Loading FEMA fire declarations...")
+    df = read_intermediate("fema_fire_declarations", columns=[
+        "fema_declaration_id",
+        "fema_disaster_number",
+        "state_abbrev",
+        "designated_area",
+        "declaration_type",
+        "incident_type",
+        "incident_title",
+        "fips",
+        "declaration_date",
+        "incident_begin_date",
+        "incident_end_date",
+    ])
+    if df is None:
+        raise FileNotFoundError(f"{FEMA_INPUT_PATH} not found; run clean_fema_declarations.py first")
     
-    # Extract county name from designatedArea (e.g., "Washington (County)" -> "Washington")
-    df["county_name"] = df["designatedArea"].str.extract(r"^([^(]+)")[0].str.strip()
+    # Extract county name from designated_area (e.g., "Washington (County)" -> "Washington")
+    df["county_name"] = df["designated_area"].str.extract(r"^([^(]+)")[0].str.strip()
     df["county_name_normalized"] = df["county_name"].apply(normalize_county_name)
-    
-    # Ensure FIPS county code is zero-padded
-    df["fipsCountyCode"] = df["fipsCountyCode"].astype(str).str.zfill(3)
-    df["fips"] = df["fipsStateCode"].astype(str).str.zfill(2) + df["fipsCountyCode"]
-    
     return df
 
 
 def load_hud_fmr_data():
-    """Load HUD FMR cleaned data."""
+    """
+    Load HUD FMR cleaned data as one row per county, keyed by 5-digit state + county FIPS like the
+    FEMA data. The cleaned table has a row per FMR area per year (several per county in New England),
+    so keep each county's latest year and average the rents over its areas.
+    """
     print("Loading HUD FMR data...")
-    if not os.path.exists(HUD_FMR_INPUT_PATH):
-        print(f"Warning: HUD FMR data not found at {HUD_FMR_INPUT_PATH}")
+    df = read_intermediate(
+        "hud_fmr_clean", columns=["county_fips", "countyname", "fmr_1", "fmr_2", "avg_fmr", "year"]
+    )
+    if df is None:
         return None
     
-    df = pd.read_csv(HUD_FMR_INPUT_PATH)
+    df = df.rename(columns={"county_fips": "fips"})
+    df = df[df["year"] == df.groupby("fips")["year"].transform("max")]
+    df = df.groupby("fips", as_index=False).agg(
+        countyname=("countyname", "first"),
+        fmr_1=("fmr_1", "mean"),
+        fmr_2=("fmr_2", "mean"),
+        avg_fmr=("avg_fmr", "mean"),
+        year=("year", "first"),
+    )
+    df["avg_fmr"] = df["avg_fmr"].round(2)
     df["county_name_normalized"] = df["countyname"].apply(normalize_county_name)
     return df
 
@@ -102,39 +108,126 @@ def load_hud_fmr_data():
 def load_cre_data():
     """Load CRE cleaned data."""
     print("Loading CRE data...")
-    if not os.path.exists(CRE_INPUT_PATH):
-        print(f"Warning: CRE data not found at {CRE_INPUT_PATH}")
+    df = read_intermediate(
+        "cre_clean", columns=["county_name", "state_abbrev", "pct_low_vulnerability", "pct_high_vulnerability"]
+    )
+    if df is None:
         return None
     
-    df = pd.read_csv(CRE_INPUT_PATH)
     df["county_name_normalized"] = df["county_name"].apply(normalize_county_name)
     return df
 
 
-def match_watchduty_to_fema(watchduty_date, fema_begin, fema_end, fema_declaration_date):
+def load_watchduty_events():
     """
-    Check if a WatchDuty event overlaps with a FEMA declaration date window.
-    Returns True if WatchDuty event date falls within the incident or declaration window.
+    Load WatchDuty wildfire geoevents with the columns the FEMA matching needs:
+    geo_event_id, name, fips, event_date. The county FIPS is looked up from lat/lng in the
+    county boundary file (see county_index.py). Returns None if the export or the boundary
+    file isn't present.
     """
-    if pd.isna(watchduty_date):
-        return False
-    
-    # Check against incident date range (prefer this over declaration date)
-    if pd.notna(fema_begin):
-        # Allow 30 days before incident start for early warnings
-        start_window = fema_begin - timedelta(days=30)
-        if pd.notna(fema_end):
-            end_window = fema_end + timedelta(days=7)  # 7 days after incident end
-        else:
-            end_window = datetime.now()
-        
-        return start_window <= watchduty_date <= end_window
-    
-    # Fall back to declaration date
-    if pd.notna(fema_declaration_date):
-        return watchduty_date >= fema_declaration_date - timedelta(days=7)
-    
-    return False
+    if not os.path.exists(WATCHDUTY_INPUT_PATH):
+        print(f"Warning: WatchDuty geoevents not found at {WATCHDUTY_INPUT_PATH}")
+        return None
+    print("Loading WatchDuty geoevents...")
+    df = pd.read_csv(WATCHDUTY_INPUT_PATH)
+    df = df[df["geo_event_type"] == "wildfire"]
+
+    if "fips" not in df.columns:
+        if not os.path.exists(COUNTY_BOUNDARIES_PATH):
+            print(f"Warning: county boundaries not found at {COUNTY_BOUNDARIES_PATH}, skipping the FEMA mapping")
+            return None
+        print("Assigning county FIPS to WatchDuty events...")
+        index = CountyIndex.from_geojson(COUNTY_BOUNDARIES_PATH)
+        df = df.assign(fips=index.lookup(df["lng"], df["lat"]))
+        print(f"  {df['fips'].notna().sum()} of {len(df)} events fall inside a county")
+
+    return pd.DataFrame({
+        "geo_event_id": df["id"],
+        "name": df["name"],
+        "fips": zero_pad(df["fips"], 5),
+        "event_date": _naive_utc(df["date_created"]),
+    }).reset_index(drop=True)
+
+
+def _naive_utc(values):
+    """Parse to datetime64 in tz-naive UTC, so FEMA and WatchDuty dates compare directly."""
+    values = pd.to_datetime(values, errors="coerce", utc=True, format="ISO8601")
+    return values.dt.tz_localize(None)
+
+
+def fema_match_windows(fema_df):
+    """
+    Date window in which a WatchDuty event matches each FEMA declaration:
+      - [incident begin - 30 days, incident end + 7 days], open-ended (NaT end) if the incident
+        hasn't ended
+      - [declaration date - 7 days, open-ended] if there is no incident begin date
+      - NaT start if neither date is known (never matches)
+    Returns (window_start, window_end) Series aligned with fema_df.
+    """
+    begin = _naive_utc(fema_df["incident_begin_date"])
+    end = _naive_utc(fema_df["incident_end_date"])
+    declared = _naive_utc(fema_df["declaration_date"])
+
+    window_start = (begin - timedelta(days=30)).where(begin.notna(), declared - timedelta(days=7))
+    window_end = (end + timedelta(days=7)).where(begin.notna())
+    return window_start, window_end
+
+
+def match_watchduty_to_fema(events, fema_df):
+    """
+    Interval join of WatchDuty events (geo_event_id, fips, event_date, ...) to the FEMA
+    declarations whose window (see fema_match_windows) contains the event date, in the same county.
+
+    Windows are sorted by (county, start) so each event finds its county's windows that start on
+    or before the event with one searchsorted; each of those candidates is then checked against
+    the window end. Returns one row per (event, declaration) match, plus a row with empty FEMA fields
+    and match_status "no_fema_declaration" for each event that matched nothing.
+    """
+    window_start, window_end = fema_match_windows(fema_df)
+    usable = (window_start.notna() & fema_df["fips"].notna()).to_numpy()
+    windows = fema_df.loc[usable, ["fema_declaration_id", "fema_disaster_number", "declaration_type", "fips"]]
+    windows = windows.assign(window_start=window_start[usable], window_end=window_end[usable])
+
+    # Integer county codes shared by both sides; events in a county with no declaration get -1
+    counties = pd.Index(windows["fips"].unique())
+    w_county = counties.get_indexer(windows["fips"])
+    e_county = counties.get_indexer(events["fips"].astype(object).where(events["fips"].notna(), None))
+
+    # Seconds since the earliest window start (open-ended windows end far in the future); a (county,
+    # start) pair packs into one sortable int64
+    base = windows["window_start"].min() if len(windows) else pd.Timestamp(0)
+    w_start = ((windows["window_start"] - base) // pd.Timedelta(seconds=1)).to_numpy(dtype="int64")
+    w_end = ((windows["window_end"] - base) // pd.Timedelta(seconds=1)).fillna(1 << 62).to_numpy(dtype="int64")
+    e_date = events["event_date"]
+    e_seconds = ((e_date - base) // pd.Timedelta(seconds=1)).fillna(-1).to_numpy(dtype="int64")
+
+    span = 1 << 34  # ~540 years of seconds per county
+    order = np.lexsort((w_start, w_county))
+    w_key = w_county[order] * span + w_start[order]
+    lo = np.searchsorted(w_key, e_county * span, side="left")
+    hi = np.searchsorted(w_key, e_county * span + np.clip(e_seconds, 0, span - 1), side="right")
+    hi = np.where((e_county < 0) | e_date.isna().to_numpy(), lo, hi)
+
+    # Expand each event into its candidate windows, then keep the ones that contain the event date
+    counts = hi - lo
+    event_idx = np.repeat(np.arange(len(events)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    window_idx = order[np.repeat(lo, counts) + offsets]
+    contains = (w_start[window_idx] <= e_seconds[event_idx]) & (w_end[window_idx] >= e_seconds[event_idx])
+    event_idx, window_idx = event_idx[contains], window_idx[contains]
+
+    matched = pd.concat([
+        events.iloc[event_idx].reset_index(drop=True),
+        windows.drop(columns=["fips"]).iloc[window_idx].reset_index(drop=True),
+    ], axis=1)
+    matched["match_status"] = "matched"
+
+    unmatched = events[~np.isin(np.arange(len(events)), event_idx)].copy()
+    unmatched["match_status"] = "no_fema_declaration"
+
+    mapping = pd.concat([matched, unmatched], ignore_index=True)
+    mapping["fema_disaster_number"] = mapping["fema_disaster_number"].astype("Int64")  # stays integer beside NaN
+    return mapping.sort_values(["geo_event_id", "window_start"]).reset_index(drop=True)
 
 
 def build_canonical_dataset():
@@ -154,11 +247,21 @@ def build_canonical_dataset():
     if cre_df is not None:
         print(f"Loaded {len(cre_df)} CRE records")
     
+    # Match WatchDuty events to the declarations covering them
+    events = load_watchduty_events()
+    if events is not None:
+        print(f"\nMatching {len(events)} WatchDuty events to FEMA declarations...")
+        mapping_df = match_watchduty_to_fema(events, fema_df)
+        print(f"  {mapping_df['geo_event_id'][mapping_df['match_status'] == 'matched'].nunique()} events "
+              f"matched, {(mapping_df['match_status'] == 'no_fema_declaration').sum()} without a declaration")
+    else:
+        mapping_df = pd.DataFrame(columns=MAPPING_COLUMNS)
+    
     # Start with FEMA data as the base
     print("\nJoining HUD FMR data on county and state...")
     if hud_df is not None:
         fema_df = fema_df.merge(
-            hud_df[["fips", "county_name_normalized", "state_abbrev", "fmr_1", "fmr_2", "avg_fmr", "year"]],
+            hud_df[["fips", "county_name_normalized", "fmr_1", "fmr_2", "avg_fmr", "year"]],
             on=["fips"],
             how="left",
             suffixes=("", "_hud")
@@ -168,24 +271,13 @@ def build_canonical_dataset():
     if cre_df is not None:
         fema_df = fema_df.merge(
             cre_df[["county_name_normalized", "state_abbrev", "pct_low_vulnerability", "pct_high_vulnerability"]],
-            left_on=["county_name_normalized", "state"],
-            right_on=["county_name_normalized", "state_abbrev"],
+            on=["county_name_normalized", "state_abbrev"],
             how="left",
             suffixes=("", "_cre")
         )
     
     # Rename columns for clarity
-    fema_df.rename(columns={
-        "femaDeclarationString": "fema_declaration_id",
-        "disasterNumber": "fema_disaster_number",
-        "state": "state_abbrev",
-        "declarationType": "declaration_type",
-        "declarationDate": "fema_declaration_date",
-        "incidentType": "incident_type",
-        "declarationTitle": "incident_title",
-        "incidentBeginDate": "incident_begin_date",
-        "incidentEndDate": "incident_end_date",
-    }, inplace=True)
+    fema_df.rename(columns={"declaration_date": "fema_declaration_date"}, inplace=True)
     
     # Select final columns
     final_columns = [
@@ -216,18 +308,21 @@ def build_canonical_dataset():
         by=["state_abbrev", "county_name", "incident_begin_date"]
     ).reset_index(drop=True)
     
-    return df_canonical
+    return df_canonical, mapping_df[MAPPING_COLUMNS]
 
 
-def save_canonical_dataset(df):
-    """Save the canonical dataset and generate mapping documentation."""
+def save_canonical_dataset(df, mapping_df):
+    """Save the canonical dataset, the WatchDuty-to-FEMA mapping and a data coverage summary."""
     print(f"\nSaving canonical dataset to {OUTPUT_PATH}...")
     df.to_csv(OUTPUT_PATH, index=False)
     
-    # Generate mapping summary
-    print(f"Saving WatchDuty-to-FEMA mapping documentation to {MAPPING_LOG_PATH}...")
+    print(f"Saving WatchDuty-to-FEMA mapping to {MAPPING_LOG_PATH}...")
+    mapping_df.to_csv(MAPPING_LOG_PATH, index=False)
+    
+    # Generate coverage summary
+    print(f"Saving declaration coverage summary to {COVERAGE_SUMMARY_PATH}...")
     
-    # Create mapping summary
+    # Create coverage summary
     mapping_summary = []
     
     # Count declarations with different incident types
@@ -241,17 +336,16 @@ def save_canonical_dataset(df):
                 "has_cre_data": (df[df["incident_type"] == incident_type]["pct_low_vulnerability"].notna()).sum(),
             })
     
-    mapping_df = pd.DataFrame(mapping_summary)
-    mapping_df.to_csv(MAPPING_LOG_PATH, index=False)
+    pd.DataFrame(mapping_summary).to_csv(COVERAGE_SUMMARY_PATH, index=False)
 
 
 def main():
     """Main function."""
     # Build the canonical dataset
-    df_canonical = build_canonical_dataset()
+    df_canonical, mapping_df = build_canonical_dataset()
     
     # Save results
-    save_canonical_dataset(df_canonical)
+    save_canonical_dataset(df_canonical, mapping_df)
     
     print("\n" + "="*80)
     print("Success! Canonical dataset created")
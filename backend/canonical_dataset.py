@@ -0,0 +1,22 @@
+"""
+Where the canonical recovery dataset lives, and the county-name normalization it is joined on.
+
+build_canonical_dataframe.py writes these files; the API (routes/county.py) reads them. This module
+imports nothing beyond os and creates no directories, so the server can use it without loading the
+build pipeline.
+"""
+
+import os
+
+FINAL_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "final")
+
+OUTPUT_PATH = os.path.join(FINAL_DIR, "canonical_recovery_dataset.csv")
+MAPPING_LOG_PATH = os.path.join(FINAL_DIR, "watchduty_fema_mapping.csv")
+COVERAGE_SUMMARY_PATH = os.path.join(FINAL_DIR, "declaration_coverage_summary.csv")
+
+
+def normalize_county_name(county_name):
+    """Normalize county name for consistent joining (None for missing values: None, NaN, pd.NA)."""
+    if not isinstance(county_name, str):
+        return None
+    return county_name.strip().lower().replace(" county", "").replace(" parish", "")
@@ -3,26 +3,23 @@ Clean and normalize Community Resilience Estimates (CRE) data.
 
 Input: Community Resilience Estimates data
 Tasks:
-  - Normalize county name and derive FIPS code
+  - Split the "County, State" name into county name, state name and state abbreviation
+    (the CRE file carries no FIPS code; the canonical build joins it on state + normalized county name)
   - Compute vulnerability percentages:
     * % low vulnerability (0 components)
     * % high vulnerability (3+ components)
   - Keep margins of error separate (optional)
-Output: data/intermediate/cre_clean.csv
+Output: data/intermediate/cre_clean.parquet (typed, see intermediate.py) and cre_clean.csv export
 """
 
 import pandas as pd
 import os
-import re
+
+from intermediate import DATA_DIR, intermediate_path, write_intermediate
 
 # Define input and output paths
-DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
-INTERMEDIATE_DIR = os.path.join(DATA_DIR, "intermediate")
 CRE_INPUT_PATH = os.path.join(DATA_DIR, "CRE2023.CRE-2026-01-14T202326.csv")
-OUTPUT_PATH = os.path.join(INTERMEDIATE_DIR, "cre_clean.csv")
-
-# Create intermediate directory if it doesn't exist
-os.makedirs(INTERMEDIATE_DIR, exist_ok=True)
+OUTPUT_PATH = intermediate_path("cre_clean")
 
 # Mapping of state names to state abbreviations
 STATE_ABBREV = {
@@ -40,73 +37,52 @@ STATE_ABBREV = {
 }
 
 
-def parse_percentage(value):
-    """Convert percentage string to float (e.g., '25.59%' -> 25.59)."""
-    if isinstance(value, str):
-        return float(value.strip("%"))
-    return value
+def load_cre_table():
+    """
+    Load the full CRE table with typed columns, named by their CRE variable codes:
+      - name, county_name, state_name, state_abbrev (state columns categorical)
+      - popuni and the *_e / *_m estimates and margins of error as integers
+      - the *_pe / *_pm percentages and their margins of error as floats (25.59% -> 25.59)
+    """
+    print("Loading CRE data...")
+    # thousands="," parses counts like "9,580,929" in the C reader
+    df = pd.read_csv(CRE_INPUT_PATH, thousands=",")
+
+    # "Percent, 0 components of social vulnerability (PRED0_PE)" -> "pred0_pe"
+    df.columns = df.columns.str.extract(r"\((\w+)\)\s*$", expand=False).str.lower()
 
+    # Strip "%" from every percent column at once
+    percent_columns = [col for col in df.columns if col.endswith(("_pe", "_pm"))]
+    df[percent_columns] = df[percent_columns].apply(lambda col: pd.to_numeric(col.str.rstrip("%")))
 
-def extract_county_and_state(geographic_name):
-    """Extract county name and state from geographic area name."""
+    # Extract county and state information
     # Expected format: "County Name, State Name"
-    parts = geographic_name.rsplit(", ", 1)
-    if len(parts) == 2:
-        county_name = parts[0].strip()
-        state_name = parts[1].strip()
-        state_abbrev = STATE_ABBREV.get(state_name, None)
-        return county_name, state_abbrev, state_name
-    return None, None, None
+    print("Extracting and normalizing county and state information...")
+    parts = df["name"].str.rsplit(", ", n=1, expand=True)
+    df["county_name"] = parts[0].str.strip()
+    df["state_name"] = parts[1].str.strip().astype("category")
+    # Mapping a categorical only looks up each of the ~50 distinct states once
+    df["state_abbrev"] = df["state_name"].map(STATE_ABBREV)
+    return df
 
 
 def load_and_process_cre_data():
     """Load, process, and normalize CRE data."""
-    
-    print("Loading CRE data...")
-    df = pd.read_csv(CRE_INPUT_PATH)
-    
-    # Rename the geographic column for easier access
-    df.rename(columns={"Geographic Area Name (NAME)": "geographic_area"}, inplace=True)
-    
-    # Extract county and state information
-    print("Extracting and normalizing county and state information...")
-    df[["county_name", "state_abbrev", "state_name"]] = df["geographic_area"].apply(
-        lambda x: pd.Series(extract_county_and_state(x))
-    )
-    
-    # Parse percentage columns
-    percent_columns = [col for col in df.columns if "Percent," in col and "_PE)" in col]
-    for col in percent_columns:
-        df[col] = df[col].apply(parse_percentage)
-    
+    df = load_cre_table()
+
     # Extract vulnerability percentages
     # PRED0_PE = 0 components (low vulnerability)
     # PRED3_PE = 3+ components (high vulnerability)
-    low_vuln_col = "Percent, 0 components of social vulnerability (PRED0_PE)"
-    high_vuln_col = "Percent, 3+ components of social vulnerability (PRED3_PE)"
-    low_vuln_moe_col = "Percent margin of error, 0 components of social vulnerability (PRED0_PM)"
-    high_vuln_moe_col = "Percent margin of error, 3+ components of social vulnerability (PRED3_PM)"
-    
-    # Rename for clarity
-    df["pct_low_vulnerability"] = df[low_vuln_col]
-    df["pct_high_vulnerability"] = df[high_vuln_col]
-    df["pct_low_vulnerability_moe"] = df[low_vuln_moe_col].apply(parse_percentage)
-    df["pct_high_vulnerability_moe"] = df[high_vuln_moe_col].apply(parse_percentage)
-    
-    # Select final columns
-    df_clean = df[[
-        "county_name",
-        "state_abbrev",
-        "state_name",
-        "pct_low_vulnerability",
-        "pct_high_vulnerability",
-        "pct_low_vulnerability_moe",
-        "pct_high_vulnerability_moe"
-    ]].copy()
-    
+    # Plain strings again, so sorting is alphabetical rather than by category order
+    df_clean = df[["county_name", "state_abbrev", "state_name"]].astype(object)
+    df_clean["pct_low_vulnerability"] = df["pred0_pe"]
+    df_clean["pct_high_vulnerability"] = df["pred3_pe"]
+    df_clean["pct_low_vulnerability_moe"] = df["pred0_pm"]
+    df_clean["pct_high_vulnerability_moe"] = df["pred3_pm"]
+
     # Sort by state and county
     df_clean = df_clean.sort_values(by=["state_abbrev", "county_name"]).reset_index(drop=True)
-    
+
     return df_clean
 
 
@@ -117,9 +93,9 @@ def main():
     # Load and process data
     df_clean = load_and_process_cre_data()
     
-    # Save to CSV
+    # Save as typed Parquet (plus a CSV export)
     print(f"Saving cleaned data to {OUTPUT_PATH}...")
-    df_clean.to_csv(OUTPUT_PATH, index=False)
+    write_intermediate(df_clean, "cre_clean")
     
     print(f"Success! Cleaned data saved with {len(df_clean)} rows")
     print("\nFirst few rows:")
@@ -0,0 +1,107 @@
+"""
+Clean the HUD ERAP (Emergency Rental Assistance) ZIP-level Fair Market Rents and build a ZIP index.
+
+Input: data/fy2023_erap_fmrs_revised.csv (one row per ZIP Code and HUD FMR area, rents as "$1,006" strings)
+Tasks:
+  - Normalize column names (the ZIP header spans two lines: "ZIP\\nCode") and zero-pad ZIP codes
+    (non-metro county rows carry the placeholder ZIP 99999, which becomes missing)
+  - Parse the 0-4 bedroom rents into integers
+  - Write a compact binary index sorted by ZIP (a ZIP can belong to several FMR areas) that
+    routes/rent.py loads once (through erap_fmr_index.py) and searches with bisect, without pandas
+Output:
+  data/intermediate/erap_fmr_clean.parquet (typed, see intermediate.py) and CSV export
+  data/intermediate/erap_fmr_zip_index.npy (structured array: zip, area, fmr[5])
+  data/intermediate/erap_fmr_areas.json (FMR area name and CBSA code per area number)
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from erap_fmr_index import ZIP_AREAS_PATH, ZIP_INDEX_PATH
+from intermediate import DATA_DIR, INTERMEDIATE_DIR, intermediate_path, write_intermediate, zero_pad
+
+# Define input and output paths
+ERAP_FMR_PATH = os.path.join(DATA_DIR, "fy2023_erap_fmrs_revised.csv")
+OUTPUT_PATH = intermediate_path("erap_fmr_clean")
+
+YEAR = 2023
+BEDROOM_COLUMNS = [f"fmr_br{n}" for n in range(5)]
+PLACEHOLDER_ZIP = "99999"
+
+# One index row per (ZIP, FMR area); rents fit in uint16 (FY2023 max is $6,420)
+ZIP_INDEX_DTYPE = np.dtype([("zip", "<u4"), ("area", "<u2"), ("fmr", "<u2", (len(BEDROOM_COLUMNS),))])
+
+
+def parse_dollars(series):
+    """'$1,006' -> 1006 (nullable integer, missing for blanks)."""
+    text = series.astype("string").str.replace(r"[$,\s]", "", regex=True)
+    return pd.to_numeric(text, errors="coerce").round().astype("Int32")
+
+
+def load_and_process_erap_fmr_data(path=ERAP_FMR_PATH):
+    """Load the ERAP FMR file and return one typed row per (ZIP, FMR area), sorted by ZIP (missing last)."""
+    print("Loading FY2023 ERAP FMR data...")
+    df = pd.read_csv(path, dtype=str, encoding="utf-8-sig")
+
+    # Collapse whitespace in headers ("ZIP\nCode" -> "ZIP Code") before renaming
+    df.columns = [" ".join(col.split()) for col in df.columns]
+    df = df.rename(columns={
+        "HUD Metro Fair Market Rent Area Name": "area_name",
+        "CBSASub23": "cbsa",
+        "ZIP Code": "zip",
+        **{f"erap_fmr_br{n}": f"fmr_br{n}" for n in range(5)},
+    })
+
+    # Non-metro county areas list ZIP 99999 as a placeholder; keep their rents, without a ZIP
+    df["zip"] = zero_pad(df["zip"], 5)
+    df.loc[df["zip"] == PLACEHOLDER_ZIP, "zip"] = pd.NA
+    for col in BEDROOM_COLUMNS:
+        df[col] = parse_dollars(df[col])
+    df["year"] = YEAR
+
+    df = df.sort_values(by=["zip", "cbsa"], na_position="last").reset_index(drop=True)
+    return df[["zip", "area_name", "cbsa", *BEDROOM_COLUMNS, "year"]]
+
+
+def write_zip_index(df, index_path=ZIP_INDEX_PATH, areas_path=ZIP_AREAS_PATH):
+    """Write the ZIP index (rows sorted by ZIP) and its area table. Missing rents are stored as 0."""
+    df = df[df["zip"].notna()]
+    area_codes, areas = pd.factorize(pd.MultiIndex.from_frame(df[["area_name", "cbsa"]]))
+    index = np.zeros(len(df), dtype=ZIP_INDEX_DTYPE)
+    index["zip"] = df["zip"].astype(int).to_numpy()
+    index["area"] = area_codes
+    index["fmr"] = df[BEDROOM_COLUMNS].fillna(0).to_numpy(dtype=np.uint16)
+    index = index[np.argsort(index["zip"], kind="stable")]
+
+    os.makedirs(INTERMEDIATE_DIR, exist_ok=True)
+    np.save(index_path, index)
+    with open(areas_path, "w") as f:
+        json.dump({"year": YEAR, "areas": [[name, cbsa] for name, cbsa in areas]}, f)
+    return index
+
+
+def main():
+    """Main function to clean the ERAP FMR data and build the ZIP index."""
+    print("Starting ERAP FMR data cleaning...")
+
+    # Load and process data
+    df_clean = load_and_process_erap_fmr_data()
+
+    # Save as typed Parquet (plus a CSV export), then the binary ZIP index
+    print(f"Saving cleaned data to {OUTPUT_PATH}...")
+    write_intermediate(df_clean, "erap_fmr_clean")
+    print(f"Saving ZIP index to {ZIP_INDEX_PATH}...")
+    index = write_zip_index(df_clean)
+
+    print(f"Success! {len(df_clean)} rows for {df_clean['zip'].nunique()} ZIP codes")
+    print(f"  Non-metro county rows without a ZIP: {df_clean['zip'].isna().sum()}")
+    shared = df_clean["zip"].duplicated(keep=False)
+    print(f"  ZIP codes in more than one FMR area: {df_clean.loc[shared, 'zip'].nunique()}")
+    print(f"  Index size: {index.nbytes:,} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,14 +2,12 @@ import pandas as pd
 from pathlib import Path
 from datetime import datetime
 
+from intermediate import intermediate_path, write_intermediate, zero_pad
+
 # Define paths
 DATA_DIR = Path(__file__).parent.parent / "data"
 INPUT_FILE = DATA_DIR / "DisasterDeclarationsSummaries.csv"
-OUTPUT_DIR = DATA_DIR / "intermediate"
-OUTPUT_FILE = OUTPUT_DIR / "fema_fire_declarations.csv"
-
-# Create output directory if it doesn't exist
-OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+OUTPUT_FILE = Path(intermediate_path("fema_fire_declarations"))
 
 def clean_fema_declarations():
     """
@@ -18,6 +16,7 @@ def clean_fema_declarations():
     - Normalize date columns
     - Create recovery_start_date
     - Keep relevant columns
+    Writes typed Parquet (see intermediate.py) plus a CSV export.
     """
     
     # Read the CSV file
@@ -26,20 +25,36 @@ def clean_fema_declarations():
     # Filter to Fire incidents only
     df = df[df["incidentType"] == "Fire"].copy()
     
-    # Normalize date columns to YYYY-MM-DD format
+    # Normalize date columns to dates (midnight timestamps; the CSV export writes YYYY-MM-DD)
     date_columns = ["incidentBeginDate", "incidentEndDate", "declarationDate"]
     for col in date_columns:
         if col in df.columns:
             # Parse ISO format datetime and convert to date only
-            df[col] = pd.to_datetime(df[col], utc=True).dt.strftime("%Y-%m-%d")
+            df[col] = pd.to_datetime(df[col], utc=True).dt.tz_localize(None).dt.normalize()
+
+    # Zero-pad FIPS codes: 3-digit county code, and the 5-digit state + county code used for joins
+    df["fipsCountyCode"] = zero_pad(df["fipsCountyCode"], 3)
+    df["fips"] = zero_pad(df["fipsStateCode"], 2) + df["fipsCountyCode"]
+
+    # Program flags come through as 0/1 or True/False depending on the export
+    for col in ["iaProgramDeclared", "paProgramDeclared", "hmProgramDeclared"]:
+        df[col] = df[col].astype(str).str.strip().str.lower().isin(["1", "true"])
     
     # Create recovery_start_date from declarationDate
     df["recovery_start_date"] = df["declarationDate"]
     
     # Select relevant columns
-    # Columns to keep: declarationType, county FIPS (fipsCountyCode), programs (IA, PA, HMGP)
+    # Columns to keep: declaration identifiers and titles (for the canonical dataset), declarationType,
+    # county FIPS (fipsCountyCode), programs (IA, PA, HMGP)
     columns_to_keep = [
+        "femaDeclarationString",
+        "disasterNumber",
+        "state",
+        "designatedArea",
         "declarationType",
+        "incidentType",
+        "declarationTitle",
+        "fips",
         "fipsCountyCode",
         "iaProgramDeclared",
         "paProgramDeclared",
@@ -54,8 +69,14 @@ def clean_fema_declarations():
     
     # Rename columns for clarity
     df = df.rename(columns={
+        "femaDeclarationString": "fema_declaration_id",
+        "disasterNumber": "fema_disaster_number",
+        "state": "state_abbrev",
+        "designatedArea": "designated_area",
         "declarationType": "declaration_type",
-        "fipsCountyCode": "county_fips",
+        "incidentType": "incident_type",
+        "declarationTitle": "incident_title",
+        "fipsCountyCode": "county_code",
         "iaProgramDeclared": "ia_program",
         "paProgramDeclared": "pa_program",
         "hmProgramDeclared": "hmgp_program",
@@ -64,8 +85,8 @@ def clean_fema_declarations():
         "declarationDate": "declaration_date"
     })
     
-    # Save to CSV
-    df.to_csv(OUTPUT_FILE, index=False)
+    # Save as typed Parquet (plus a CSV export)
+    write_intermediate(df, "fema_fire_declarations")
     
     print(f"✓ Cleaned FEMA fire declarations")
     print(f"  Input: {INPUT_FILE}")
@@ -6,21 +6,18 @@ Tasks:
   - Normalize county identifiers
   - Compute avg_fmr (mean of 1-2 bedroom)
   - Keep year as explicit column
-Output: data/intermediate/hud_fmr_clean.csv
+Output: data/intermediate/hud_fmr_clean.parquet (typed, see intermediate.py) and hud_fmr_clean.csv export
 """
 
 import pandas as pd
 import os
 
+from intermediate import DATA_DIR, intermediate_path, write_intermediate, zero_pad
+
 # Define input and output paths
-DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
-INTERMEDIATE_DIR = os.path.join(DATA_DIR, "intermediate")
 FY23_PATH = os.path.join(DATA_DIR, "FY23_FMRs_revised.csv")
 FY25_PATH = os.path.join(DATA_DIR, "FY25_FMRs_revised.csv")
-OUTPUT_PATH = os.path.join(INTERMEDIATE_DIR, "hud_fmr_clean.csv")
-
-# Create intermediate directory if it doesn't exist
-os.makedirs(INTERMEDIATE_DIR, exist_ok=True)
+OUTPUT_PATH = intermediate_path("hud_fmr_clean")
 
 
 def load_and_process_fmr_data():
@@ -48,14 +45,16 @@ def load_and_process_fmr_data():
     print("Combining 2023 and 2025 data...")
     df_combined = pd.concat([df_2023_selected, df_2025_selected], ignore_index=True)
     
-    # Normalize FIPS (ensure it's zero-padded to 10 digits for consistency)
-    df_combined["fips"] = df_combined["fips"].astype(str).str.zfill(10)
+    # Normalize FIPS (ensure it's zero-padded to 10 digits for consistency);
+    # the first 5 digits are the state + county FIPS that other sources use
+    df_combined["fips"] = zero_pad(df_combined["fips"], 10)
+    df_combined["county_fips"] = df_combined["fips"].str[:5]
     
     # Compute average FMR for 1-2 bedroom units
     df_combined["avg_fmr"] = df_combined[["fmr_1", "fmr_2"]].mean(axis=1).round(2)
     
     # Select and order final columns
-    df_clean = df_combined[["fips", "countyname", "state_alpha", "fmr_1", "fmr_2", "avg_fmr", "year"]].copy()
+    df_clean = df_combined[["fips", "county_fips", "countyname", "state_alpha", "fmr_1", "fmr_2", "avg_fmr", "year"]].copy()
     
     # Sort by state, county, and year
     df_clean = df_clean.sort_values(by=["state_alpha", "countyname", "year"]).reset_index(drop=True)
@@ -70,9 +69,9 @@ def main():
     # Load and process data
     df_clean = load_and_process_fmr_data()
     
-    # Save to CSV
+    # Save as typed Parquet (plus a CSV export)
     print(f"Saving cleaned data to {OUTPUT_PATH}...")
-    df_clean.to_csv(OUTPUT_PATH, index=False)
+    write_intermediate(df_clean, "hud_fmr_clean")
     
     print(f"Success! Cleaned data saved with {len(df_clean)} rows")
     print("\nFirst few rows:")
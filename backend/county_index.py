@@ -0,0 +1,188 @@
+"""
+Offline point-in-county lookup: assign county FIPS codes to (lng, lat) points in bulk.
+
+Input: a county boundary GeoJSON (e.g. the Census cartographic boundary file converted to GeoJSON),
+one Polygon/MultiPolygon feature per county, with the FIPS code in a GEOID property, STATEFP + COUNTYFP,
+STATE + COUNTY, or the feature id.
+
+How it works:
+  - Every polygon part (exterior ring + holes) is registered in the cells of a uniform lng/lat grid
+    that its bounding box overlaps, so a point only considers the few parts near it.
+  - Each part's edges are bucketed by grid row, so the ray-casting test for a point only looks at
+    the edges of that part that cross the point's row.
+  - Both steps are plain NumPy over all points at once (in chunks), no per-point Python loop.
+
+Usage:
+  index = CountyIndex.from_geojson(COUNTY_BOUNDARIES_PATH)
+  fips = index.lookup(df["lng"], df["lat"])   # object array of 5-digit FIPS, None outside every county
+"""
+
+import json
+import os
+
+import numpy as np
+
+from intermediate import DATA_DIR
+
+COUNTY_BOUNDARIES_PATH = os.path.join(DATA_DIR, "county_boundaries.geojson")
+
+
+def feature_fips(feature):
+    """5-digit county FIPS of a GeoJSON feature, or None if it doesn't carry one."""
+    props = feature.get("properties") or {}
+    if props.get("GEOID"):
+        return str(props["GEOID"]).zfill(5)
+    for state, county in (("STATEFP", "COUNTYFP"), ("STATE", "COUNTY")):
+        if props.get(state) and props.get(county):
+            return str(props[state]).zfill(2) + str(props[county]).zfill(3)
+    if feature.get("id") is not None:
+        return str(feature["id"]).zfill(5)
+    return None
+
+
+def _csr(keys, values, size):
+    """Group values by integer key: returns (starts, grouped values), group k is values[starts[k]:starts[k + 1]]."""
+    order = np.argsort(keys, kind="stable")
+    starts = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=size), out=starts[1:])
+    return starts, values[order]
+
+
+def _expand(starts, stops):
+    """For ranges [starts[i], stops[i]): (i repeated per element, every element index)."""
+    counts = stops - starts
+    owner = np.repeat(np.arange(len(starts)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return owner, np.repeat(starts, counts) + offsets
+
+
+class CountyIndex:
+    """Grid-bucketed point-in-polygon index over county boundaries."""
+
+    def __init__(self, fips, parts, cell_size=0.1):
+        """
+        fips: FIPS code per county.
+        parts: (county position in fips, list of rings) per polygon part; each ring is an (n, 2)
+        array of lng/lat vertices, the first ring being the exterior and the rest holes.
+        """
+        self.fips = np.asarray(fips, dtype=object)
+        self.cell_size = cell_size
+
+        part_county = np.array([county for county, _ in parts], dtype=np.int64)
+        x0, y0, x1, y1, edge_part = [], [], [], [], []
+        for p, (_, rings) in enumerate(parts):
+            for ring in rings:
+                ring = np.asarray(ring, dtype=np.float64)[:, :2]
+                nxt = np.roll(ring, -1, axis=0)  # closing edge included whether or not the ring repeats its start
+                x0.append(ring[:, 0]); y0.append(ring[:, 1])
+                x1.append(nxt[:, 0]); y1.append(nxt[:, 1])
+                edge_part.append(np.full(len(ring), p, dtype=np.int64))
+        self.x0, self.y0 = np.concatenate(x0), np.concatenate(y0)
+        self.x1, self.y1 = np.concatenate(x1), np.concatenate(y1)
+        edge_part = np.concatenate(edge_part)
+
+        # Grid covering every vertex
+        self.min_x = min(self.x0.min(), self.x1.min())
+        self.min_y = min(self.y0.min(), self.y1.min())
+        self.n_cols = int((max(self.x0.max(), self.x1.max()) - self.min_x) // cell_size) + 1
+        self.n_rows = int((max(self.y0.max(), self.y1.max()) - self.min_y) // cell_size) + 1
+
+        # Part bounding boxes, in grid cells
+        n_parts = len(parts)
+        lo_x = np.full(n_parts, np.inf); hi_x = np.full(n_parts, -np.inf)
+        lo_y = np.full(n_parts, np.inf); hi_y = np.full(n_parts, -np.inf)
+        np.minimum.at(lo_x, edge_part, np.minimum(self.x0, self.x1))
+        np.maximum.at(hi_x, edge_part, np.maximum(self.x0, self.x1))
+        np.minimum.at(lo_y, edge_part, np.minimum(self.y0, self.y1))
+        np.maximum.at(hi_y, edge_part, np.maximum(self.y0, self.y1))
+        col0, col1 = self._col(lo_x), self._col(hi_x)
+        row0, row1 = self._row(lo_y), self._row(hi_y)
+
+        # Cell -> parts whose bounding box overlaps it
+        width, height = col1 - col0 + 1, row1 - row0 + 1
+        part_idx, k = _expand(np.zeros(n_parts, dtype=np.int64), width * height)
+        cells = (row0[part_idx] + k // width[part_idx]) * self.n_cols + col0[part_idx] + k % width[part_idx]
+        self.cell_starts, self.cell_parts = _csr(cells, part_idx, self.n_rows * self.n_cols)
+        self.part_county = part_county
+
+        # (part, grid row) -> edges spanning that row
+        e_row0 = self._row(np.minimum(self.y0, self.y1))
+        e_row1 = self._row(np.maximum(self.y0, self.y1))
+        edge_idx, k = _expand(np.zeros(len(edge_part), dtype=np.int64), e_row1 - e_row0 + 1)
+        band = edge_part[edge_idx] * self.n_rows + e_row0[edge_idx] + k
+        self.band_starts, self.band_edges = _csr(band, edge_idx, n_parts * self.n_rows)
+
+    @classmethod
+    def from_geojson(cls, path=COUNTY_BOUNDARIES_PATH, cell_size=0.1):
+        """Build the index from a county boundary GeoJSON FeatureCollection."""
+        with open(path) as f:
+            collection = json.load(f)
+
+        fips, parts = [], []
+        for feature in collection["features"]:
+            code = feature_fips(feature)
+            geometry = feature.get("geometry")
+            if code is None or not geometry:
+                continue
+            if geometry["type"] == "Polygon":
+                polygons = [geometry["coordinates"]]
+            elif geometry["type"] == "MultiPolygon":
+                polygons = geometry["coordinates"]
+            else:
+                continue
+            county = len(fips)
+            fips.append(code)
+            parts.extend((county, polygon) for polygon in polygons)
+        return cls(fips, parts, cell_size)
+
+    def _col(self, x):
+        return np.clip(((np.asarray(x) - self.min_x) // self.cell_size).astype(np.int64), 0, self.n_cols - 1)
+
+    def _row(self, y):
+        return np.clip(((np.asarray(y) - self.min_y) // self.cell_size).astype(np.int64), 0, self.n_rows - 1)
+
+    def lookup(self, lng, lat, chunk_size=200_000):
+        """FIPS code for each point (None for points outside every county or with missing coordinates)."""
+        lng = np.asarray(lng, dtype=np.float64)
+        lat = np.asarray(lat, dtype=np.float64)
+        county = np.full(len(lng), -1, dtype=np.int64)
+        for start in range(0, len(lng), chunk_size):
+            stop = start + chunk_size
+            county[start:stop] = self._lookup_chunk(lng[start:stop], lat[start:stop])
+
+        fips = np.full(len(lng), None, dtype=object)
+        found = county >= 0
+        fips[found] = self.fips[county[found]]
+        return fips
+
+    def _lookup_chunk(self, px, py):
+        """Index into self.fips per point, -1 if none."""
+        result = np.full(len(px), -1, dtype=np.int64)
+        inside_grid = (
+            np.isfinite(px) & np.isfinite(py)
+            & (px >= self.min_x) & (px < self.min_x + self.n_cols * self.cell_size)
+            & (py >= self.min_y) & (py < self.min_y + self.n_rows * self.cell_size)
+        )
+        points = np.flatnonzero(inside_grid)
+        row = self._row(py[points])
+        cell = row * self.n_cols + self._col(px[points])
+
+        # (point, candidate part) pairs from the point's grid cell
+        pair_point, slot = _expand(self.cell_starts[cell], self.cell_starts[cell + 1])
+        pair_part = self.cell_parts[slot]
+
+        # (pair, edge) for the part's edges in the point's row; count ray crossings to the right
+        band = pair_part * self.n_rows + row[pair_point]
+        pair, slot = _expand(self.band_starts[band], self.band_starts[band + 1])
+        edge = self.band_edges[slot]
+        x, y = px[points[pair_point[pair]]], py[points[pair_point[pair]]]
+        x0, y0, x1, y1 = self.x0[edge], self.y0[edge], self.x1[edge], self.y1[edge]
+        straddles = (y0 > y) != (y1 > y)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cross_x = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+        crossings = np.bincount(pair[straddles & (x < cross_x)], minlength=len(pair_point))
+
+        # Odd crossings: inside the part (holes included). Counties don't overlap, so any hit will do.
+        hits = np.flatnonzero(crossings % 2 == 1)
+        result[points[pair_point[hits]]] = self.part_county[pair_part[hits]]
+        return result
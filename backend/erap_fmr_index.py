@@ -0,0 +1,22 @@
+"""
+Location and loader of the ERAP FMR ZIP index (written by clean_erap_fmr.py, read by routes/rent.py).
+
+Imports only numpy, so the API server can load the index without pandas or the cleaning pipeline.
+"""
+
+import json
+import os
+
+import numpy as np
+
+INTERMEDIATE_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "intermediate")
+ZIP_INDEX_PATH = os.path.join(INTERMEDIATE_DIR, "erap_fmr_zip_index.npy")
+ZIP_AREAS_PATH = os.path.join(INTERMEDIATE_DIR, "erap_fmr_areas.json")
+
+
+def read_zip_index(index_path=ZIP_INDEX_PATH, areas_path=ZIP_AREAS_PATH):
+    """Load the ZIP index written by clean_erap_fmr.write_zip_index: (structured array sorted by ZIP, area metadata)."""
+    index = np.load(index_path)
+    with open(areas_path) as f:
+        areas = json.load(f)
+    return index, areas
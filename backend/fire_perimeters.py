@@ -0,0 +1,160 @@
+"""
+Build a fire perimeter time series from the WatchDuty perimeter export.
+
+Input: data/fire_perimeters_gis_fireperimeter.csv (see data/watch_duty_data.md)
+Tasks:
+  - Stream the export in chunks (the geom column holds full e-WKT polygons, so the table is never
+    loaded whole) and keep only "approved" perimeters with a geo_event_id
+  - Parse each e-WKT geometry in a worker process and reduce it to its area (acres, on the sphere)
+    and bounding-box center, then drop the geometry
+  - Order each geo_event_id's perimeters by date_created and compute the growth rate between
+    consecutive perimeters (acres per day)
+Output: data/intermediate/fire_perimeter_series.parquet (typed, see intermediate.py) and CSV export
+"""
+
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from intermediate import DATA_DIR, intermediate_path, write_intermediate
+
+# Define input and output paths
+PERIMETER_INPUT_PATH = os.path.join(DATA_DIR, "fire_perimeters_gis_fireperimeter.csv")
+OUTPUT_PATH = intermediate_path("fire_perimeter_series")
+
+READ_COLUMNS = ["id", "geo_event_id", "approval_status", "date_created", "source_date_current", "source_acres", "geom"]
+CHUNK_SIZE = 2_000  # perimeters per chunk; each worker task is one chunk
+
+EARTH_RADIUS_M = 6_378_137.0
+SQ_METERS_PER_ACRE = 4_046.8564224
+
+# Innermost "(...)" group of a WKT geometry, i.e. one ring's coordinate list
+RING_PATTERN = re.compile(r"\(([^()]+)\)")
+
+
+def ring_area(coords):
+    """Area in square meters enclosed by a lng/lat ring, on a spherical Earth (sign = orientation)."""
+    lng = np.radians(coords[:, 0])
+    lat = np.radians(coords[:, 1])
+    # Sum of (lng[i+1] - lng[i-1]) * sin(lat[i]) around the ring
+    return (np.roll(lng, -1) - np.roll(lng, 1)) @ np.sin(lat) * EARTH_RADIUS_M ** 2 / 2
+
+
+def parse_perimeter(ewkt):
+    """
+    Area (acres) and bounding-box center (lng, lat) of a POLYGON or MULTIPOLYGON e-WKT string.
+    Holes are subtracted. Returns (nan, nan, nan) for missing or unparseable geometry.
+    """
+    if not isinstance(ewkt, str):
+        return np.nan, np.nan, np.nan
+    wkt = ewkt.split(";", 1)[-1]  # drop the "SRID=4326;" prefix
+
+    area = 0.0
+    lo = np.array([np.inf, np.inf])
+    hi = np.array([-np.inf, -np.inf])
+    for match in RING_PATTERN.finditer(wkt):
+        values = np.array(match.group(1).replace(",", " ").split(), dtype=np.float64)
+        dims = len(match.group(1).split(",", 1)[0].split())  # 2, or 3-4 for Z/M geometries
+        coords = values.reshape(-1, dims)[:, :2]
+        if len(coords) < 3:
+            continue
+        # A ring right after "(" opens its polygon (exterior); one after "," is a hole
+        before = match.start() - 1
+        while before >= 0 and wkt[before].isspace():
+            before -= 1
+        is_hole = before >= 0 and wkt[before] == ","
+        area += -abs(ring_area(coords)) if is_hole else abs(ring_area(coords))
+        lo = np.minimum(lo, coords.min(axis=0))
+        hi = np.maximum(hi, coords.max(axis=0))
+
+    if not np.isfinite(lo).all():
+        return np.nan, np.nan, np.nan
+    center = (lo + hi) / 2
+    return area / SQ_METERS_PER_ACRE, center[0], center[1]
+
+
+def summarize_chunk(chunk):
+    """Reduce one chunk of approved perimeters to compact rows (runs in a worker process)."""
+    parsed = [parse_perimeter(geom) for geom in chunk["geom"]]
+    area, center_lng, center_lat = np.array(parsed, dtype=np.float64).reshape(-1, 3).T
+    return pd.DataFrame({
+        "id": chunk["id"].to_numpy(),
+        "geo_event_id": chunk["geo_event_id"].to_numpy(),
+        "date_created": chunk["date_created"].to_numpy(),
+        "source_date_current": chunk["source_date_current"].to_numpy(),
+        "source_acres": pd.to_numeric(chunk["source_acres"], errors="coerce").to_numpy(),
+        "area_acres": area,
+        "center_lng": center_lng,
+        "center_lat": center_lat,
+    })
+
+
+def iter_approved_chunks(path=PERIMETER_INPUT_PATH, chunksize=CHUNK_SIZE):
+    """Yield chunks of approved perimeters that belong to a geo event."""
+    with pd.read_csv(path, usecols=READ_COLUMNS, chunksize=chunksize) as reader:
+        for chunk in reader:
+            chunk = chunk[(chunk["approval_status"] == "approved") & chunk["geo_event_id"].notna()]
+            if len(chunk):
+                yield chunk
+
+
+def summarize_perimeters(path=PERIMETER_INPUT_PATH, workers=None, chunksize=CHUNK_SIZE):
+    """
+    Stream the perimeter export through a process pool. At most 2 chunks per worker are in
+    flight, so memory stays bounded by the chunk size rather than the table size.
+    """
+    workers = workers or os.cpu_count() or 1
+    summaries = []
+    pending = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk in iter_approved_chunks(path, chunksize):
+            pending.append(pool.submit(summarize_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                summaries.append(pending.pop(0).result())
+        summaries.extend(future.result() for future in pending)
+
+    if not summaries:
+        return summarize_chunk(pd.DataFrame(columns=READ_COLUMNS))
+    return pd.concat(summaries, ignore_index=True)
+
+
+def build_perimeter_series(summary):
+    """Order perimeters per geo event and add the growth rate since the previous perimeter."""
+    df = summary.copy()
+    df["geo_event_id"] = df["geo_event_id"].astype("int64")
+    for col in ["date_created", "source_date_current"]:
+        df[col] = pd.to_datetime(df[col], errors="coerce", utc=True, format="ISO8601").dt.tz_localize(None).dt.floor("s")
+    df = df.sort_values(["geo_event_id", "date_created", "id"]).reset_index(drop=True)
+
+    # Growth between consecutive perimeters of the same fire; NaN for the first one
+    by_event = df.groupby("geo_event_id", sort=False)
+    days = by_event["date_created"].diff() / pd.Timedelta(days=1)
+    growth = by_event["area_acres"].diff() / days
+    df["growth_acres_per_day"] = growth.where(days > 0)
+    return df
+
+
+def main():
+    """Main function to build and save the fire perimeter time series."""
+    print("Starting fire perimeter processing...")
+    if not os.path.exists(PERIMETER_INPUT_PATH):
+        print(f"Warning: perimeter export not found at {PERIMETER_INPUT_PATH}")
+        return
+
+    summary = summarize_perimeters()
+    df = build_perimeter_series(summary)
+
+    # Save as typed Parquet (plus a CSV export)
+    print(f"Saving perimeter series to {OUTPUT_PATH}...")
+    write_intermediate(df, "fire_perimeter_series")
+
+    print(f"Success! {len(df)} approved perimeters for {df['geo_event_id'].nunique()} fires")
+    print(f"  Perimeters with unparseable geometry: {df['area_acres'].isna().sum()}")
+    print(f"  Median growth: {df['growth_acres_per_day'].median():.1f} acres/day")
+
+
+if __name__ == "__main__":
+    main()
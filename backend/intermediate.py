@@ -0,0 +1,139 @@
+"""
+Typed storage for the cleaning pipeline's intermediate tables.
+
+Each cleaner writes data/intermediate/<name>.parquet with an explicit Arrow schema:
+  - FIPS codes as fixed-width, zero-padded strings (checked on write)
+  - dates as timestamps
+  - percentages as float32
+plus <name>.csv as a human-readable export. Loaders read the Parquet file back with column
+projection, so types survive between stages instead of being re-inferred from CSV text.
+"""
+
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+INTERMEDIATE_DIR = os.path.join(DATA_DIR, "intermediate")
+
+SCHEMAS = {
+    "cre_clean": pa.schema([
+        ("county_name", pa.string()),
+        ("state_abbrev", pa.string()),
+        ("state_name", pa.string()),
+        ("pct_low_vulnerability", pa.float32()),
+        ("pct_high_vulnerability", pa.float32()),
+        ("pct_low_vulnerability_moe", pa.float32()),
+        ("pct_high_vulnerability_moe", pa.float32()),
+    ]),
+    "hud_fmr_clean": pa.schema([
+        ("fips", pa.string()),
+        ("county_fips", pa.string()),
+        ("countyname", pa.string()),
+        ("state_alpha", pa.string()),
+        ("fmr_1", pa.int32()),
+        ("fmr_2", pa.int32()),
+        ("avg_fmr", pa.float32()),
+        ("year", pa.int16()),
+    ]),
+    "erap_fmr_clean": pa.schema([
+        ("zip", pa.string()),
+        ("area_name", pa.string()),
+        ("cbsa", pa.string()),
+        ("fmr_br0", pa.int32()),
+        ("fmr_br1", pa.int32()),
+        ("fmr_br2", pa.int32()),
+        ("fmr_br3", pa.int32()),
+        ("fmr_br4", pa.int32()),
+        ("year", pa.int16()),
+    ]),
+    "fema_fire_declarations": pa.schema([
+        ("fema_declaration_id", pa.string()),
+        ("fema_disaster_number", pa.int32()),
+        ("state_abbrev", pa.string()),
+        ("designated_area", pa.string()),
+        ("declaration_type", pa.string()),
+        ("incident_type", pa.string()),
+        ("incident_title", pa.string()),
+        ("fips", pa.string()),
+        ("county_code", pa.string()),
+        ("ia_program", pa.bool_()),
+        ("pa_program", pa.bool_()),
+        ("hmgp_program", pa.bool_()),
+        ("incident_begin_date", pa.timestamp("s")),
+        ("incident_end_date", pa.timestamp("s")),
+        ("declaration_date", pa.timestamp("s")),
+        ("recovery_start_date", pa.timestamp("s")),
+    ]),
+    "fire_perimeter_series": pa.schema([
+        ("id", pa.int64()),
+        ("geo_event_id", pa.int64()),
+        ("date_created", pa.timestamp("s")),
+        ("source_date_current", pa.timestamp("s")),
+        ("source_acres", pa.float32()),
+        ("area_acres", pa.float32()),
+        ("center_lng", pa.float32()),
+        ("center_lat", pa.float32()),
+        ("growth_acres_per_day", pa.float32()),
+    ]),
+}
+
+# Width of every FIPS-style column: state + county (5), county only (3), HUD area with subdivision (10),
+# and ZIP codes (5)
+FIPS_WIDTHS = {
+    ("hud_fmr_clean", "fips"): 10,
+    ("hud_fmr_clean", "county_fips"): 5,
+    ("erap_fmr_clean", "zip"): 5,
+    ("fema_fire_declarations", "fips"): 5,
+    ("fema_fire_declarations", "county_code"): 3,
+}
+
+
+# CSV export date format; tables not listed hold calendar dates
+CSV_DATE_FORMATS = {
+    "fire_perimeter_series": "%Y-%m-%d %H:%M:%S",
+}
+
+
+def intermediate_path(name, extension="parquet"):
+    """Path of an intermediate table (Parquet by default, "csv" for the export)."""
+    return os.path.join(INTERMEDIATE_DIR, f"{name}.{extension}")
+
+
+def zero_pad(series, width):
+    """Normalize codes read as numbers or strings to zero-padded strings (missing stays missing)."""
+    text = series.astype("string").str.strip().str.replace(r"\.0$", "", regex=True)
+    return text.str.zfill(width)
+
+
+def write_intermediate(df, name, export_csv=True):
+    """Write df as typed Parquet using SCHEMAS[name], plus a CSV export. Returns the Parquet path."""
+    schema = SCHEMAS[name]
+    for (table, column), width in FIPS_WIDTHS.items():
+        if table == name:
+            lengths = df[column].dropna().str.len()
+            if not (lengths == width).all():
+                raise ValueError(f"{name}.{column} must be {width}-character FIPS codes")
+
+    os.makedirs(INTERMEDIATE_DIR, exist_ok=True)
+    table = pa.Table.from_pandas(df[schema.names], schema=schema, preserve_index=False)
+    path = intermediate_path(name)
+    pq.write_table(table, path)
+    if export_csv:
+        date_format = CSV_DATE_FORMATS.get(name, "%Y-%m-%d")
+        df[schema.names].to_csv(intermediate_path(name, "csv"), index=False, date_format=date_format)
+    return path
+
+
+def read_intermediate(name, columns=None):
+    """
+    Read an intermediate table, only loading the requested columns.
+    Returns None (with a warning) if the cleaner that writes it hasn't been run.
+    """
+    path = intermediate_path(name)
+    if not os.path.exists(path):
+        print(f"Warning: {name} not found at {path} (run its cleaner first)")
+        return None
+    return pd.read_parquet(path, columns=columns)
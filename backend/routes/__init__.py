@@ -1,7 +1,11 @@
+from .county import county_bp
 from .example import example_bp
 from .intake import intake_bp
+from .rent import rent_bp
 
 blueprints = [
     example_bp,
     intake_bp,
+    county_bp,
+    rent_bp,
 ]
\ No newline at end of file
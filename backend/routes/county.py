@@ -0,0 +1,135 @@
+"""
+County lookup API over the canonical recovery dataset.
+
+Input: data/final/canonical_recovery_dataset.csv (see build_canonical_dataframe.py), one row per
+FEMA declaration per county with the county's HUD FMR and CRE columns
+Tasks:
+  - Read the CSV once at startup (csv module, no pandas) and group the rows by county FIPS, taking
+    the county fields from its latest HUD year and each declaration once (by fema_declaration_id)
+  - Serialize each county's JSON payload once, and index it by FIPS and by
+    (state, normalized county name)
+Routes:
+  GET /api/county/<fips>                               e.g. /api/county/06037
+  GET /api/county/lookup?state=CA&county=Los Angeles   county name as in normalize_county_name; 409 with
+                                                       the candidate FIPS codes if the name is ambiguous
+                                                       (e.g. Baltimore County and Baltimore city, MD)
+A request is one dict lookup returning the prebuilt bytes.
+"""
+
+import csv
+import json
+import os
+
+from flask import Blueprint, Response, jsonify, request
+
+from canonical_dataset import OUTPUT_PATH, normalize_county_name
+
+county_bp = Blueprint('county', __name__, url_prefix='/county')
+
+# County-level columns and per-declaration columns
+COUNTY_FIELDS = ["fips", "state_abbrev", "county_name", "county_name_normalized", "avg_fmr", "year",
+                 "pct_low_vulnerability", "pct_high_vulnerability"]
+DECLARATION_FIELDS = ["fema_declaration_id", "fema_disaster_number", "declaration_type", "incident_type",
+                      "incident_title", "fema_declaration_date", "incident_begin_date", "incident_end_date"]
+NUMERIC_FIELDS = {"avg_fmr", "pct_low_vulnerability", "pct_high_vulnerability"}
+INTEGER_FIELDS = {"year", "fema_disaster_number"}
+
+
+def _value(field, raw):
+    """Typed JSON value for one CSV cell (None for blanks and unparseable numbers)."""
+    if raw is None or raw == "":
+        return None
+    try:
+        if field in INTEGER_FIELDS:
+            return int(float(raw))
+        if field in NUMERIC_FIELDS:
+            value = float(raw)
+            return value if value == value else None  # "nan" isn't valid JSON
+    except ValueError:
+        return None
+    return raw
+
+
+def build_county_index(path=OUTPUT_PATH):
+    """
+    Read the canonical dataset into (payload bytes by 5-digit FIPS, sorted FIPS codes by (state, normalized
+    county)); a name shared by several counties keeps all of them.
+    A county's fields come from its row with the latest HUD year (the first such row on ties).
+    Declarations are listed once each, in the file's order (incident begin date within a county).
+    """
+    counties = {}
+    declarations = {}   # fips -> {fema_declaration_id: declaration}
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            if not row.get("fips"):
+                continue
+            fips = row["fips"].zfill(5)
+            fields = {field: _value(field, row.get(field)) for field in COUNTY_FIELDS}
+            fields["fips"] = fips
+            current = counties.get(fips)
+            if current is None or (fields["year"] or 0) > (current["year"] or 0):
+                counties[fips] = fields
+            declaration = {field: _value(field, row.get(field)) for field in DECLARATION_FIELDS}
+            key = declaration["fema_declaration_id"] or tuple(declaration.values())
+            declarations.setdefault(fips, {}).setdefault(key, declaration)
+
+    payloads = {}
+    fips_by_name = {}
+    for fips, county in counties.items():
+        county["declarations"] = list(declarations[fips].values())
+        county["declaration_count"] = len(county["declarations"])
+        payloads[fips] = json.dumps(county, separators=(",", ":")).encode("utf-8")
+        if county["state_abbrev"] and county["county_name_normalized"]:
+            fips_by_name.setdefault((county["state_abbrev"].upper(), county["county_name_normalized"]), []).append(fips)
+    for candidates in fips_by_name.values():
+        candidates.sort()
+    return payloads, fips_by_name
+
+
+def load_county_index(path=OUTPUT_PATH):
+    """The index, or an empty one (every lookup 404s) if the canonical dataset hasn't been built."""
+    if not os.path.exists(path):
+        print(f"Warning: canonical dataset not found at {path}; /api/county lookups will return 404")
+        return {}, {}
+    payloads, fips_by_name = build_county_index(path)
+    ambiguous = sum(len(candidates) > 1 for candidates in fips_by_name.values())
+    print(f"Loaded {len(payloads)} counties from {path} ({ambiguous} names shared by several counties)")
+    return payloads, fips_by_name
+
+
+COUNTY_PAYLOADS, FIPS_BY_NAME = load_county_index()
+
+
+def county_response(fips):
+    payload = COUNTY_PAYLOADS.get(fips)
+    if payload is None:
+        return jsonify(error=f"No data for county {fips}"), 404
+    return Response(payload, status=200, mimetype='application/json')
+
+
+@county_bp.route('/lookup', methods=['GET', 'OPTIONS'])
+def lookup_county():
+    """Look up a county by state abbreviation and county name."""
+    if request.method == 'OPTIONS':
+        return '', 204
+    state = request.args.get('state', '').strip().upper()
+    name = normalize_county_name(request.args.get('county', ''))
+    if not state or not name:
+        return jsonify(error="Both 'state' and 'county' query parameters are required"), 400
+    candidates = FIPS_BY_NAME.get((state, name))
+    if not candidates:
+        return jsonify(error=f"No data for county '{request.args.get('county')}', {state}"), 404
+    if len(candidates) > 1:
+        return jsonify(error=f"County name '{request.args.get('county')}', {state} is ambiguous; look it up by FIPS",
+                       candidates=candidates), 409
+    return county_response(candidates[0])
+
+
+@county_bp.route('/<fips>', methods=['GET', 'OPTIONS'])
+def get_county(fips):
+    """Look up a county by FIPS code (leading zeros optional)."""
+    if request.method == 'OPTIONS':
+        return '', 204
+    if not fips.isdigit() or len(fips) > 5:
+        return jsonify(error="FIPS code must be up to 5 digits"), 400
+    return county_response(fips.zfill(5))
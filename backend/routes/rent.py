@@ -0,0 +1,70 @@
+"""
+ZIP code -> ERAP Fair Market Rent lookup API.
+
+Input: the ZIP index written by clean_erap_fmr.py (data/intermediate/erap_fmr_zip_index.npy + erap_fmr_areas.json),
+       loaded with erap_fmr_index.py
+Tasks:
+  - Load the index once at startup and keep its columns as plain Python arrays/lists
+  - Answer each request with two bisects over the sorted ZIP array (a ZIP can span several FMR areas)
+Routes:
+  GET /api/rent/<zip>              e.g. /api/rent/94103, rents for 0-4 bedrooms per FMR area
+  GET /api/rent/<zip>?bedrooms=2   also includes "fmr" for that unit size
+"""
+
+import os
+from array import array
+from bisect import bisect_left, bisect_right
+
+from flask import Blueprint, jsonify, request
+
+from erap_fmr_index import ZIP_AREAS_PATH, ZIP_INDEX_PATH, read_zip_index
+
+rent_bp = Blueprint('rent', __name__, url_prefix='/rent')
+
+MAX_BEDROOMS = 4
+
+
+def load_rent_index(index_path=ZIP_INDEX_PATH, areas_path=ZIP_AREAS_PATH):
+    """(sorted ZIPs, area number per row, rents per row, area metadata); empty if clean_erap_fmr hasn't run."""
+    if not (os.path.exists(index_path) and os.path.exists(areas_path)):
+        print(f"Warning: ERAP FMR ZIP index not found at {index_path}; /api/rent lookups will return 404")
+        return array("I"), [], [], {"year": None, "areas": []}
+    index, areas = read_zip_index(index_path, areas_path)
+    print(f"Loaded ERAP FMR index with {len(index)} ZIP/area rows")
+    return array("I", index["zip"].tolist()), index["area"].tolist(), index["fmr"].tolist(), areas
+
+
+ZIPS, ROW_AREAS, ROW_FMRS, AREA_INFO = load_rent_index()
+
+
+def rent_rows(zip_code):
+    """Index rows for a 5-digit ZIP code (empty range if unknown)."""
+    key = int(zip_code)
+    return range(bisect_left(ZIPS, key), bisect_right(ZIPS, key))
+
+
+@rent_bp.route('/<zip_code>', methods=['GET', 'OPTIONS'])
+def get_rent(zip_code):
+    """Fair Market Rents for every FMR area a ZIP code belongs to."""
+    if request.method == 'OPTIONS':
+        return '', 204
+    if not (zip_code.isdigit() and len(zip_code) == 5):
+        return jsonify(error="ZIP code must be 5 digits"), 400
+
+    bedrooms = request.args.get('bedrooms')
+    if bedrooms is not None and not (bedrooms.isdigit() and int(bedrooms) <= MAX_BEDROOMS):
+        return jsonify(error=f"bedrooms must be between 0 and {MAX_BEDROOMS}"), 400
+
+    rows = rent_rows(zip_code)
+    if not rows:
+        return jsonify(error=f"No rent data for ZIP code {zip_code}"), 404
+
+    areas = []
+    for row in rows:
+        name, cbsa = AREA_INFO["areas"][ROW_AREAS[row]]
+        rents = [rent or None for rent in ROW_FMRS[row]]  # 0 marks a missing rent
+        area = {"area_name": name, "cbsa": cbsa, "fmr_by_bedrooms": rents}
+        if bedrooms is not None:
+            area["fmr"] = rents[int(bedrooms)]
+        areas.append(area)
+    return jsonify(zip=zip_code, year=AREA_INFO["year"], areas=areas), 200
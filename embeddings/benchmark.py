@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+
+# Benchmarks for the embedding pipeline stages. Each benchmark checks that the fast path
+# gives the same output as the reference implementation before reporting timings.
+#
+#   python embeddings/benchmark.py features --rows 200000
+#   python embeddings/benchmark.py features --data-dir ./data
+#   python embeddings/benchmark.py narratives --rows 1000000
+#   python embeddings/benchmark.py ann --vectors 200000 --nprobe 1 4 8 16 32
+#   python embeddings/benchmark.py embed --texts 2000 --quantize fp32 int8 --dimensions 1024 512 256
+#   python embeddings/benchmark.py upsert --vectors 20000 --latency-ms 40 --fail-rate 0.05 --workers 1 4 8
+#   python embeddings/benchmark.py replay --rows 2000000 --events 50000
+#   python embeddings/benchmark.py timeline --rows 1000000 --counties 3000
+import argparse
+import contextlib
+import io
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import changelog_replay
+import data as pipeline
+from embedding_service import load_sentence_transformer, truncate_embeddings
+from local_index import LocalIndex
+from timeline_model import N_SEVERITIES, TimelineModel
+from upsert_pipeline import UpsertPipeline
+
+# Queries for the embed benchmark, in the style of interactive_loop's help examples
+EMBED_QUERIES = [
+    "wildfires with long recovery timelines",
+    "fires needing emergency housing and shelter",
+    "small contained fires with minimal damage",
+    "FEMA assistance and insurance claims",
+    "high disruption with evacuation orders",
+    "large fire with delayed insurance payouts",
+    "moderate fire with temporary relocation",
+    "quick recovery after a prescribed burn",
+]
+
+
+# Build a frame that looks like load_all_csvs output: WatchDuty geoevents (JSON "data" column),
+# fire perimeters (source_acres), FEMA declarations (incidentType) and HUD rows with none of those
+def make_synthetic_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    kind = rng.choice(["geoevent", "perimeter", "fema", "hud"], size=rows, p=[0.5, 0.2, 0.1, 0.2])
+
+    data = np.full(rows, None, dtype=object)
+    geo = np.flatnonzero(kind == "geoevent")
+    for i in geo:
+        payload = {"is_prescribed": False}
+        if rng.random() < 0.8:
+            payload["acreage"] = round(float(rng.lognormal(4, 2.5)), 1)
+        if rng.random() < 0.6:
+            payload["containment"] = int(rng.integers(0, 101))
+        if rng.random() < 0.2:
+            payload["evacuation_orders"] = ["Zone A"]
+        if rng.random() < 0.1:
+            payload["evacuation_notes"] = rng.choice(["", "  ", "Leave now"])
+        data[i] = json.dumps(payload)
+    if len(geo):
+        data[geo[0]] = "{not json"
+
+    source_acres = np.where(kind == "perimeter", np.round(rng.lognormal(5, 2, rows), 2), np.nan)
+    incident_type = np.where(kind == "fema", rng.choice(["Fire", "Flood", " fire "], size=rows), None)
+    names = np.where(kind == "geoevent", [f"Fire {i % 5000}" for i in range(rows)], None)
+
+    return pd.DataFrame({
+        "name": names,
+        "data": data,
+        "source_acres": source_acres,
+        "incidentType": incident_type,
+        "_source_file": kind,
+    })
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def bench_features(args):
+    if args.data_dir:
+        pipeline.DEMO_MAX_ROWS_PER_FILE = None
+        df = pipeline.load_all_csvs(args.data_dir)
+    else:
+        df = make_synthetic_frame(args.rows)
+    print(f"Rows: {len(df):,}")
+
+    fast, fast_s = timed(pipeline.compute_recovery_features, df)
+    slow, slow_s = timed(pipeline.compute_recovery_features_rowwise, df)
+    pd.testing.assert_frame_equal(fast, slow)
+
+    print(f"  row-wise:   {slow_s:8.3f}s")
+    print(f"  columnar:   {fast_s:8.3f}s")
+    print(f"  speedup:    {slow_s / fast_s:8.1f}x  (outputs identical)")
+
+
+def bench_narratives(args):
+    df = pipeline.compute_recovery_features(make_synthetic_frame(args.rows))
+    print(f"Rows: {len(df):,}")
+
+    fast, fast_s = timed(pipeline.render_recovery_narratives, df)
+    slow, slow_s = timed(df.apply, pipeline.generate_recovery_narrative, 1)
+    assert fast.astype(object).tolist() == slow.tolist(), "rendered narratives differ from generate_recovery_narrative"
+
+    print(f"  row-wise:   {slow_s:8.3f}s")
+    print(f"  vectorized: {fast_s:8.3f}s")
+    print(f"  speedup:    {slow_s / fast_s:8.1f}x  (outputs identical, {len(fast.cat.categories):,} unique)")
+
+
+# Unit vectors scattered around a few hundred topic directions, like templated narratives
+def make_clustered_vectors(count: int, dimension: int, clusters: int = 256, spread: float = 0.35, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimension)).astype(np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    vectors = centers[rng.integers(0, clusters, size=count)]
+    vectors += rng.normal(scale=spread / np.sqrt(dimension), size=vectors.shape).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def bench_ann(args):
+    vectors = make_clustered_vectors(args.vectors, args.dimension)
+    with tempfile.TemporaryDirectory() as tmp:
+        index = LocalIndex(tmp, args.dimension)
+        for start in range(0, len(vectors), 10_000):
+            batch = vectors[start:start + 10_000]
+            index.upsert([{"id": f"v{start + i}", "values": v} for i, v in enumerate(batch)])
+
+        _, build_s = timed(index.build_ivf, args.nlist or None)
+        print(f"Vectors: {args.vectors:,} x {args.dimension}  |  IVF build: {build_s:.1f}s")
+        for nprobe in args.nprobe:
+            r = index.measure_recall(args.top_k, queries=args.queries, nprobe=nprobe)
+            print(f"  nlist={r['nlist']:5d} nprobe={nprobe:4d}  recall@{args.top_k}={r['recall']:.3f}  "
+                  f"{r['approx_ms']:7.2f} ms/query  (exact {r['exact_ms']:.2f} ms)")
+
+
+# Top-k row numbers per query by cosine similarity (inputs are unit vectors)
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    scores = queries @ corpus.T
+    return np.argsort(-scores, axis=1, kind="stable")[:, :k]
+
+
+def bench_embed(args):
+    df = pipeline.compute_recovery_features(make_synthetic_frame(args.rows))
+    texts = pd.unique(pipeline.render_recovery_narratives(df).astype(object))[:args.texts].tolist()
+    queries = EMBED_QUERIES + texts[::max(1, len(texts) // args.queries)][:args.queries]
+    print(f"Passages: {len(texts):,}  |  queries: {len(queries)}  |  recall@{args.top_k} vs fp32 {args.dimensions[0]}-d")
+
+    baseline = None
+    for quantize in args.quantize:
+        mode = "" if quantize == "fp32" else quantize
+        model, load_s = timed(load_sentence_transformer, pipeline.JINA_MODEL, mode)
+        encode = lambda batch, task: np.asarray(model.encode(batch, task=task, batch_size=args.batch_size))
+        passages, encode_s = timed(encode, texts, "retrieval.passage")
+        query_vectors = encode(queries, "retrieval.query")
+        print(f"  {quantize}: model load {load_s:.1f}s, {len(texts) / encode_s:,.1f} passages/s")
+
+        for dimension in args.dimensions:
+            corpus = truncate_embeddings(passages, dimension)
+            top = exact_top_k(corpus, truncate_embeddings(query_vectors, dimension), args.top_k)
+            if baseline is None:
+                baseline = top   # first mode listed is the reference
+            recall = np.mean([len(set(a) & set(b)) / args.top_k for a, b in zip(top, baseline)])
+            print(f"    {quantize:>5s} {dimension:5d}-d  recall@{args.top_k}={recall:.3f}  "
+                  f"index {corpus.nbytes / 1e6:8.2f} MB ({dimension * 4 * 1e6 / 1e9:.2f} GB per 1M vectors)")
+        del model
+
+
+# LocalIndex behind a simulated network: every upsert takes `latency` seconds and fails with
+# probability fail_rate before reaching the index
+class FlakyIndex:
+    def __init__(self, index: LocalIndex, latency: float, fail_rate: float):
+        self.index = index
+        self.latency = latency
+        self.fail_rate = fail_rate
+
+    def upsert(self, vectors):
+        time.sleep(self.latency)
+        if random.random() < self.fail_rate:
+            raise ConnectionError("simulated upsert failure")
+        return self.index.upsert(vectors=vectors)
+
+
+def bench_upsert(args):
+    random.seed(0)
+    vectors = make_clustered_vectors(args.vectors, args.dimension)
+    records = [{"id": f"doc_{i}", "values": v.tolist(), "metadata": {"severity": "high"}} for i, v in enumerate(vectors)]
+    batches = [records[i:i + 100] for i in range(0, len(records), 100)]
+    print(f"Vectors: {len(records):,} in {len(batches)} batches  |  latency {args.latency_ms} ms, "
+          f"failure rate {args.fail_rate:.0%}, {args.encode_ms} ms encoding per batch")
+
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as tmp:
+            local = LocalIndex(tmp, args.dimension)
+            uploader = UpsertPipeline(FlakyIndex(local, args.latency_ms / 1000, args.fail_rate), workers=workers,
+                                      retries=args.retries, backoff=0.01, total=len(records))
+            with contextlib.redirect_stdout(io.StringIO()):   # per-batch progress lines
+                with uploader:
+                    for batch in batches:
+                        time.sleep(args.encode_ms / 1000)   # stand-in for embedding the batch
+                        uploader.put(batch)
+            stored = local.describe_index_stats()["total_vector_count"]
+            assert stored == uploader.succeeded, f"index holds {stored} vectors, pipeline reported {uploader.succeeded}"
+            print(f"  workers={workers:3d}  {uploader.report()}")
+
+
+# Geoevent changelog rows like the WatchDuty export: mostly untracked edits, plus containment, FPS and
+# radio-traffic changes (some nested in "data"), in no particular order
+def make_synthetic_changelog(path: str, rows: int, events: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    event = rng.integers(1, events + 1, rows)
+    when = pd.Timestamp("2024-01-01", tz="UTC") + pd.to_timedelta(rng.integers(0, 365 * 86400, rows), unit="s")
+    kind = rng.choice(6, rows, p=[0.5, 0.2, 0.1, 0.1, 0.05, 0.05])
+    value = rng.integers(0, 101, rows)
+    spread = np.array(changelog_replay.RATE_OF_SPREAD_LEVELS)[rng.integers(0, 5, rows)]
+    changes = np.empty(rows, dtype=object)
+    for i in range(rows):
+        k = kind[i]
+        if k == 0:
+            changes[i] = json.dumps({"name": ["Old", f"Fire {value[i]}"], "address": ["", "somewhere"]})
+        elif k == 1:
+            changes[i] = json.dumps({"containment": [None, int(value[i])]})
+        elif k == 2:
+            changes[i] = json.dumps({"data": [{}, {"containment": int(value[i]), "is_fps": bool(value[i] > 60)}]})
+        elif k == 3:
+            changes[i] = json.dumps({"is_fps": [False, bool(value[i] > 50)]})
+        elif k == 4:
+            changes[i] = json.dumps({"radio_traffic_indicates_rate_of_spread": [None, spread[i]]})
+        else:
+            changes[i] = json.dumps({"radio_traffic_indicates_structure_threat": [None, True]})
+    pd.DataFrame({"id": np.arange(rows), "date_created": when.strftime("%Y-%m-%d %H:%M:%S+00"),
+                  "geo_event_id": event, "changes": changes}).to_csv(path, index=False)
+
+
+# Reference replay: every row in (event, time) order through per-event dicts of current state
+def replay_rowwise(path: str) -> pd.DataFrame:
+    df = pd.read_csv(path)
+    df["date_created"] = pd.to_datetime(df["date_created"], utc=True, format="ISO8601").dt.tz_localize(None)
+    df = df.sort_values(["geo_event_id", "date_created"], kind="stable")
+    out = {}
+    for row in df.itertuples():
+        state = out.setdefault(row.geo_event_id, {"first_seen": row.date_created, "containment_final": np.nan,
+                                                  "fps_at": None, "structure_threat": False, "max_rate_of_spread": 0})
+        changes = json.loads(row.changes)
+        data = changes.get("data", [None, {}])[-1] or {}
+        containment = changes["containment"][-1] if "containment" in changes else data.get("containment")
+        if containment is not None:
+            state["containment_final"] = float(containment)
+        fps = changes["is_fps"][-1] if "is_fps" in changes else data.get("is_fps")
+        if fps and state["fps_at"] is None:
+            state["fps_at"] = row.date_created
+        if changes.get("radio_traffic_indicates_structure_threat", [None, None])[-1]:
+            state["structure_threat"] = True
+        spread = changes.get("radio_traffic_indicates_rate_of_spread", [None, None])[-1]
+        if spread:
+            rank = changelog_replay.RATE_OF_SPREAD_LEVELS.index(spread) + 1
+            state["max_rate_of_spread"] = max(state["max_rate_of_spread"], rank)
+    frame = pd.DataFrame.from_dict(out, orient="index")
+    frame["hours_to_fps"] = (frame["fps_at"] - frame["first_seen"]) / pd.Timedelta(hours=1)
+    return frame
+
+
+def bench_replay(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = f"{tmp}/{changelog_replay.GEOEVENT_CHANGELOG}"
+        make_synthetic_changelog(path, args.rows, args.events)
+        print(f"Changelog rows: {args.rows:,} for {args.events:,} geo events")
+
+        (steps, fast), fast_s = timed(lambda: changelog_replay.replay_geoevent_changelog(path, args.chunksize))
+        slow, slow_s = timed(replay_rowwise, path)
+
+    slow = slow.reindex(fast.index)
+    np.testing.assert_allclose(fast["containment_final"], slow["containment_final"])
+    np.testing.assert_allclose(fast["hours_to_fps"], slow["hours_to_fps"].astype("float64"))
+    assert (fast["structure_threat"] == slow["structure_threat"]).all()
+    ranks = fast["max_rate_of_spread"].cat.codes.to_numpy() + 1
+    assert (ranks == slow["max_rate_of_spread"].to_numpy()).all()
+
+    print(f"  state steps kept: {len(steps):,} ({steps.memory_usage(deep=True).sum() / 1e6:.1f} MB)")
+    print(f"  row-wise:   {slow_s:8.3f}s")
+    print(f"  replay:     {fast_s:8.3f}s")
+    print(f"  speedup:    {slow_s / fast_s:8.1f}x  (features identical)")
+
+
+# Per-row reference for TimelineModel.predict: a dict of county rows, else the severity prior
+def predict_rowwise(model: TimelineModel, fips, severity):
+    table = {int(k): q for k, q in zip(model.keys, model.quantiles)}
+    out = np.empty((len(fips), 3))
+    local = np.zeros(len(fips), dtype=bool)
+    for i, (f, s) in enumerate(zip(fips, severity)):
+        row = table.get(int(f) * N_SEVERITIES + int(s)) if np.isfinite(f) else None
+        out[i] = model.severity_quantiles[s] if row is None else row
+        local[i] = row is not None
+    return out, local
+
+
+def bench_timeline(args):
+    rng = np.random.default_rng(0)
+    counties = rng.choice(np.arange(1001, 56999), size=args.counties, replace=False)
+    fires = 20 * args.counties
+    fips = rng.choice(counties, size=fires).astype("float64")
+    severity = rng.integers(0, N_SEVERITIES, fires)
+    hours = rng.lognormal(3 + (2 - severity) * 0.8, 1.0)
+    model, fit_s = timed(TimelineModel.fit, fips, severity, hours, rng.lognormal(4, 1, 5_000))
+    with tempfile.TemporaryDirectory() as tmp:
+        model.save(f"{tmp}/timeline_model.npz")
+        size = (Path(tmp) / "timeline_model.npz").stat().st_size
+        model = TimelineModel.load(f"{tmp}/timeline_model.npz")
+    print(f"Fitted on {fires:,} fires in {args.counties:,} counties: {fit_s:.3f}s, {len(model.keys):,} rows, {size:,} bytes")
+
+    df = pipeline.compute_recovery_features(make_synthetic_frame(args.rows))
+    df["fips"] = np.where(rng.random(len(df)) < 0.9, rng.choice(counties, size=len(df)), np.nan)
+    sev = pipeline._bucket_codes(df, "severity", "low")
+    row_fips = model.row_fips(df)
+    fast, fast_s = timed(model.predict, row_fips, sev)
+    slow, slow_s = timed(predict_rowwise, model, row_fips, sev)
+    np.testing.assert_allclose(fast[0], slow[0])
+    np.testing.assert_array_equal(fast[1], slow[1])
+    print(f"Rows: {len(df):,}")
+    print(f"  predict row-wise:   {slow_s:8.3f}s  ({slow_s / len(df) * 1e6:.2f} us/row)")
+    print(f"  predict vectorized: {fast_s:8.3f}s  ({fast_s / len(df) * 1e6:.3f} us/row, predictions identical)")
+
+    plain, plain_s = timed(pipeline.render_recovery_narratives, df)
+    estimated, estimated_s = timed(pipeline.render_recovery_narratives, df, model)
+    print(f"  narratives:         {plain_s:8.3f}s bucket text ({len(plain.cat.categories):,} unique), "
+          f"{estimated_s:.3f}s with estimates ({len(estimated.cat.categories):,} unique)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="benchmark", required=True)
+
+    features = sub.add_parser("features", help="STAGE 2: row-wise vs columnar feature extraction")
+    features.add_argument("--rows", type=int, default=100_000, help="Synthetic rows to generate")
+    features.add_argument("--data-dir", help="Benchmark on the real CSVs in this directory instead")
+    features.set_defaults(func=bench_features)
+
+    narratives = sub.add_parser("narratives", help="STAGE 3: generate_recovery_narrative vs render_recovery_narratives")
+    narratives.add_argument("--rows", type=int, default=1_000_000, help="Synthetic rows to generate")
+    narratives.set_defaults(func=bench_narratives)
+
+    ann = sub.add_parser("ann", help="Local index: IVF recall@k and latency vs exact search")
+    ann.add_argument("--vectors", type=int, default=100_000)
+    ann.add_argument("--dimension", type=int, default=pipeline.DIMENSION)
+    ann.add_argument("--nlist", type=int, default=0, help="IVF lists (0 = about 2*sqrt(vectors))")
+    ann.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    ann.add_argument("--top-k", type=int, default=pipeline.TOP_K)
+    ann.add_argument("--queries", type=int, default=200)
+    ann.set_defaults(func=bench_ann)
+
+    embed = sub.add_parser("embed", help="STAGE 4: throughput, index size and recall of int8 / truncated encodings")
+    embed.add_argument("--rows", type=int, default=50_000, help="Synthetic rows to render narratives from")
+    embed.add_argument("--texts", type=int, default=2_000, help="Unique narratives to encode")
+    embed.add_argument("--queries", type=int, default=50, help="Narratives also encoded as queries")
+    embed.add_argument("--quantize", nargs="+", choices=["fp32", "int8"], default=["fp32", "int8"])
+    embed.add_argument("--dimensions", type=int, nargs="+", default=[1024, 512, 256],
+                       help="Matryoshka dimensions; the first one with the first --quantize mode is the baseline")
+    embed.add_argument("--top-k", type=int, default=10)
+    embed.add_argument("--batch-size", type=int, default=32)
+    embed.set_defaults(func=bench_embed)
+
+    upsert = sub.add_parser("upsert", help="STAGE 4: pipelined concurrent upserts against a simulated slow, flaky index")
+    upsert.add_argument("--vectors", type=int, default=10_000)
+    upsert.add_argument("--dimension", type=int, default=pipeline.DIMENSION)
+    upsert.add_argument("--latency-ms", type=float, default=40, help="Simulated round trip per upsert")
+    upsert.add_argument("--fail-rate", type=float, default=0.05, help="Fraction of upsert calls that fail")
+    upsert.add_argument("--encode-ms", type=float, default=20, help="Simulated embedding time per 100-vector batch")
+    upsert.add_argument("--retries", type=int, default=5)
+    upsert.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    upsert.set_defaults(func=bench_upsert)
+
+    replay = sub.add_parser("replay", help="Changelog replay: streamed columnar replay vs row-wise state dicts")
+    replay.add_argument("--rows", type=int, default=500_000, help="Synthetic changelog rows")
+    replay.add_argument("--events", type=int, default=20_000, help="Distinct geo events")
+    replay.add_argument("--chunksize", type=int, default=200_000)
+    replay.set_defaults(func=bench_replay)
+
+    timeline = sub.add_parser("timeline", help="STAGE 3: timeline model fit, vectorized vs per-row predictions")
+    timeline.add_argument("--rows", type=int, default=200_000, help="Synthetic rows to predict for")
+    timeline.add_argument("--counties", type=int, default=3_000, help="Counties with fires in the training set")
+    timeline.set_defaults(func=bench_timeline)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+# Replay the WatchDuty changelogs into per-entity state timelines.
+#
+# geo_events_geoeventchangelog and evacuation_zones_gis_evaczonechangelog store one row per edit, with
+# a JSON "changes" object of {field: [old, new]}. Only a handful of fields matter for recovery timelines,
+# so the replay works in one streaming pass over each file:
+#   1. read it in chunks, decode each distinct JSON string once (skipping ones that can't mention a
+#      tracked field) and keep only (entity, time, field, new value) as four NumPy arrays
+#   2. sort those compact arrays by (entity, field, time)
+#   3. replay them with array operations: drop repeated values per entity to get state steps, and reduce
+#      the steps to one row of features per entity
+# Memory is bounded by the compact arrays (a few bytes per tracked change), never by the raw JSON.
+#
+#   steps, features = replay_geoevent_changelog("./data/geo_events_geoeventchangelog.csv")
+#   intervals, summary = replay_evac_changelog("./data/evacuation_zones_gis_evaczonechangelog.csv")
+import json
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+GEOEVENT_CHANGELOG = "geo_events_geoeventchangelog.csv"
+EVAC_CHANGELOG = "evacuation_zones_gis_evaczonechangelog.csv"
+EVAC_ZONES = "evacuation_zones_gis_evaczone.csv"
+
+# Tracked geoevent fields, in field-code order. Radio-traffic levels are stored as their rank (1 = mildest).
+GEOEVENT_FIELDS = ["containment", "is_fps", "radio_traffic_indicates_structure_threat",
+                   "radio_traffic_indicates_rate_of_spread", "radio_traffic_indicates_spotting"]
+RATE_OF_SPREAD_LEVELS = ["slow", "moderate", "rapid", "very_rapid", "extreme"]
+SPOTTING_LEVELS = ["short_range", "medium_range", "long_range"]
+EVAC_STATUSES = ["order", "warning", "advisory"]   # code 0 = no status
+
+_TRUE = {"true", "1", "yes", "t"}
+
+
+# New value of a field in one decoded "changes" object. Geoevent fields like containment and is_fps
+# can also arrive inside a changed "data" object.
+def _new_value(changes: dict, field: str):
+    if field in changes:
+        value = changes[field]
+    elif isinstance(changes.get("data"), list) and changes["data"]:
+        data = changes["data"][-1]
+        if isinstance(data, str):
+            try:
+                data = json.loads(data)
+            except (json.JSONDecodeError, TypeError):
+                return None
+        if not isinstance(data, dict) or field not in data:
+            return None
+        return data[field]
+    else:
+        return None
+    # [old, new], and occasionally [old, [new]]
+    if isinstance(value, list):
+        value = value[-1] if value else None
+        if isinstance(value, list):
+            value = value[-1] if value else None
+    return value
+
+
+def _as_number(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _as_flag(value) -> float:
+    if isinstance(value, bool):
+        return float(value)
+    if value is None:
+        return 0.0
+    return float(str(value).strip().lower() in _TRUE)
+
+
+# Level position + 1, 0 for blank; values outside levels map to `unknown` (NaN: the change is ignored)
+def _as_rank(levels, unknown: float = np.nan):
+    def rank(value) -> float:
+        if value is None or str(value).strip() == "":
+            return 0.0
+        name = str(value).strip().lower()
+        return float(levels.index(name) + 1) if name in levels else unknown
+    return rank
+
+
+GEOEVENT_PARSERS = [_as_number, _as_flag, _as_flag, _as_rank(RATE_OF_SPREAD_LEVELS), _as_rank(SPOTTING_LEVELS)]
+EVAC_PARSERS = [_as_rank(EVAC_STATUSES, unknown=0.0)]   # e.g. "normal" lifts the zone's status
+
+
+# Tracked (field code, value) pairs in one "changes" JSON string; [] if it mentions none of them
+def _parse_changes(text: str, fields, parsers, mentions) -> list:
+    if not isinstance(text, str) or mentions.search(text) is None:
+        return []
+    try:
+        changes = json.loads(text)
+    except (json.JSONDecodeError, TypeError):
+        return []
+    if not isinstance(changes, dict):
+        return []
+    pairs = []
+    for code, (field, parse) in enumerate(zip(fields, parsers)):
+        value = _new_value(changes, field)
+        if value is None and field not in changes:
+            continue
+        pairs.append((code, parse(value)))
+    return pairs
+
+
+# Pass 1: stream a changelog and keep (entity, time in ns, field code, value) for tracked fields.
+# Each distinct "changes" string in a chunk is decoded once (field edits like {"is_fps": [false, true]}
+# repeat a lot), and its pairs are broadcast to the rows that carry it.
+# Also returns each entity's first and last changelog time (any field) as a DataFrame with "first"
+# and "last" columns, for "hours since first seen" features and the end of the log.
+def extract_changes(path, entity_column: str, fields, parsers, chunksize: int = 200_000):
+    mentions = re.compile("|".join(re.escape(f'"{field}"') for field in fields + ["data"]))
+    entities, times, codes, values = [], [], [], []
+    seen = []
+
+    with pd.read_csv(path, usecols=[entity_column, "date_created", "changes"], chunksize=chunksize) as reader:
+        for chunk in reader:
+            when = pd.to_datetime(chunk["date_created"], errors="coerce", utc=True, format="ISO8601")
+            chunk = chunk[chunk[entity_column].notna() & when.notna()]
+            entity = chunk[entity_column].to_numpy().astype(np.int64)
+            ns = when[chunk.index].dt.tz_localize(None).to_numpy(dtype="datetime64[ns]").view(np.int64)
+            seen.append(pd.Series(ns).groupby(entity).agg(["min", "max"]))
+
+            row_unique, uniques = pd.factorize(chunk["changes"])
+            parsed = [_parse_changes(text, fields, parsers, mentions) for text in uniques]
+            per_unique = np.array([len(pairs) for pairs in parsed] + [0], dtype=np.int64)   # last slot: missing (-1)
+            pair_codes = np.array([code for pairs in parsed for code, _ in pairs], dtype=np.int8)
+            pair_values = np.array([value for pairs in parsed for _, value in pairs], dtype=np.float64)
+            pair_starts = np.r_[0, np.cumsum(per_unique)[:-1]]
+
+            # Broadcast each distinct string's pairs to its rows
+            counts = per_unique[row_unique]
+            rows = np.repeat(np.arange(len(chunk)), counts)
+            offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            pair = np.repeat(pair_starts[row_unique], counts) + offsets
+            entities.append(entity[rows])
+            times.append(ns[rows])
+            codes.append(pair_codes[pair] if len(pair_codes) else np.empty(0, np.int8))
+            values.append(pair_values[pair] if len(pair_values) else np.empty(0))
+
+    if seen:
+        combined = pd.concat(seen).groupby(level=0)
+        seen = pd.DataFrame({"first": combined["min"].min(), "last": combined["max"].max()})
+    else:
+        seen = pd.DataFrame({"first": pd.Series(dtype=np.int64), "last": pd.Series(dtype=np.int64)})
+    if not entities:
+        return (np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.int8), np.empty(0), seen)
+    return np.concatenate(entities), np.concatenate(times), np.concatenate(codes), np.concatenate(values), seen
+
+
+# Pass 2 + 3 shared step: drop unparseable values, sort by (entity, field, time) and drop rows that
+# repeat the previous value of the same entity and field. Returns the rest as a DataFrame of state steps.
+def state_steps(entities, times, codes, values, entity_column: str, fields) -> pd.DataFrame:
+    valid = ~np.isnan(values)
+    entities, times, codes, values = entities[valid], times[valid], codes[valid], values[valid]
+    order = np.lexsort((times, codes, entities))
+    entities, times, codes, values = entities[order], times[order], codes[order], values[order]
+    same_series = np.r_[False, (entities[1:] == entities[:-1]) & (codes[1:] == codes[:-1])]
+    keep = ~(same_series & np.r_[False, values[1:] == values[:-1]])
+    return pd.DataFrame({
+        entity_column: entities[keep],
+        "date_created": times[keep].astype("datetime64[ns]"),
+        "field": pd.Categorical.from_codes(codes[keep], categories=fields),
+        "value": values[keep],
+    })
+
+
+# First time per entity at which a field's value satisfies cond (NaT if never)
+def _first_time(steps: pd.DataFrame, entity_column: str, field: str, cond) -> pd.Series:
+    rows = steps[(steps["field"] == field) & cond(steps["value"])]
+    return rows.groupby(entity_column, sort=False)["date_created"].min()
+
+
+# Per-geoevent containment, FPS, structure-threat, rate-of-spread and spotting timelines.
+# Returns (steps, features): steps has one row per state change; features one row per geo_event_id:
+#   first_seen, containment_final, containment_max, hours_to_contained (100%), hours_to_fps,
+#   structure_threat, hours_to_structure_threat, max_rate_of_spread, max_spotting
+def replay_geoevent_changelog(path, chunksize: int = 200_000):
+    entities, times, codes, values, seen = extract_changes(
+        path, "geo_event_id", GEOEVENT_FIELDS, GEOEVENT_PARSERS, chunksize)
+    steps = state_steps(entities, times, codes, values, "geo_event_id", GEOEVENT_FIELDS)
+
+    first_seen = pd.Series(seen["first"].to_numpy().astype("datetime64[ns]"), index=seen.index.astype(np.int64))
+    features = pd.DataFrame({"first_seen": first_seen})
+    features.index.name = "geo_event_id"
+
+    def hours_since_first(at: pd.Series) -> pd.Series:
+        return (at - features["first_seen"].reindex(at.index)) / pd.Timedelta(hours=1)
+
+    containment = steps[steps["field"] == "containment"].groupby("geo_event_id", sort=False)["value"]
+    features["containment_final"] = containment.last()
+    features["containment_max"] = containment.max()
+    features["hours_to_contained"] = hours_since_first(
+        _first_time(steps, "geo_event_id", "containment", lambda v: v >= 100))
+    features["hours_to_fps"] = hours_since_first(_first_time(steps, "geo_event_id", "is_fps", lambda v: v > 0))
+    threat_at = _first_time(steps, "geo_event_id", "radio_traffic_indicates_structure_threat", lambda v: v > 0)
+    features["structure_threat"] = features.index.isin(threat_at.index)
+    features["hours_to_structure_threat"] = hours_since_first(threat_at)
+
+    for field, column, levels in [("radio_traffic_indicates_rate_of_spread", "max_rate_of_spread", RATE_OF_SPREAD_LEVELS),
+                                  ("radio_traffic_indicates_spotting", "max_spotting", SPOTTING_LEVELS)]:
+        top = steps[steps["field"] == field].groupby("geo_event_id", sort=False)["value"].max()
+        top = top[top > 0].astype(np.int64)
+        features[column] = pd.Categorical.from_codes(
+            top.reindex(features.index, fill_value=0).to_numpy() - 1, categories=levels)
+    return steps, features
+
+
+# Per-zone evacuation status intervals and durations.
+# Returns (intervals, summary): intervals has one row per status period (start, end, hours, is_open);
+# a period still open at the end of the log ends at the log's last timestamp. summary has one row per
+# evac_zone_id with hours spent under each status, the first order time and order_open (the zone was
+# still under an order at the end of the log).
+def replay_evac_changelog(path, chunksize: int = 200_000):
+    entities, times, codes, values, seen = extract_changes(
+        path, "evac_zone_id", ["status"], EVAC_PARSERS, chunksize)
+    steps = state_steps(entities, times, codes, values, "evac_zone_id", ["status"])
+    snapshot_end = np.datetime64(int(seen["last"].max()) if len(seen) else 0, "ns")
+
+    zone = steps["evac_zone_id"].to_numpy()
+    start = steps["date_created"].to_numpy()
+    next_same_zone = np.r_[zone[1:] == zone[:-1], False]
+    end = np.where(next_same_zone, np.r_[start[1:], start[:1]], snapshot_end)
+    status_code = steps["value"].to_numpy().astype(np.int64)
+    intervals = pd.DataFrame({
+        "evac_zone_id": zone,
+        "status": pd.Categorical.from_codes(status_code, categories=["none"] + EVAC_STATUSES),
+        "start": start,
+        "end": end,
+        "hours": (end - start) / np.timedelta64(1, "h"),
+        "is_open": ~next_same_zone,
+    })
+
+    summary = intervals.pivot_table(index="evac_zone_id", columns="status", values="hours", aggfunc="sum",
+                                    fill_value=0.0, observed=False)
+    summary = summary.reindex(columns=EVAC_STATUSES, fill_value=0.0).add_prefix("hours_")
+    summary.columns.name = None
+    orders = intervals[intervals["status"] == "order"]
+    summary["first_order_at"] = orders.groupby("evac_zone_id")["start"].min()
+    summary["order_open"] = summary.index.isin(orders.loc[orders["is_open"], "evac_zone_id"])
+    return intervals, summary
+
+
+# geo_event_id each row of a combined WatchDuty frame belongs to (NaN if none): geoevent rows are keyed
+# by their own id, other rows (perimeters, changelogs) by their geo_event_id column
+def row_geo_event_ids(df: pd.DataFrame) -> pd.Series:
+    key = pd.Series(np.nan, index=df.index)
+    if "geo_event_id" in df.columns:
+        key = pd.to_numeric(df["geo_event_id"], errors="coerce")
+    if "id" in df.columns and "_source_file" in df.columns:
+        is_event = (df["_source_file"] == "geo_events_geoevent.csv").to_numpy(dtype=bool)
+        key = key.where(~is_event, pd.to_numeric(df["id"], errors="coerce"))
+    return key
+
+
+# evac_zone_id each row of a combined WatchDuty frame belongs to (NaN if none): evac zone rows are keyed
+# by their own id, changelog rows by their evac_zone_id column
+def row_evac_zone_ids(df: pd.DataFrame) -> pd.Series:
+    key = pd.Series(np.nan, index=df.index)
+    if "evac_zone_id" in df.columns:
+        key = pd.to_numeric(df["evac_zone_id"], errors="coerce")
+    if "id" in df.columns and "_source_file" in df.columns:
+        is_zone = (df["_source_file"] == EVAC_ZONES).to_numpy(dtype=bool)
+        key = key.where(~is_zone, pd.to_numeric(df["id"], errors="coerce"))
+    return key
+
+
+# Per-zone evac summary for compute_recovery_features, or None if the changelog isn't in data_dir
+def load_evac_summary(data_dir: str = "./data"):
+    path = Path(data_dir) / EVAC_CHANGELOG
+    if not path.exists():
+        return None
+    _, summary = replay_evac_changelog(path)
+    print(f"Replayed evac zone changelog: status durations for {len(summary):,} zones")
+    return summary
+
+
+# Geoevent features for compute_recovery_features, or None if the changelog isn't in data_dir
+def load_timelines(data_dir: str = "./data"):
+    path = Path(data_dir) / GEOEVENT_CHANGELOG
+    if not path.exists():
+        return None
+    _, features = replay_geoevent_changelog(path)
+    print(f"Replayed geoevent changelog: timelines for {len(features):,} geo events")
+    return features
@@ -2,20 +2,89 @@
 
 # Data manipulation, feature engineering, and Pinecone upload for wildfire narratives.
 import argparse
+import hashlib
 import json
 import os
+import re
 import sys
+import time
 from pathlib import Path
+import numpy as np
 import pandas as pd
 
+from changelog_replay import load_evac_summary, load_timelines, row_evac_zone_ids, row_geo_event_ids
+from embedding_cache import EmbeddingCache
+from embedding_service import LazyEmbeddingModel, mode_suffix
+from local_index import LocalIndex
+from metadata_store import MetadataStore
+from parallel_encode import encode_parallel
+from query_cache import QueryCache
+from timeline_model import TIMELINE_MODEL_PATH, TimelineModel
+from upsert_pipeline import UpsertPipeline
+
+PROCESS_START = time.perf_counter()   # for the cold-start-to-first-result report in stage 5
 DEMO_MAX_ROWS_PER_FILE = 2000
 
+JINA_MODEL = "jinaai/jina-embeddings-v3"  # embedding model from HuggingFace
+# Cheaper encoding for CPU-only hosts: EMBED_DIMENSION keeps only the first 512/256/... of Jina's
+# Matryoshka dimensions, EMBED_QUANTIZE=int8 runs the model with int8 Linear layers.
+# Non-default modes get their own Pinecone index, local index and embedding cache (EMBED_MODE suffix).
+EMBED_DIMENSION = int(os.environ.get("EMBED_DIMENSION", 1024))
+EMBED_QUANTIZE = os.environ.get("EMBED_QUANTIZE", "")
+EMBED_MODE = mode_suffix(EMBED_DIMENSION, EMBED_QUANTIZE)   # "" for full 1024-d fp32
+EMBED_MODEL_KEY = JINA_MODEL + EMBED_MODE                    # cache key: model + encoding mode
+DIMENSION = EMBED_DIMENSION   # vector size stored in the index (must match Pinecone index setting)
+
 # Your Pinecone API key (set via: export PINECONE_API_KEY="your_key")
 PINECONE_API_KEY = os.environ.get("PINECONE_API_KEY", "")
-INDEX_NAME = "wildfire-narratives"   # name of your Pinecone index
-JINA_MODEL = "jinaai/jina-embeddings-v3"  # embedding model from HuggingFace
-DIMENSION = 1024   # vector size that Jina outputs (must match Pinecone index setting)
+INDEX_NAME = "wildfire-narratives" + EMBED_MODE   # name of your Pinecone index
+# "pinecone" or "local" (in-process NumPy index stored in LOCAL_INDEX_DIR, no network needed)
+VECTOR_BACKEND = os.environ.get("VECTOR_BACKEND", "pinecone")
+LOCAL_INDEX_DIR = os.environ.get("LOCAL_INDEX_DIR", "./.local_index" + EMBED_MODE)
+# Approximate search for the local backend: IVF lists are built once the index has IVF_MIN_VECTORS
+# vectors; each query scans IVF_NPROBE of the IVF_NLIST lists (0 = about 2*sqrt(vector count))
+IVF_MIN_VECTORS = 20_000
+IVF_NLIST = int(os.environ.get("IVF_NLIST", 0))
+IVF_NPROBE = int(os.environ.get("IVF_NPROBE", 8))
 TOP_K = 3          # number of search results to return
+QUERY_BATCH_SIZE = 32   # max queries encoded together by search_many
+# Query embeddings and top-k results for repeated questions (LRU, expires after a week)
+QUERY_CACHE_DIR = os.environ.get("QUERY_CACHE_DIR", "./.query_cache")
+QUERY_CACHE_SIZE = 1024
+# Local cache of passage embeddings, so --rebuild only encodes narratives it hasn't seen before
+EMBEDDING_CACHE_DIR = os.environ.get("EMBEDDING_CACHE_DIR", "./.embedding_cache" + EMBED_MODE)
+# Multi-process passage encoding: EMBED_WORKERS processes (1 = encode in this process) once at least
+# PARALLEL_MIN_TEXTS narratives need embedding; finished shards are checkpointed in EMBED_CHECKPOINT_DIR
+EMBED_WORKERS = int(os.environ.get("EMBED_WORKERS", 1))
+PARALLEL_MIN_TEXTS = 5_000
+EMBED_CHECKPOINT_DIR = os.environ.get("EMBED_CHECKPOINT_DIR", "./.embed_checkpoints")
+# Narrative text and fields live in a local Parquet store; index vectors only carry {"key": <int>}.
+# One store per backend ({backend} is filled in): a sync prunes the store to the index it just synced.
+METADATA_STORE_PATH = os.environ.get("METADATA_STORE_PATH", f"./.metadata{EMBED_MODE}/{{backend}}/narratives.parquet")
+# Filters become {"key": {"$in": [...]}} on the index; Pinecone accepts at most MAX_FILTER_KEYS values,
+# so broader filters fetch top_k * FILTER_OVERFETCH unfiltered matches and filter those instead, growing
+# the fetch FILTER_OVERFETCH-fold until top_k pass (Pinecone returns at most MAX_QUERY_TOP_K per query)
+MAX_FILTER_KEYS = 10_000
+FILTER_OVERFETCH = 20
+MAX_QUERY_TOP_K = 10_000
+# Uploads overlap with encoding: narratives are embedded ENCODE_CHUNK at a time while UPSERT_WORKERS
+# threads upsert the previous chunks' batches
+ENCODE_CHUNK = 1_000
+UPSERT_WORKERS = int(os.environ.get("UPSERT_WORKERS", 4))
+
+
+# Skip these columns because they contain huge geometry strings
+SKIP_COLS = {"geom", "geom_label"}
+
+
+# Shared read_csv options for one file: every column except the geometry ones, and at most max_rows rows
+def _csv_read_opts(csv_file: Path, max_rows: int = None) -> dict:
+    peek = pd.read_csv(csv_file, nrows=0)
+    usecols = [c for c in peek.columns if c not in SKIP_COLS]
+    read_opts = dict(usecols=usecols if usecols else None, low_memory=False, on_bad_lines="skip")
+    if max_rows is not None:
+        read_opts["nrows"] = max_rows
+    return read_opts
 
 
 # STAGE 1: Load all CSV files from ./data into one big dataframe
@@ -24,18 +93,11 @@ def load_all_csvs(data_dir: str = "./data") -> pd.DataFrame:
     if not data_path.exists():
         raise FileNotFoundError(f"Data directory not found: {data_dir}")
 
-    # Skip these columns because they contain huge geometry strings
-    SKIP_COLS = {"geom", "geom_label"}
     frames = []
 
     for csv_file in sorted(data_path.glob("*.csv")):
         try:
-            peek = pd.read_csv(csv_file, nrows=0)
-            usecols = [c for c in peek.columns if c not in SKIP_COLS]
-            read_opts = dict(usecols=usecols if usecols else None, low_memory=False, on_bad_lines="skip")
-            if DEMO_MAX_ROWS_PER_FILE is not None:
-                read_opts["nrows"] = DEMO_MAX_ROWS_PER_FILE
-            df = pd.read_csv(csv_file, **read_opts)
+            df = pd.read_csv(csv_file, **_csv_read_opts(csv_file, max_rows=DEMO_MAX_ROWS_PER_FILE))
             df["_source_file"] = csv_file.name
             frames.append(df)
         except Exception as e:
@@ -51,6 +113,25 @@ def load_all_csvs(data_dir: str = "./data") -> pd.DataFrame:
     return combined
 
 
+# STAGE 1 (streaming): Yield one frame per file per chunk instead of concatenating everything.
+# Each chunk only has its own file's columns, so there's no wide mostly-NaN frame. This is the
+# full-run path, so DEMO_MAX_ROWS_PER_FILE doesn't apply: every row of every file is read.
+def iter_csv_chunks(data_dir: str = "./data", chunksize: int = 50_000):
+    data_path = Path(data_dir)
+    if not data_path.exists():
+        raise FileNotFoundError(f"Data directory not found: {data_dir}")
+
+    for csv_file in sorted(data_path.glob("*.csv")):
+        try:
+            reader = pd.read_csv(csv_file, chunksize=chunksize, **_csv_read_opts(csv_file))
+            with reader:
+                for chunk in reader:
+                    chunk["_source_file"] = csv_file.name
+                    yield chunk
+        except Exception as e:
+            print(f"Warning: Could not load {csv_file.name}: {e}")
+
+
 # Safely convert a value to float without crashing
 def safe_float(val, default=None):
     if val is None or (isinstance(val, float) and pd.isna(val)):
@@ -95,9 +176,9 @@ def extract_wildfire_fields(row: pd.Series) -> dict:
     return {"acreage": acreage, "containment": containment, "has_evacuation": has_evacuation}
 
 
-# Classify fire size: low < 100 acres, medium < 10k, high = 10k+
+# Classify fire size: low < 100 acres, medium < 10k, high = 10k+ (unknown acreage, None or NaN, is low)
 def classify_severity(acreage) -> str:
-    if acreage is None:
+    if acreage is None or pd.isna(acreage):
         return "low"
     if acreage < 100:
         return "low"
@@ -107,10 +188,11 @@ def classify_severity(acreage) -> str:
 
 
 # Estimate how disruptive the fire was based on containment % and evacuations
+# (unknown containment, None or NaN, is medium)
 def estimate_disruption(containment, has_evacuation: bool) -> str:
     if has_evacuation:
         return "high"
-    if containment is None:
+    if containment is None or pd.isna(containment):
         return "medium"
     if containment >= 90:
         return "low"
@@ -119,8 +201,146 @@ def estimate_disruption(containment, has_evacuation: bool) -> str:
     return "high"
 
 
+# Parse one "data" JSON value into (acreage, containment, has_evacuation), or None if it isn't usable
+def _parse_wildfire_data(data):
+    if isinstance(data, str):
+        try:
+            data = json.loads(data)
+        except (json.JSONDecodeError, TypeError):
+            return None
+    if not isinstance(data, dict):
+        return None
+    evac_orders = data.get("evacuation_orders")
+    evac_warnings = data.get("evacuation_warnings")
+    evac_notes = data.get("evacuation_notes")
+    has_evacuation = bool(evac_orders or evac_warnings or (evac_notes and str(evac_notes).strip()))
+    return safe_float(data.get("acreage")), safe_float(data.get("containment")), has_evacuation
+
+
+# Run safe_float once per distinct value of a column; returns (values, found) arrays aligned to the rows
+def _column_to_float(col: pd.Series):
+    if pd.api.types.is_numeric_dtype(col) and not pd.api.types.is_bool_dtype(col):
+        values = col.to_numpy(dtype="float64", na_value=np.nan)
+        return values, ~np.isnan(values)
+    codes, uniques = pd.factorize(col)
+    parsed = [safe_float(v) for v in uniques] + [None]   # trailing None is the slot for missing (code -1)
+    values = np.array([np.nan if v is None else v for v in parsed], dtype="float64")[codes]
+    found = np.array([v is not None for v in parsed], dtype=bool)[codes]
+    return values, found
+
+
+# Columnar version of extract_wildfire_fields: each distinct "data" string is JSON-decoded once
+def extract_wildfire_columns(df: pd.DataFrame) -> dict:
+    n = len(df)
+    acreage = np.full(n, np.nan)
+    acreage_found = np.zeros(n, dtype=bool)
+    containment = np.full(n, np.nan)
+    containment_found = np.zeros(n, dtype=bool)
+    has_evacuation = np.zeros(n, dtype=bool)
+
+    if "data" in df.columns:
+        codes, uniques = pd.factorize(df["data"])
+        parsed = [_parse_wildfire_data(v) for v in uniques] + [None]
+        acre_u = [p[0] if p is not None else None for p in parsed]
+        cont_u = [p[1] if p is not None else None for p in parsed]
+        acreage = np.array([np.nan if v is None else v for v in acre_u], dtype="float64")[codes]
+        acreage_found = np.array([v is not None for v in acre_u], dtype=bool)[codes]
+        containment = np.array([np.nan if v is None else v for v in cont_u], dtype="float64")[codes]
+        containment_found = np.array([v is not None for v in cont_u], dtype=bool)[codes]
+        has_evacuation = np.array([p is not None and p[2] for p in parsed], dtype=bool)[codes]
+
+    # Fall back to source_acres column if no acreage found yet
+    if "source_acres" in df.columns:
+        values, found = _column_to_float(df["source_acres"])
+        fill = ~acreage_found & found
+        acreage[fill] = values[fill]
+        acreage_found |= fill
+
+    # If it's a FEMA fire declaration with no acreage, use 5000 as a placeholder
+    placeholder = np.zeros(n, dtype=bool)
+    if "incidentType" in df.columns:
+        is_fire = (df["incidentType"].astype(str).str.strip().str.upper() == "FIRE").to_numpy(dtype=bool, na_value=False)
+        placeholder = ~acreage_found & is_fire
+        acreage[placeholder] = 5000
+        acreage_found |= placeholder
+
+    return {
+        "acreage": acreage, "acreage_found": acreage_found, "acreage_is_placeholder": placeholder,
+        "containment": containment, "containment_found": containment_found,
+        "has_evacuation": has_evacuation,
+    }
+
+
+# STAGE 2 helper: Changelog features (see changelog_replay.py) for each row's entity, given the row keys
+# (row_geo_event_ids or row_evac_zone_ids). Rows without a key, or whose entity has no changelog, get
+# all-NaN features.
+def _row_changelog_features(key: pd.Series, table: pd.DataFrame) -> pd.DataFrame:
+    positions = np.full(len(key), -1)
+    valid = key.notna().to_numpy()
+    positions[valid] = table.index.get_indexer(key[valid].astype("int64"))
+    return table.reset_index(drop=True).reindex(positions)
+
+
 # STAGE 2: Add severity and disruption columns to the dataframe
-def compute_recovery_features(df: pd.DataFrame) -> pd.DataFrame:
+# Without timelines, output matches compute_recovery_features_rowwise exactly, including its dtypes: a
+# column with no values at all stays an object column of None (float64 on an empty frame, like the
+# reference), and missing values in a float column are NaN. Buckets are decided per row (missing acreage
+# is low severity, missing containment medium disruption), so a row gets the same buckets whether it's
+# processed in one frame or in per-file chunks.
+# With timelines (changelog_replay.load_timelines), rows whose "data" has no containment take their
+# fire's last containment from the changelog, and the timeline features are added as columns.
+# With evac_summary (changelog_replay.load_evac_summary), evac zone rows get their zone's hours under an
+# order / warning / advisory and whether the order was still in place at the end of the log.
+def compute_recovery_features(df: pd.DataFrame, timelines: pd.DataFrame = None,
+                              evac_summary: pd.DataFrame = None) -> pd.DataFrame:
+    fields = extract_wildfire_columns(df)
+    n = len(df)
+    events = _row_changelog_features(row_geo_event_ids(df), timelines) if timelines is not None else None
+    df = df.copy()
+
+    if evac_summary is not None:
+        zones = _row_changelog_features(row_evac_zone_ids(df), evac_summary)
+        df["_evac_order_hours"] = zones["hours_order"].to_numpy()
+        df["_evac_warning_hours"] = zones["hours_warning"].to_numpy()
+        df["_evac_advisory_hours"] = zones["hours_advisory"].to_numpy()
+        df["_evac_order_open"] = zones["order_open"].fillna(False).to_numpy(dtype=bool)
+
+    if events is not None:
+        replayed = events["containment_final"].to_numpy(dtype="float64")
+        fill = ~fields["containment_found"] & ~np.isnan(replayed)
+        fields["containment"][fill] = replayed[fill]
+        fields["containment_found"] |= fill
+        df["_hours_to_contained"] = events["hours_to_contained"].to_numpy()
+        df["_hours_to_fps"] = events["hours_to_fps"].to_numpy()
+        df["_structure_threat"] = events["structure_threat"].fillna(False).to_numpy(dtype=bool)
+        df["_max_rate_of_spread"] = events["max_rate_of_spread"].to_numpy()
+
+    acreage, found = fields["acreage"], fields["acreage_found"]
+    if n == 0:
+        df["_acreage"] = acreage
+    elif not found.any():
+        df["_acreage"] = np.full(n, None, dtype=object)
+    elif found.all() and fields["acreage_is_placeholder"].all():
+        df["_acreage"] = acreage.astype("int64")
+    else:
+        df["_acreage"] = acreage
+
+    containment = fields["containment"]
+    no_containment = n > 0 and not fields["containment_found"].any()
+    df["_containment"] = np.full(n, None, dtype=object) if no_containment else containment
+    df["_has_evacuation"] = fields["has_evacuation"]
+
+    df["severity"] = np.select([np.isnan(acreage) | (acreage < 100), acreage < 10000], ["low", "medium"], "high")
+    df["disruption"] = np.select(
+        [fields["has_evacuation"], np.isnan(containment), containment >= 90, containment >= 50],
+        ["high", "medium", "low", "medium"],
+        "high",
+    )
+    return df
+
+
+# Row-wise reference implementation of STAGE 2 (kept for benchmark.py and equivalence checks)
+def compute_recovery_features_rowwise(df: pd.DataFrame) -> pd.DataFrame:
     extracted = df.apply(extract_wildfire_fields, axis=1)
     df = df.copy()
     df["_acreage"] = [e["acreage"] for e in extracted]
@@ -131,60 +351,209 @@ def compute_recovery_features(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-# STAGE 3: Build a plain-English narrative for each row using templates (no LLM)
-def generate_recovery_narrative(row: pd.Series) -> str:
-    severity = row.get("severity", "low")
-    disruption = row.get("disruption", "medium")
-    acreage = row.get("_acreage")
-    name = row.get("name", row.get("declarationTitle", row.get("source_incident_name", "Wildfire event")))
-    acreage_val = acreage if acreage is not None and not (isinstance(acreage, float) and pd.isna(acreage)) else 0
+# STAGE 3 templates: sentence text for each severity/disruption bucket
+SEVERITY_SUMMARY = {
+    "high": "A high-severity wildfire event ({}). Significant resource impact and infrastructure damage likely.",
+    "medium": "A medium-severity wildfire ({}). Moderate property and ecosystem impact expected.",
+    "low": "A low-severity incident ({}). Limited spread; localized impact.",
+}
+HOUSING_TEXT = {
+    "high": "Likely displacement and elevated housing pressure. Temporary shelters and alternate housing may be needed.",
+    "medium": "Some displacement possible. Housing availability may be strained in affected areas.",
+    "low": "Minimal displacement expected. Housing market impact likely contained.",
+}
+TIMELINE_TEXT = {
+    "long": "Recovery timeline: 12-24+ months for full restoration.",
+    "medium": "Recovery timeline: 6-12 months typical for stabilization.",
+    "short": "Recovery timeline: 1-3 months for return to normalcy.",
+}
+# With a fitted timeline model (timeline_model.py), a containment outlook follows the recovery timeline:
+# the county's own milestones when it has fires in the model, otherwise the nationwide ones
+CONTAINMENT_ESTIMATE = {
+    True: ("Containment outlook: similar fires in this county were fully contained about {} after forward "
+           "progress stopped (typically {}-{} days)."),
+    False: ("Containment outlook: nationwide, similar fires were fully contained about {} after forward "
+            "progress stopped (typically {}-{} days)."),
+}
+EVAC_LIFT_ESTIMATE = " Evacuation orders have typically been lifted after about {}."
+INSURANCE_TEXT = {
+    "severe": "Expect significant insurance claim volume and potential processing delays. Documentation and FEMA/state assistance programs may help.",
+    "delayed": "Insurance claims may face delays. Contact insurer early; keep records of evacuation and losses.",
+    "standard": "Standard claim processes apply. Document any damage for claims.",
+}
 
-    # Describe fire size
+
+# Describe fire size, e.g. "1,200+ acres burned" (severity must already be high/medium/low)
+def format_acres(severity: str, acreage_val) -> str:
     if severity == "high":
-        acres_str = f"{acreage_val:,.0f}+ acres burned" if acreage_val else "large-scale fire"
-        sev_summary = f"A high-severity wildfire event ({acres_str}). Significant resource impact and infrastructure damage likely."
-    elif severity == "medium":
-        acres_str = f"{acreage_val:,.0f} acres" if acreage_val else "moderate spread"
-        sev_summary = f"A medium-severity wildfire ({acres_str}). Moderate property and ecosystem impact expected."
-    else:
-        acres_str = f"{acreage_val:.0f} acres or less" if acreage_val is not None else "limited scope"
-        sev_summary = f"A low-severity incident ({acres_str}). Limited spread; localized impact."
-
-    # Describe housing/displacement impact
-    if disruption == "high":
-        housing = "Likely displacement and elevated housing pressure. Temporary shelters and alternate housing may be needed."
-    elif disruption == "medium":
-        housing = "Some displacement possible. Housing availability may be strained in affected areas."
-    else:
-        housing = "Minimal displacement expected. Housing market impact likely contained."
+        return f"{acreage_val:,.0f}+ acres burned" if acreage_val else "large-scale fire"
+    if severity == "medium":
+        return f"{acreage_val:,.0f} acres" if acreage_val else "moderate spread"
+    return f"{acreage_val:.0f} acres or less" if acreage_val is not None else "limited scope"
+
+
+# Housing, timeline and insurance sentences, which depend only on the two buckets
+# (plus the timeline model's containment outlook, if one is passed in)
+def narrative_tail(severity: str, disruption: str, outlook: str = None) -> str:
+    housing = HOUSING_TEXT[disruption]
 
     # Estimate how long recovery will take
     if severity == "high" and disruption == "high":
-        timeline = "Recovery timeline: 12-24+ months for full restoration."
+        timeline = TIMELINE_TEXT["long"]
     elif severity in ("high", "medium") or disruption == "high":
-        timeline = "Recovery timeline: 6-12 months typical for stabilization."
+        timeline = TIMELINE_TEXT["medium"]
     else:
-        timeline = "Recovery timeline: 1-3 months for return to normalcy."
+        timeline = TIMELINE_TEXT["short"]
+    if outlook is not None:
+        timeline += " " + outlook
 
     # Describe insurance situation
     if severity == "high":
-        insurance = "Expect significant insurance claim volume and potential processing delays. Documentation and FEMA/state assistance programs may help."
+        insurance = INSURANCE_TEXT["severe"]
     elif disruption == "high":
-        insurance = "Insurance claims may face delays. Contact insurer early; keep records of evacuation and losses."
+        insurance = INSURANCE_TEXT["delayed"]
     else:
-        insurance = "Standard claim processes apply. Document any damage for claims."
+        insurance = INSURANCE_TEXT["standard"]
+
+    return " ".join([housing, timeline, insurance])
+
+
+# Columns an event label is taken from: the first one with a non-blank value in the row, else "Event"
+LABEL_COLUMNS = ["name", "declarationTitle", "source_incident_name"]
+
+
+# STAGE 3: Build a plain-English narrative for each row using templates (no LLM)
+def generate_recovery_narrative(row: pd.Series) -> str:
+    severity = row.get("severity", "low")
+    disruption = row.get("disruption", "medium")
+    acreage = row.get("_acreage")
+    labels = (row.get(c) for c in LABEL_COLUMNS)
+    name = next((v for v in labels if v is not None and pd.notna(v) and str(v).strip()), None)
+    acreage_val = acreage if acreage is not None and not (isinstance(acreage, float) and pd.isna(acreage)) else 0
 
-    event_label = name if pd.notna(name) and str(name).strip() else "Event"
-    return f"[{event_label}] " + " ".join([sev_summary, housing, timeline, insurance])
+    # Anything that isn't high/medium gets the low-bucket text
+    severity = severity if severity in ("high", "medium") else "low"
+    disruption = disruption if disruption in ("high", "medium") else "low"
+    sev_summary = SEVERITY_SUMMARY[severity].format(format_acres(severity, acreage_val))
 
+    event_label = name if name is not None else "Event"
+    return f"[{event_label}] " + " ".join([sev_summary, narrative_tail(severity, disruption)])
 
-# STAGE 4 helper: Load Jina embedding model from HuggingFace (runs locally, no API key needed)
-def load_embedding_model():
-    print("Loading Jina embedding model (downloads ~2GB on first run)...")
-    from sentence_transformers import SentenceTransformer
-    model = SentenceTransformer(JINA_MODEL, trust_remote_code=True)
-    print("Model loaded.\n")
-    return model
+
+BUCKETS = ["high", "medium", "low"]
+
+
+# Whole days for a narrative, e.g. "3 days" ("1 day" for anything under a day and a half)
+def format_days(hours: float) -> str:
+    days = max(1, round(hours / 24))
+    return "1 day" if days == 1 else f"{days} days"
+
+
+# STAGE 3 helper: Containment outlook per row from the timeline model, as (codes, sentences);
+# code -1 means no estimate (the row only has the bucket text). The sentence says whether it comes
+# from the row's county or the nationwide prior, and the evac sentence is only added for rows with
+# evacuations. Predictions are rounded to whole days first, so each distinct sentence is rendered once.
+def timeline_estimates(df: pd.DataFrame, sev: np.ndarray, model: TimelineModel):
+    hours, local = model.predict(model.row_fips(df), sev)
+    days = np.where(np.isfinite(hours), np.maximum(1, np.round(hours / 24)), -1).astype(np.int64)
+    has_evac = np.zeros(len(df), dtype=np.int64)
+    if "_has_evacuation" in df.columns and np.isfinite(model.evac_quantiles[1]):
+        has_evac = df["_has_evacuation"].fillna(False).to_numpy(dtype=bool).astype(np.int64)
+
+    parts = np.column_stack([days, local.astype(np.int64), has_evac])
+    keys, codes = np.unique(parts, axis=0, return_inverse=True)
+    codes = codes.reshape(-1)
+    sentences = []
+    for p25, p50, p75, county, evac in keys:
+        if p50 < 0:
+            sentences.append(None)
+            continue
+        sentence = CONTAINMENT_ESTIMATE[bool(county)].format(format_days(p50 * 24), p25, p75)
+        if evac:
+            sentence += EVAC_LIFT_ESTIMATE.format(format_days(float(model.evac_quantiles[1])))
+        sentences.append(sentence)
+    missing = np.array([s is None for s in sentences], dtype=bool)
+    return np.where(missing[codes], -1, codes), sentences
+
+
+# Map a severity/disruption column to 0/1/2 codes for BUCKETS (anything else counts as low)
+def _bucket_codes(df: pd.DataFrame, column: str, default: str) -> np.ndarray:
+    if column not in df.columns:
+        return np.full(len(df), BUCKETS.index(default))
+    values = df[column]
+    return np.select([values.eq("high").to_numpy(bool), values.eq("medium").to_numpy(bool)], [0, 1], 2)
+
+
+# STAGE 3 (vectorized): Same text as generate_recovery_narrative, returned as a categorical.
+# Each distinct (label, severity, acreage, disruption) combination is rendered once and every
+# identical narrative shares one category, so later dedupe and embedding work on the categories.
+# With a timeline_model, rows it has an estimate for also get a containment outlook after the recovery timeline.
+def render_recovery_narratives(df: pd.DataFrame, timeline_model: TimelineModel = None) -> pd.Series:
+    n = len(df)
+    sev = _bucket_codes(df, "severity", "low")
+    dis = _bucket_codes(df, "disruption", "medium")
+
+    # Event label per row (first non-blank LABEL_COLUMNS value), rendered once per distinct name
+    label = pd.Series(None, index=df.index, dtype=object)
+    for column in [c for c in LABEL_COLUMNS if c in df.columns]:
+        values = df[column].astype(object)
+        usable = values.notna() & values.astype(str).str.strip().ne("")
+        label = label.where(label.notna(), values.where(usable))
+    label_codes, uniques = pd.factorize(label)
+    labels = np.array([f"[{v}] " for v in uniques] + ["[Event] "], dtype=object)
+
+    # Severity summary, rendered once per distinct (acreage, severity) pair; missing acreage reads as 0
+    if "_acreage" in df.columns:
+        acre_codes, acre_uniques = pd.factorize(df["_acreage"])
+        acre_values = list(acre_uniques) + [0]
+    else:
+        acre_codes, acre_values = np.full(n, -1), [0]
+    acre_codes = np.where(acre_codes < 0, len(acre_values) - 1, acre_codes)
+    summary_codes, summary_keys = pd.factorize(acre_codes * 3 + sev)
+    summaries = np.array([
+        SEVERITY_SUMMARY[BUCKETS[k % 3]].format(format_acres(BUCKETS[k % 3], acre_values[k // 3])) + " "
+        for k in summary_keys
+    ], dtype=object)
+
+    # The 9 housing/timeline/insurance blocks, or one per distinct (buckets, timeline estimate)
+    tail_codes = sev * 3 + dis
+    tails = np.array([narrative_tail(s, d) for s in BUCKETS for d in BUCKETS], dtype=object)
+    if timeline_model is not None:
+        estimate_codes, sentences = timeline_estimates(df, sev, timeline_model)
+        width = len(sentences) + 1
+        tail_codes, tail_keys = pd.factorize(tail_codes * width + estimate_codes + 1)
+        tails = np.array([
+            narrative_tail(BUCKETS[k // width // 3], BUCKETS[k // width % 3], sentences[k % width - 1] if k % width else None)
+            for k in tail_keys
+        ], dtype=object)
+
+    # Dedupe on the component codes, render each distinct combination, then merge any that
+    # still produce the same text (e.g. 5.2 and 5.4 acres both read "5 acres or less")
+    label_codes = np.where(label_codes < 0, len(labels) - 1, label_codes).astype("int64")
+    combo = (label_codes * len(summaries) + summary_codes) * len(tails) + tail_codes
+    combo_codes, combo_keys = pd.factorize(combo)
+    combo_keys = np.asarray(combo_keys)
+    summary_of_combo = (combo_keys // len(tails)) % len(summaries)
+    rendered = labels[combo_keys // len(tails) // len(summaries)] + summaries[summary_of_combo] + tails[combo_keys % len(tails)]
+
+    text_codes, texts = pd.factorize(rendered)
+    return pd.Series(pd.Categorical.from_codes(text_codes[combo_codes], categories=texts), index=df.index)
+
+
+# STAGE 4 helper: Jina embedding model from HuggingFace (runs locally, no API key needed).
+# Uses a running embedding_service.py if there is one; otherwise loads in a background thread,
+# so nothing here blocks until the first encode(). With preload=False nothing loads until then:
+# when the corpus is encoded by EMBED_WORKERS processes, a parent copy would only sit in memory
+# next to the workers' copies until the search stage needs it.
+def load_embedding_model(preload: bool = True):
+    if preload:
+        print("Loading Jina embedding model in the background (downloads ~2GB on first run;")
+        print("run embeddings/embedding_service.py to keep it loaded between runs)...\n")
+    else:
+        print("Deferring the Jina embedding model load until it is first needed (worker processes encode the corpus).\n")
+    if EMBED_MODE:
+        print(f"Encoding mode: {EMBED_QUANTIZE or 'fp32'}, {DIMENSION}-d vectors.\n")
+    return LazyEmbeddingModel(JINA_MODEL, preload=preload, dimension=DIMENSION, quantize=EMBED_QUANTIZE)
 
 
 # STAGE 4 helper: Connect to Pinecone and return the index (creates it if it doesn't exist)
@@ -209,50 +578,274 @@ def get_pinecone_index():
     return pc.Index(INDEX_NAME)
 
 
-# STAGE 4 helper: Embed unique narratives and upload them to Pinecone
-def upload_to_pinecone(df: pd.DataFrame, model, index):
+# Stable vector ID derived from the narrative text, so re-runs map the same text to the same vector
+def narrative_id(text: str) -> str:
+    return "doc_" + hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+# Integer key for a narrative: the first 52 bits of its ID's hash, so it survives Pinecone's float metadata
+def narrative_key(doc_id: str) -> int:
+    return int(doc_id[4:17], 16)
+
+
+# STAGE 4 helper: Every narrative ID already stored in the index
+def list_index_ids(index) -> set:
+    ids = set()
+    for page in index.list(prefix="doc_"):
+        ids.update(page)
+    return ids
+
+
+# STAGE 4 helper: Delete vectors whose narrative no longer appears in the data
+def delete_orphans(index, orphan_ids):
+    orphan_ids = sorted(orphan_ids)
+    batch_size = 1000
+    for i in range(0, len(orphan_ids), batch_size):
+        index.delete(ids=orphan_ids[i:i + batch_size])
+    if orphan_ids:
+        print(f"Deleted {len(orphan_ids):,} orphaned vectors.\n")
+
+
+# STAGE 4 helper: Open the vector index for the chosen backend
+def get_index(backend: str = VECTOR_BACKEND):
+    if backend == "local":
+        index = LocalIndex(LOCAL_INDEX_DIR, DIMENSION, nprobe=IVF_NPROBE)
+        print(f"Using local index in {LOCAL_INDEX_DIR}.\n")
+        return index
+    if backend == "pinecone":
+        return get_pinecone_index()
+    raise ValueError(f"Unknown vector backend: {backend!r} (expected 'pinecone' or 'local')")
+
+
+# Identifies the current contents of the index, so cached query results can be dropped when it changes.
+# The local index tracks this itself; for Pinecone, every sync from this machine writes a new stamp.
+def index_version(index) -> str:
+    if isinstance(index, LocalIndex):
+        return index.version or "empty"
+    stamp_path = Path(QUERY_CACHE_DIR) / "pinecone_version"
+    stamp = stamp_path.read_text() if stamp_path.exists() else ""
+    return f"{INDEX_NAME}:{index.describe_index_stats()['total_vector_count']}:{stamp}"
+
+
+# STAGE 4 helper: Persist the index if the backend keeps it locally (Pinecone writes are already durable).
+# Large local indexes get an IVF structure, with its recall@TOP_K against exact search reported.
+def flush_index(index):
+    if not isinstance(index, LocalIndex):
+        Path(QUERY_CACHE_DIR).mkdir(parents=True, exist_ok=True)
+        (Path(QUERY_CACHE_DIR) / "pinecone_version").write_text(hashlib.sha256(os.urandom(16)).hexdigest()[:16])
+        return
+    count = index.describe_index_stats()["total_vector_count"]
+    if count >= IVF_MIN_VECTORS and not index.has_ivf:
+        print(f"Building IVF index over {count:,} vectors...")
+        index.build_ivf(IVF_NLIST or None)
+        r = index.measure_recall(TOP_K)
+        print(f"IVF: {r['nlist']} lists, nprobe={r['nprobe']}: recall@{TOP_K} = {r['recall']:.3f}, "
+              f"{r['approx_ms']:.2f} ms/query vs {r['exact_ms']:.2f} ms exact\n")
+    index.flush()
+
+
+# Metadata value for a number column: a float (so range filters work), or None when missing
+def _metadata_number(value):
+    value = safe_float(value)
+    return None if value is None or np.isnan(value) else value
+
+
+# STAGE 4 helper: Embed narratives, spreading big batches over EMBED_WORKERS processes
+def encode_passages(model, texts) -> np.ndarray:
+    # task="retrieval.passage" tells Jina these are documents (not queries)
+    if EMBED_WORKERS > 1 and len(texts) >= PARALLEL_MIN_TEXTS:
+        print(f"Encoding {len(texts):,} narratives with {EMBED_WORKERS} worker processes...")
+        return encode_parallel(texts, "retrieval.passage", JINA_MODEL, EMBED_QUANTIZE, DIMENSION,
+                               workers=EMBED_WORKERS, checkpoint_dir=EMBED_CHECKPOINT_DIR)
+    return model.encode(texts, task="retrieval.passage", show_progress_bar=True)
+
+
+# STAGE 4 helper: Metadata store rows (see metadata_store.py) for a frame of unique narratives
+def narrative_metadata(frame: pd.DataFrame, keys) -> pd.DataFrame:
+    column = lambda name: frame[name] if name in frame else pd.Series("", index=frame.index)
+    return pd.DataFrame({
+        "key": np.asarray(keys, dtype=np.int64),
+        "text": frame["recovery_narrative"].astype(str).to_numpy(),
+        "severity": column("severity").astype(str).to_numpy(),
+        "disruption": column("disruption").astype(str).to_numpy(),
+        "acreage": pd.to_numeric(column("_acreage").map(_metadata_number), errors="coerce").to_numpy(),
+        "source_file": column("_source_file").astype(str).to_numpy(),
+    })
+
+
+# STAGE 4 helper: Embed unique narratives, upload them to Pinecone and add their metadata to the store.
+# Vectors carry only {"key": narrative_key(id)}. Narratives whose ID is in skip_ids (already in the
+# index) are neither embedded nor uploaded. Returns the IDs of every narrative in df.
+def upload_to_pinecone(df: pd.DataFrame, model, index, store: MetadataStore, cache: EmbeddingCache = None,
+                       skip_ids=None) -> set:
     # Only embed unique narratives — many rows have identical text
     unique_df = df.drop_duplicates(subset=["recovery_narrative"]).reset_index(drop=True)
+    ids = [narrative_id(t) for t in unique_df["recovery_narrative"]]
+    if skip_ids:
+        keep = [i not in skip_ids for i in ids]
+        print(f"Unique narratives: {len(unique_df)} ({len(unique_df) - sum(keep)} already in index)")
+        unique_df = unique_df[keep].reset_index(drop=True)
+        new_ids = [i for i, k in zip(ids, keep) if k]
+    else:
+        new_ids = ids
     print(f"Unique narratives to embed: {len(unique_df)}")
 
     texts = unique_df["recovery_narrative"].tolist()
-    print("Embedding narratives...")
-    # task="retrieval.passage" tells Jina these are documents (not queries)
-    embeddings = model.encode(texts, task="retrieval.passage", show_progress_bar=True).tolist()
-
-    # Build list of vectors with metadata to store alongside each embedding
-    vectors = []
-    for i, (text, embedding, (_, row)) in enumerate(zip(texts, embeddings, unique_df.iterrows())):
-        vectors.append({
-            "id": f"doc_{i}",
-            "values": embedding,
-            "metadata": {
-                "text": text,
-                "severity": str(row.get("severity", "")),
-                "disruption": str(row.get("disruption", "")),
-                "acreage": str(row.get("_acreage", "")),
-                "source_file": str(row.get("_source_file", "")),
-            }
-        })
-
-    # Upload in batches of 100 (Pinecone's recommended batch size)
-    batch_size = 100
-    for i in range(0, len(vectors), batch_size):
-        batch = vectors[i:i + batch_size]
-        index.upsert(vectors=batch)
-        print(f"  Uploaded {min(i + batch_size, len(vectors))}/{len(vectors)} vectors")
-
-    print(f"\nUploaded {len(vectors)} vectors to Pinecone.\n")
-
-
-# STAGE 5 helper: Embed a query and find the most similar narratives in Pinecone
-def search(model, index, query: str):
-    # task="retrieval.query" tells Jina this is a search query (not a document)
-    query_vec = model.encode([query], task="retrieval.query")[0].tolist()
-    results = index.query(vector=query_vec, top_k=TOP_K, include_metadata=True)
+    print("Embedding and uploading narratives...")
+    encode = lambda batch: encode_passages(model, batch)
+    # One chunk for the worker pool, which pays its model-loading cost once per call
+    chunk_size = max(1, len(texts)) if EMBED_WORKERS > 1 else ENCODE_CHUNK
+    batch_size = 100   # Pinecone's recommended upsert batch size
+
+    with UpsertPipeline(index, workers=UPSERT_WORKERS, total=len(texts)) as uploader:
+        for start in range(0, len(texts), chunk_size):
+            chunk_texts = texts[start:start + chunk_size]
+            embeddings = cache.encode(chunk_texts, encode) if cache is not None else encode(chunk_texts)
+            chunk_ids = new_ids[start:start + chunk_size]
+            keys = [narrative_key(doc_id) for doc_id in chunk_ids]
+            store.add(narrative_metadata(unique_df.iloc[start:start + chunk_size], keys))
+            vectors = [{"id": doc_id, "values": embedding, "metadata": {"key": key}}
+                       for doc_id, key, embedding in zip(chunk_ids, keys, embeddings.tolist())]
+            for i in range(0, len(vectors), batch_size):
+                uploader.put(vectors[i:i + batch_size])
+
+    print(f"\n{uploader.report()}")
+    if uploader.failed:
+        print("Some batches could not be uploaded; run with --sync to retry just the missing narratives.")
+    print()
+    return set(ids)
+
+
+# STAGE 4 helper: IDs in the index whose metadata is in the store. Vectors uploaded before the store
+# existed carry their metadata inline; leaving them out of skip_ids re-upserts them keyed.
+def stored_ids(ids, store: MetadataStore) -> set:
+    return {doc_id for doc_id in ids if narrative_key(doc_id) in store}
+
+
+# STAGE 4 helper: Drop store rows for narratives no longer in the index, then write the store
+def save_metadata_store(store: MetadataStore, ids):
+    keep = {narrative_key(doc_id) for doc_id in ids}
+    store.delete([key for key in store.keys().tolist() if key not in keep])
+    store.save()
+    print(f"Metadata store: {len(store):,} narratives in {store.path}\n")
+
+
+# STAGE 4: Upload the narratives in df. With incremental=True only narratives missing from the
+# index are embedded and upserted; either way, vectors for narratives no longer in df are deleted.
+def sync_to_pinecone(df: pd.DataFrame, model, index, store: MetadataStore, cache: EmbeddingCache = None,
+                     incremental: bool = True):
+    existing = list_index_ids(index)
+    print(f"Index holds {len(existing):,} narrative vectors.")
+    skip = stored_ids(existing, store) if incremental else None
+    local = upload_to_pinecone(df, model, index, store, cache=cache, skip_ids=skip)
+    delete_orphans(index, existing - local)
+    save_metadata_store(store, local)
+    flush_index(index)
+
+
+# STAGES 1-4 (streaming): Run each CSV chunk through features, narratives and embedding, then drop it.
+# Peak memory is bounded by chunksize; only the IDs of narratives already handled are kept around.
+RECOVERY_COLUMNS = ["_source_file", "_acreage", "severity", "disruption", "recovery_narrative"]
+
+
+def iter_recovery_chunks(data_dir: str = "./data", chunksize: int = 50_000):
+    timelines = load_timelines(data_dir)
+    evac_summary = load_evac_summary(data_dir)
+    timeline_model = TimelineModel.load_if_exists(TIMELINE_MODEL_PATH)
+    for chunk in iter_csv_chunks(data_dir, chunksize):
+        chunk = compute_recovery_features(chunk, timelines, evac_summary)
+        chunk["recovery_narrative"] = render_recovery_narratives(chunk, timeline_model)
+        yield chunk[RECOVERY_COLUMNS]
+
+
+def stream_to_pinecone(model, index, store: MetadataStore, data_dir: str = "./data", chunksize: int = 50_000,
+                       cache: EmbeddingCache = None, incremental: bool = True):
+    existing = list_index_ids(index)
+    print(f"Index holds {len(existing):,} narrative vectors.")
+    current = stored_ids(existing, store)
+    seen = set()
+    rows = 0
+    for chunk in iter_recovery_chunks(data_dir, chunksize):
+        rows += len(chunk)
+        print(f"{chunk['_source_file'].iloc[0]}: {len(chunk):,} rows")
+        skip = (current | seen) if incremental else seen
+        seen |= upload_to_pinecone(chunk, model, index, store, cache=cache, skip_ids=skip)
+
+    print(f"Streamed {rows:,} records covering {len(seen):,} unique narratives.")
+    delete_orphans(index, existing - seen)
+    save_metadata_store(store, seen)
+    flush_index(index)
+
+
+# STAGE 5 helper: Embed one query, reusing a cached embedding when there is one
+def encode_query(model, query: str, cache: QueryCache = None):
+    vector = cache.get_embedding(query) if cache is not None else None
+    if vector is None:
+        # task="retrieval.query" tells Jina this is a search query (not a document)
+        vector = model.encode([query], task="retrieval.query")[0]
+        if cache is not None:
+            cache.put_embedding(query, vector)
+    return vector
+
+
+# STAGE 5 helper: Turn a metadata filter into a filter on vector keys, using the metadata store.
+# Returns None for no filter, {} when nothing matches, and "overfetch" when there are too many keys for
+# Pinecone; the matching key set comes back alongside.
+def key_filter(index, filter: dict, store: MetadataStore):
+    if not filter:
+        return None, None
+    keys = store.filter_keys(filter)
+    if not len(keys):
+        return {}, set()
+    if isinstance(index, LocalIndex) or len(keys) <= MAX_FILTER_KEYS:
+        return {"key": {"$in": keys.tolist()}}, None
+    return "overfetch", set(keys.tolist())
+
+
+# STAGE 5 helper: Top-k unfiltered matches whose key is allowed. The fetch grows until top_k pass, the
+# index runs out of vectors, or MAX_QUERY_TOP_K is reached; a shortfall is reported rather than hidden.
+def overfetch_query(index, vector, top_k: int, allowed: set) -> list:
+    fetch = min(top_k * FILTER_OVERFETCH, MAX_QUERY_TOP_K)
+    while True:
+        matches = index.query(vector=vector, top_k=fetch, include_metadata=True)["matches"]
+        kept = [m for m in matches if int((m["metadata"] or {}).get("key", -1)) in allowed]
+        if len(kept) >= top_k or len(matches) < fetch or fetch == MAX_QUERY_TOP_K:
+            break
+        fetch = min(fetch * FILTER_OVERFETCH, MAX_QUERY_TOP_K)
+    if len(kept) < top_k and len(matches) == fetch:
+        print(f"Warning: only {len(kept)} of the top {fetch:,} matches pass the filter "
+              f"({len(allowed):,} narratives match it); returning {len(kept)} of {top_k} results")
+    return kept[:top_k]
+
+
+# STAGE 5 helper: Top-k matches for one query vector (metadata still in index form, see store.resolve).
+# keys is key_filter's result for filter; callers querying many vectors pass it to compute it only once.
+def query_index(index, vector, top_k: int, filter: dict, store: MetadataStore, keys=None) -> list:
+    index_filter, allowed = keys if keys is not None else key_filter(index, filter, store)
+    if index_filter == {}:
+        return []
+    if index_filter == "overfetch":
+        return overfetch_query(index, vector, top_k, allowed)
+    return index.query(vector=vector, top_k=top_k, include_metadata=True, filter=index_filter)["matches"]
+
+
+# STAGE 5 helper: Embed a query and find the most similar narratives in Pinecone.
+# filter is a Pinecone-style metadata filter, e.g. {"severity": "high", "acreage": {"$gte": 1000}};
+# only vectors matching it are considered. With a cache, repeated questions skip the model
+# and the index entirely.
+def search(model, index, store: MetadataStore, query: str, filter: dict = None, cache: QueryCache = None):
+    matches = cache.get_results(query, filter, TOP_K) if cache is not None else None
+    if matches is None:
+        query_vec = encode_query(model, query, cache).tolist()
+        found = query_index(index, query_vec, TOP_K, filter, store)
+        matches = [{"id": m["id"], "score": m["score"], "metadata": meta} for m, meta in zip(found, store.resolve(found))]
+        if cache is not None:
+            cache.put_results(query, filter, TOP_K, matches)
 
     print(f"\n{'─' * 60}")
-    for i, match in enumerate(results["matches"]):
+    if filter:
+        print(f"Filter: {filter}  ({len(matches)} matches)")
+    for i, match in enumerate(matches):
         score = round(match["score"], 3)
         meta = match["metadata"]
         print(f"\n[{i+1}] Score: {score}  |  Severity: {meta.get('severity')}  |  Disruption: {meta.get('disruption')}")
@@ -260,16 +853,86 @@ def search(model, index, query: str):
     print(f"{'─' * 60}\n")
 
     # Return the matched texts so they can be passed to Groq later
-    return [m["metadata"].get("text", "") for m in results["matches"]]
+    return [m["metadata"].get("text", "") for m in matches]
+
+
+# STAGE 5 helper: Search for many queries at once. Queries are encoded in batches of batch_size
+# and scored with one index call per batch (one matrix product on the local backend).
+# Returns the matched texts for each query, in order.
+def search_many(model, index, store: MetadataStore, queries, filter: dict = None, top_k: int = TOP_K,
+                batch_size: int = QUERY_BATCH_SIZE, cache: QueryCache = None):
+    keys = key_filter(index, filter, store)
+    index_filter, _ = keys
+    docs = []
+    for start in range(0, len(queries), batch_size):
+        batch = list(queries[start:start + batch_size])
+        vectors = [cache.get_embedding(q) for q in batch] if cache is not None else [None] * len(batch)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            encoded = model.encode([batch[i] for i in missing], task="retrieval.query", batch_size=batch_size)
+            for i, vector in zip(missing, encoded):
+                vectors[i] = vector
+                if cache is not None:
+                    cache.put_embedding(batch[i], vector)
+        vectors = np.stack(vectors)
+        if index_filter == {}:
+            results = [[] for _ in vectors]
+        elif isinstance(index, LocalIndex):
+            results = [r["matches"] for r in index.query_many(vectors, top_k=top_k, include_metadata=True,
+                                                                filter=index_filter)]
+        else:
+            # Pinecone has no multi-vector query, so only the encoding is batched there
+            results = [query_index(index, v.tolist(), top_k, filter, store, keys) for v in vectors]
+        docs.extend([meta.get("text", "") for meta in store.resolve(matches)] for matches in results)
+    return docs
+
+
+# Filter terms the interactive loop understands: "severity:high", "disruption:low", "source:<file>",
+# and acreage comparisons like "acreage>=1000" or "acreage<500"
+FILTER_FIELDS = {"severity": "severity", "disruption": "disruption", "source": "source_file"}
+FILTER_TERM = re.compile(r"^(severity|disruption|source):(\S+)$|^acreage(>=|<=|>|<|=)(\d+(?:\.\d+)?)$", re.IGNORECASE)
+RANGE_OPERATORS = {">": "$gt", ">=": "$gte", "<": "$lt", "<=": "$lte"}
+
+
+# Split filter terms out of a query: "severity:high evacuation housing" -> ("evacuation housing", {...})
+def parse_query_filters(query: str):
+    words = []
+    filter = {}
+    for word in query.split():
+        m = FILTER_TERM.match(word)
+        if not m:
+            words.append(word)
+        elif m.group(1):
+            field = FILTER_FIELDS[m.group(1).lower()]
+            values = filter.setdefault(field, {"$in": []})["$in"]
+            values.append(m.group(2).lower() if field != "source_file" else m.group(2))
+        elif m.group(3) == "=":
+            filter.setdefault("acreage", {}).update({"$gte": float(m.group(4)), "$lte": float(m.group(4))})
+        else:
+            filter.setdefault("acreage", {})[RANGE_OPERATORS[m.group(3)]] = float(m.group(4))
+    return " ".join(words), filter
+
+
+# STAGE 5 helper: How long the first answer took from process start, and what the model cost
+def report_cold_start(model):
+    elapsed = time.perf_counter() - PROCESS_START
+    if getattr(model, "load_seconds", None) is None:
+        print(f"(first result {elapsed:.1f}s after startup; query embedding came from the cache)")
+    else:
+        print(f"(first result {elapsed:.1f}s after startup; model from {model.source} ready in {model.load_seconds:.1f}s)")
 
 
 # STAGE 5: Interactive search loop — type a query, get matching narratives
-def interactive_loop(model, index):
+def interactive_loop(model, index, store: MetadataStore):
     print("=" * 60)
     print("Wildfire Narrative Search")
-    print("Type a query to search. Type 'quit' to exit, 'help' for examples.")
+    print("Type a query to search. Type 'quit' to exit, 'help' for examples, 'stats' for cache stats.")
     print("=" * 60)
 
+    cache = QueryCache(QUERY_CACHE_DIR, EMBED_MODEL_KEY, maxsize=QUERY_CACHE_SIZE)
+    cache.set_index_version(index_version(index))
+    first_result = True
+
     while True:
         try:
             query = input("\n🔍 Query: ").strip()
@@ -282,6 +945,9 @@ def interactive_loop(model, index):
         if query.lower() in ("quit", "exit", "q"):
             print("Bye!")
             break
+        if query.lower() == "stats":
+            print(cache.report())
+            continue
         if query.lower() == "help":
             print("\nExample queries:")
             print("  - wildfires with long recovery timelines")
@@ -289,9 +955,17 @@ def interactive_loop(model, index):
             print("  - small contained fires with minimal damage")
             print("  - FEMA assistance and insurance claims")
             print("  - high disruption with evacuation orders")
+            print("\nNarrow results with filters anywhere in the query:")
+            print("  - severity:high evacuation housing")
+            print("  - disruption:low acreage<100 quick recovery")
+            print("  - severity:medium severity:high acreage>=5000 insurance delays")
             continue
 
-        docs = search(model, index, query)
+        text, filter = parse_query_filters(query)
+        docs = search(model, index, store, text or query, filter, cache=cache)
+        if first_result:
+            report_cold_start(model)
+            first_result = False
 
         # Groq RAG — uncomment this block when you have a GROQ_API_KEY
         # It takes the search results above and uses an LLM to answer your question
@@ -307,13 +981,28 @@ def interactive_loop(model, index):
         # )
         # print("\n💬 RAG Answer:", response.choices[0].message.content)
 
+    cache.save()
+    print(cache.report())
 
-def main():
-    # --rebuild flag forces re-embedding even if Pinecone already has vectors
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--rebuild", action="store_true", help="Force re-embed and re-upload to Pinecone")
-    args = parser.parse_args()
 
+# STAGE 4 helper: Open the narrative metadata store that goes with the index
+def open_metadata_store(index, backend: str = VECTOR_BACKEND) -> MetadataStore:
+    store = MetadataStore(METADATA_STORE_PATH.format(backend=backend))
+    if not len(store) and index.describe_index_stats()["total_vector_count"] > 0:
+        print(f"No metadata store at {store.path}: filters won't match until a --sync moves "
+              "the index's metadata into it.\n")
+    return store
+
+
+# STAGE 4 helper: Passage-embedding cache for this model (None when --no-cache is given)
+def open_embedding_cache(args):
+    if args.no_cache:
+        return None
+    return EmbeddingCache(EMBEDDING_CACHE_DIR, EMBED_MODEL_KEY, "retrieval.passage")
+
+
+# STAGES 1-4 on one in-memory dataframe (the default demo path)
+def run_eager_stages(args):
     print("=" * 60)
     print("STAGE 1: Loading CSV files from ./data")
     print("=" * 60)
@@ -323,36 +1012,91 @@ def main():
     print("=" * 60)
     print("STAGE 2: Computing recovery features (severity, disruption)")
     print("=" * 60)
-    df = compute_recovery_features(df)
+    df = compute_recovery_features(df, load_timelines("./data"), load_evac_summary("./data"))
     print(f"Severity distribution: {df['severity'].value_counts().to_dict()}")
     print(f"Disruption distribution: {df['disruption'].value_counts().to_dict()}\n")
 
     print("=" * 60)
     print("STAGE 3: Generating recovery narratives")
     print("=" * 60)
-    df["recovery_narrative"] = df.apply(generate_recovery_narrative, axis=1)
-    print(f"Generated {len(df):,} narratives.\n")
+    timeline_model = TimelineModel.load_if_exists(TIMELINE_MODEL_PATH)
+    if timeline_model is not None:
+        print(f"Using timeline estimates from {TIMELINE_MODEL_PATH}.")
+    df["recovery_narrative"] = render_recovery_narratives(df, timeline_model)
+    print(f"Generated {len(df):,} narratives ({len(df['recovery_narrative'].cat.categories):,} unique).\n")
 
     print("=" * 60)
     print("STAGE 4: Embedding + uploading to Pinecone")
     print("=" * 60)
-    index = get_pinecone_index()
+    index = get_index(args.backend)
+    store = open_metadata_store(index, args.backend)
     stats = index.describe_index_stats()
     vector_count = stats["total_vector_count"]
 
     # Skip re-embedding if vectors already exist in Pinecone (saves ~5 hours)
-    if vector_count > 0 and not args.rebuild:
+    if vector_count > 0 and not (args.rebuild or args.sync):
         print(f"Pinecone already has {vector_count} vectors — skipping embed & upload.")
-        print("Run with --rebuild to force re-upload.\n")
+        print("Run with --sync to upload only what changed, or --rebuild to force re-upload.\n")
         model = load_embedding_model()
     else:
-        model = load_embedding_model()
-        upload_to_pinecone(df, model, index)
+        model = load_embedding_model(preload=EMBED_WORKERS <= 1)
+        cache = open_embedding_cache(args)
+        sync_to_pinecone(df, model, index, store, cache=cache, incremental=not args.rebuild)
+        if cache is not None:
+            print(cache.report() + "\n")
+
+    return model, index, store
+
+
+# STAGES 1-4 chunk by chunk, for full runs over the whole corpus
+def run_streaming_stages(args):
+    print("=" * 60)
+    print(f"STAGES 1-4: Streaming ./data in {args.chunksize:,}-row chunks through features, narratives, embedding")
+    print("=" * 60)
+    index = get_index(args.backend)
+    store = open_metadata_store(index, args.backend)
+    vector_count = index.describe_index_stats()["total_vector_count"]
+    embedding = not (vector_count > 0 and not (args.rebuild or args.sync))
+    model = load_embedding_model(preload=not (embedding and EMBED_WORKERS > 1))
+
+    if not embedding:
+        print(f"Pinecone already has {vector_count} vectors — skipping embed & upload.")
+        print("Run with --sync to upload only what changed, or --rebuild to force re-upload.\n")
+    else:
+        cache = open_embedding_cache(args)
+        stream_to_pinecone(model, index, store, "./data", args.chunksize, cache=cache, incremental=not args.rebuild)
+        if cache is not None:
+            print(cache.report() + "\n")
+    return model, index, store
+
+
+def main():
+    global EMBED_WORKERS
+    # --rebuild flag forces re-embedding even if Pinecone already has vectors
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rebuild", action="store_true", help="Force re-embed and re-upload to Pinecone")
+    # --sync only upserts narratives the index doesn't have yet and deletes ones that disappeared
+    parser.add_argument("--sync", action="store_true", help="Upload new narratives and delete stale ones")
+    # --stream keeps memory bounded by --chunksize instead of the whole corpus
+    parser.add_argument("--stream", action="store_true", help="Process ./data chunk by chunk (for full runs)")
+    parser.add_argument("--chunksize", type=int, default=50_000, help="Rows per chunk in --stream mode")
+    parser.add_argument("--backend", choices=["pinecone", "local"], default=VECTOR_BACKEND,
+                        help="Vector index to use (default from VECTOR_BACKEND)")
+    parser.add_argument("--no-cache", action="store_true", help=f"Don't read or write {EMBEDDING_CACHE_DIR}")
+    parser.add_argument("--workers", type=int, default=EMBED_WORKERS,
+                        help="Processes for embedding narratives (default from EMBED_WORKERS)")
+    args = parser.parse_args()
+    EMBED_WORKERS = args.workers
+
+    if args.stream:
+        model, index, store = run_streaming_stages(args)
+    else:
+        model, index, store = run_eager_stages(args)
 
     print("=" * 60)
     print("STAGE 5: Interactive search")
     print("=" * 60)
-    interactive_loop(model, index)
+    interactive_loop(model, index, store)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,124 @@
+# Persistent, content-addressed cache of embedding vectors.
+#
+# Every vector is keyed by sha256(model name, task, text), so a --rebuild only has to encode
+# narratives that were never embedded before. On disk the cache is two append-only files:
+#   vectors.f32  raw float32 matrix, one row per entry (opened with np.memmap)
+#   keys.bin     32-byte sha256 digest per row, in the same order
+# plus meta.json recording the vector dimension.
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+
+KEY_BYTES = 32
+
+
+class EmbeddingCache:
+    def __init__(self, cache_dir: str, model_name: str, task: str):
+        self.path = Path(cache_dir)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.model_name = model_name
+        self.task = task
+        self.hits = 0
+        self.misses = 0
+
+        self.dimension = None
+        meta_path = self.path / "meta.json"
+        if meta_path.exists():
+            self.dimension = json.loads(meta_path.read_text())["dimension"]
+
+        # Row number for every digest; a partial write from a crash is dropped by trimming
+        # both files to the shorter of the two
+        keys = (self.path / "keys.bin").read_bytes() if (self.path / "keys.bin").exists() else b""
+        rows = 0
+        if self.dimension:
+            vector_bytes = (self.path / "vectors.f32").stat().st_size if (self.path / "vectors.f32").exists() else 0
+            rows = min(len(keys) // KEY_BYTES, vector_bytes // (4 * self.dimension))
+        self._rows = {keys[i * KEY_BYTES:(i + 1) * KEY_BYTES]: i for i in range(rows)}
+        self._count = rows
+        self._truncate(rows)
+        self._matrix = None
+
+    def __len__(self):
+        return self._count
+
+    def key(self, text: str) -> bytes:
+        return hashlib.sha256(f"{self.model_name}\0{self.task}\0{text}".encode("utf-8")).digest()
+
+    # Memory-mapped view of every stored vector (reopened after appends)
+    def matrix(self) -> np.ndarray:
+        if self._count == 0:
+            return np.empty((0, self.dimension or 0), dtype=np.float32)
+        if self._matrix is None or len(self._matrix) != self._count:
+            self._matrix = np.memmap(self.path / "vectors.f32", dtype=np.float32, mode="r",
+                                     shape=(self._count, self.dimension))
+        return self._matrix
+
+    # Split texts into cached rows and positions that still need encoding
+    def lookup(self, texts):
+        rows = [self._rows.get(self.key(t)) for t in texts]
+        missing = [i for i, r in enumerate(rows) if r is None]
+        hit_positions = [i for i, r in enumerate(rows) if r is not None]
+        self.hits += len(hit_positions)
+        self.misses += len(missing)
+        hit_vectors = self.matrix()[[rows[i] for i in hit_positions]] if hit_positions else None
+        return hit_positions, hit_vectors, missing
+
+    def add(self, texts, vectors):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.dimension is None:
+            self.dimension = int(vectors.shape[1])
+            (self.path / "meta.json").write_text(json.dumps({"dimension": self.dimension}))
+        elif vectors.shape[1] != self.dimension:
+            raise ValueError(f"Cache at {self.path} holds {self.dimension}-d vectors, got {vectors.shape[1]}-d")
+
+        new_keys = []
+        keep = []
+        for i, text in enumerate(texts):
+            k = self.key(text)
+            if k not in self._rows:
+                self._rows[k] = self._count + len(new_keys)
+                new_keys.append(k)
+                keep.append(i)
+        if not keep:
+            return
+
+        # Vectors first, then keys: a crash in between leaves extra vector rows that are trimmed on open
+        with open(self.path / "vectors.f32", "ab") as f:
+            f.write(vectors[keep].tobytes())
+        with open(self.path / "keys.bin", "ab") as f:
+            f.write(b"".join(new_keys))
+        self._count += len(new_keys)
+
+    # Return embeddings for all texts, calling encode(list_of_texts) only for the ones not cached
+    def encode(self, texts, encode) -> np.ndarray:
+        if not texts:
+            return np.empty((0, self.dimension or 0), dtype=np.float32)
+        hit_positions, hit_vectors, missing = self.lookup(texts)
+        if missing:
+            new_vectors = np.asarray(encode([texts[i] for i in missing]), dtype=np.float32)
+            self.add([texts[i] for i in missing], new_vectors)
+        out = np.empty((len(texts), self.dimension), dtype=np.float32)
+        if hit_positions:
+            out[hit_positions] = hit_vectors
+        if missing:
+            out[missing] = new_vectors
+        return out
+
+    def report(self) -> str:
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups if lookups else 0.0
+        saved = self.hits * 4 * (self.dimension or 0)
+        return (f"Embedding cache: {self.hits:,}/{lookups:,} hits ({rate:.1%}), "
+                f"{saved / 1e6:,.1f} MB of vectors reused, {self._count:,} entries in {self.path}")
+
+    def _truncate(self, rows: int):
+        keys_path = self.path / "keys.bin"
+        if keys_path.exists() and keys_path.stat().st_size != rows * KEY_BYTES:
+            with open(keys_path, "r+b") as f:
+                f.truncate(rows * KEY_BYTES)
+        vectors_path = self.path / "vectors.f32"
+        if self.dimension and vectors_path.exists() and vectors_path.stat().st_size != rows * 4 * self.dimension:
+            with open(vectors_path, "r+b") as f:
+                f.truncate(rows * 4 * self.dimension)
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+
+# Warm embedding server, plus the lazy model handle the scripts use instead of loading Jina directly.
+#
+# Loading jina-embeddings-v3 takes a long time and ~2GB of memory, and data.py, search.py and test.py
+# each used to do it at startup. Run the server once and leave it up:
+#   python embeddings/embedding_service.py            # serves on http://127.0.0.1:8765
+# LazyEmbeddingModel then talks to it over localhost. If no server answers, it loads the model
+# in-process instead, in a background thread started right away, so the prompt shows immediately
+# and the model is usually ready by the time the first query is typed.
+#
+# Protocol: POST /encode with JSON {"texts": [...], "task": "...", "batch_size": N} returns raw
+# little-endian float32 bytes, with the shape in the X-Shape header ("rows,dims").
+# GET /health returns {"model": ..., "dimension": ..., "quantize": ...}.
+#
+# CPU encoding modes (both optional, both change the vectors, so see mode_suffix):
+#   quantize="int8"  dynamic int8 quantization of the model's Linear layers (torch, CPU only)
+#   dimension=N      keep the first N Matryoshka dimensions and re-normalize; Jina v3 is trained
+#                    so that 512/256/128/64/32-d prefixes are usable embeddings on their own
+import argparse
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+JINA_MODEL = "jinaai/jina-embeddings-v3"
+EMBED_SERVER_URL = os.environ.get("EMBED_SERVER_URL", "http://127.0.0.1:8765")
+HEALTH_TIMEOUT = 0.25   # seconds to wait for a server before falling back to a local model
+MATRYOSHKA_DIMENSIONS = (1024, 512, 256, 128, 64, 32)
+QUANTIZE_MODES = ("", "int8")
+
+
+def load_sentence_transformer(model_name: str = JINA_MODEL, quantize: str = ""):
+    from sentence_transformers import SentenceTransformer
+    if quantize not in QUANTIZE_MODES:
+        raise ValueError(f"Unknown quantize mode {quantize!r} (expected one of {QUANTIZE_MODES})")
+    if not quantize:
+        return SentenceTransformer(model_name, trust_remote_code=True)
+
+    import torch
+    model = SentenceTransformer(model_name, trust_remote_code=True, device="cpu")
+    torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    # quantize_dynamic only swaps plain nn.Linear modules. If it replaced none (custom or parametrized
+    # linear layers), the model would run fp32 under the int8 mode suffix and fill a separate index.
+    quantized = sum(isinstance(m, torch.ao.nn.quantized.dynamic.Linear) for m in model.modules())
+    if quantized == 0:
+        raise RuntimeError(f"int8 quantization replaced no Linear layers in {model_name}; "
+                           "unset EMBED_QUANTIZE to run it in fp32")
+    unswapped = sum("Linear" in type(m).__name__ and not isinstance(m, torch.ao.nn.quantized.dynamic.Linear)
+                    for m in model.modules())
+    if unswapped:
+        print(f"WARNING: {unswapped} linear-like layers in {model_name} were not quantized ({quantized} were)")
+    return model
+
+
+# Keep the first `dimension` components of each row and re-normalize (Matryoshka truncation)
+def truncate_embeddings(vectors, dimension: int) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if not dimension or dimension >= vectors.shape[1]:
+        return vectors
+    truncated = np.ascontiguousarray(vectors[:, :dimension])
+    return truncated / np.maximum(np.linalg.norm(truncated, axis=1, keepdims=True), 1e-12)
+
+
+# Name suffix for indexes and caches built in a non-default mode, e.g. "-int8-256"; vectors from
+# different modes aren't comparable, so they must never share an index or cache
+def mode_suffix(dimension: int = 1024, quantize: str = "") -> str:
+    if dimension not in MATRYOSHKA_DIMENSIONS:
+        raise ValueError(f"Unsupported embedding dimension {dimension} (expected one of {MATRYOSHKA_DIMENSIONS})")
+    parts = ([quantize] if quantize else []) + ([str(dimension)] if dimension != MATRYOSHKA_DIMENSIONS[0] else [])
+    return "".join(f"-{p}" for p in parts)
+
+
+# Client for a running embedding server; encode() matches SentenceTransformer.encode for our uses
+class EmbeddingClient:
+    def __init__(self, url: str = EMBED_SERVER_URL, timeout: float = 600):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def health(self, timeout: float = HEALTH_TIMEOUT) -> dict:
+        with urllib.request.urlopen(f"{self.url}/health", timeout=timeout) as response:
+            return json.loads(response.read())
+
+    def encode(self, texts, task: str = None, batch_size: int = 32, **kwargs) -> np.ndarray:
+        body = json.dumps({"texts": list(texts), "task": task, "batch_size": batch_size}).encode("utf-8")
+        request = urllib.request.Request(f"{self.url}/encode", data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            rows, dims = (int(x) for x in response.headers["X-Shape"].split(","))
+            return np.frombuffer(response.read(), dtype="<f4").reshape(rows, dims)
+
+
+# Model handle that defers the expensive part: the first encode() waits for the server connection
+# or local model load (started in the background by default) to finish. A server is only used if
+# it runs the same model and quantize mode; truncation to `dimension` happens here, on either path.
+class LazyEmbeddingModel:
+    def __init__(self, model_name: str = JINA_MODEL, server_url: str = EMBED_SERVER_URL, preload: bool = True,
+                 dimension: int = None, quantize: str = ""):
+        self.model_name = model_name
+        self.server_url = server_url
+        self.dimension = dimension
+        self.quantize = quantize
+        self.source = None          # "server" or "local" once loaded
+        self.load_seconds = None
+        self._model = None
+        self._error = None
+        self._lock = threading.Lock()
+        if preload:
+            threading.Thread(target=self._load_quietly, name="embedding-model-preload", daemon=True).start()
+
+    def encode(self, texts, **kwargs) -> np.ndarray:
+        return truncate_embeddings(self.load().encode(texts, **kwargs), self.dimension)
+
+    def load(self):
+        with self._lock:
+            if self._model is None:
+                if self._error is not None:
+                    raise self._error
+                start = time.perf_counter()
+                client = EmbeddingClient(self.server_url)
+                # Anything but a matching JSON health object (no server, another service on the port,
+                # a non-JSON body) falls back to the local model
+                try:
+                    health = client.health()
+                except (urllib.error.URLError, OSError, ValueError):
+                    health = None
+                if not isinstance(health, dict):
+                    health = {}
+                if health.get("model") == self.model_name and health.get("quantize", "") == self.quantize:
+                    self._model, self.source = client, "server"
+                else:
+                    self._model, self.source = load_sentence_transformer(self.model_name, self.quantize), "local"
+                self.load_seconds = time.perf_counter() - start
+        return self._model
+
+    # Background preload: keep any error for the first real encode() to raise
+    def _load_quietly(self):
+        try:
+            self.load()
+        except Exception as e:
+            self._error = e
+
+
+class _EncodeHandler(BaseHTTPRequestHandler):
+    model = None
+    model_name = None
+    quantize = ""
+    lock = threading.Lock()
+
+    def do_GET(self):
+        if self.path != "/health":
+            self.send_error(404)
+            return
+        dimension = self.model.get_sentence_embedding_dimension()
+        health = {"model": self.model_name, "dimension": dimension, "quantize": self.quantize}
+        self._send(json.dumps(health).encode("utf-8"), "application/json")
+
+    def do_POST(self):
+        if self.path != "/encode":
+            self.send_error(404)
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            texts = request["texts"]
+        except (ValueError, KeyError):
+            self.send_error(400, "expected JSON with a 'texts' list")
+            return
+        kwargs = {"batch_size": request.get("batch_size") or 32}
+        if request.get("task"):
+            kwargs["task"] = request["task"]
+        # One forward pass at a time; concurrent requests queue here instead of thrashing the CPU
+        with self.lock:
+            vectors = np.asarray(self.model.encode(texts, **kwargs), dtype="<f4")
+        vectors = vectors.reshape(len(texts), -1)
+        self._send(vectors.tobytes(), "application/octet-stream", {"X-Shape": f"{vectors.shape[0]},{vectors.shape[1]}"})
+
+    def _send(self, body: bytes, content_type: str, headers: dict = None):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(model_name: str = JINA_MODEL, host: str = "127.0.0.1", port: int = 8765, quantize: str = ""):
+    print(f"Loading {model_name}{' (' + quantize + ')' if quantize else ''}...")
+    start = time.perf_counter()
+    _EncodeHandler.model = load_sentence_transformer(model_name, quantize)
+    _EncodeHandler.model_name = model_name
+    _EncodeHandler.quantize = quantize
+    print(f"Model loaded in {time.perf_counter() - start:.1f}s. Serving on http://{host}:{port} (Ctrl+C to stop)")
+    server = ThreadingHTTPServer((host, port), _EncodeHandler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping.")
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default=JINA_MODEL)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--quantize", choices=QUANTIZE_MODES, default=os.environ.get("EMBED_QUANTIZE", ""),
+                        help="int8 = dynamic int8 quantization for CPU hosts (default from EMBED_QUANTIZE)")
+    args = parser.parse_args()
+    serve(args.model, args.host, args.port, args.quantize)
+
+
+if __name__ == "__main__":
+    main()
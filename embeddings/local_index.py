@@ -0,0 +1,291 @@
+# In-process vector index with the same upsert/query/list/delete/describe_index_stats surface
+# as the Pinecone Index, so data.py, search.py and test.py can run offline.
+#
+# Vectors are stored L2-normalized in a float32 matrix, so cosine similarity is a single
+# matrix-vector product and top-k is an argpartition over the scores. On disk:
+#   vectors.npy  the matrix (opened with mmap_mode="r", copied into memory on first write)
+#   index.json   dimension, ids and per-vector metadata, in row order
+#   ivf.npz      optional IVF-flat structure (see build_ivf)
+#
+# Brute force scores every vector. Once build_ivf has run, query only scores the vectors in the
+# nprobe inverted lists whose centroids are closest to the query: raising nprobe trades latency
+# for recall, and nprobe == nlist is exact search again. Any upsert or delete drops the IVF
+# structure (queries fall back to exact search) until build_ivf is called again.
+#
+# query(filter=...) takes Pinecone-style metadata filters. The filter is resolved to candidate
+# rows through bitmap indexes (metadata_filter.py) first, so only matching vectors are scored.
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+
+from metadata_filter import BitmapIndex
+
+LIST_PAGE_SIZE = 100
+ASSIGN_BATCH = 8192   # rows scored against the centroids at a time while building
+
+
+class LocalIndex:
+    def __init__(self, path: str, dimension: int = None, nprobe: int = 8):
+        self.path = Path(path)
+        self.dimension = dimension
+        self.nprobe = nprobe
+        self._ivf = None
+        self._bitmaps = None
+        self.version = None   # changes every time a modified index is flushed
+        self._ids = []
+        self._metadata = []
+        self._vectors = np.empty((0, dimension or 0), dtype=np.float32)
+        self._pending = []   # appended rows not yet concatenated onto _vectors
+        self._dirty = False
+        self._lock = threading.Lock()   # upserts may come from several uploader threads
+
+        if (self.path / "index.json").exists():
+            state = json.loads((self.path / "index.json").read_text())
+            if dimension is not None and state["dimension"] != dimension:
+                raise ValueError(f"Local index at {self.path} is {state['dimension']}-d, expected {dimension}-d")
+            self.dimension = state["dimension"]
+            self.version = state.get("version")
+            self._ids = state["ids"]
+            self._metadata = state["metadata"]
+            self._vectors = np.load(self.path / "vectors.npy", mmap_mode="r")
+            if (self.path / "ivf.npz").exists():
+                ivf = dict(np.load(self.path / "ivf.npz"))
+                if int(ivf["count"]) == len(self._ids):
+                    self._ivf = ivf
+        self._positions = {doc_id: i for i, doc_id in enumerate(self._ids)}
+
+    @property
+    def has_ivf(self) -> bool:
+        return self._ivf is not None
+
+    def describe_index_stats(self) -> dict:
+        return {"total_vector_count": len(self._ids), "dimension": self.dimension}
+
+    def upsert(self, vectors):
+        values = np.asarray([v["values"] for v in vectors], dtype=np.float32)
+        if self.dimension is None:
+            self.dimension = values.shape[1]
+            self._vectors = np.empty((0, self.dimension), dtype=np.float32)
+        if values.shape[1] != self.dimension:
+            raise ValueError(f"Vector dimension {values.shape[1]} does not match index dimension {self.dimension}")
+        values /= np.maximum(np.linalg.norm(values, axis=1, keepdims=True), 1e-12)
+
+        with self._lock:
+            for v, row in zip(vectors, values):
+                pos = self._positions.get(v["id"])
+                if pos is None:
+                    self._positions[v["id"]] = len(self._ids)
+                    self._ids.append(v["id"])
+                    self._metadata.append(v.get("metadata") or {})
+                    self._pending.append(row)
+                else:
+                    self._writable()[pos] = row
+                    self._metadata[pos] = v.get("metadata") or {}
+            self._ivf = None
+            self._bitmaps = None
+            self._dirty = True
+        return {"upserted_count": len(vectors)}
+
+    def delete(self, ids):
+        drop = {self._positions[i] for i in ids if i in self._positions}
+        if not drop:
+            return
+        keep = np.array([i not in drop for i in range(len(self._ids))], dtype=bool)
+        self._vectors = self._matrix()[keep]
+        self._ids = [doc_id for doc_id, k in zip(self._ids, keep) if k]
+        self._metadata = [m for m, k in zip(self._metadata, keep) if k]
+        self._positions = {doc_id: i for i, doc_id in enumerate(self._ids)}
+        self._ivf = None
+        self._bitmaps = None
+        self._dirty = True
+
+    # Pages of IDs, like Pinecone's serverless Index.list()
+    def list(self, prefix: str = None):
+        ids = [i for i in self._ids if prefix is None or i.startswith(prefix)]
+        for start in range(0, len(ids), LIST_PAGE_SIZE):
+            yield ids[start:start + LIST_PAGE_SIZE]
+
+    def query(self, vector, top_k: int = 10, include_metadata: bool = False, filter: dict = None,
+              nprobe: int = None, **kwargs) -> dict:
+        if not self._ids:
+            return {"matches": []}
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        allowed = self._filter_rows(filter) if filter else None
+        rows, scores = self._search(query, top_k, nprobe, allowed)
+        return {"matches": self._matches(rows, scores, include_metadata)}
+
+    # Answer a batch of queries at once. Without IVF this is one matrix product over the batch and a
+    # row-wise argpartition; with IVF each query probes its own lists.
+    def query_many(self, vectors, top_k: int = 10, include_metadata: bool = False, filter: dict = None,
+                   nprobe: int = None) -> list:
+        queries = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+        if not self._ids or not len(queries):
+            return [{"matches": []} for _ in range(len(queries))]
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        allowed = self._filter_rows(filter) if filter else None
+
+        nprobe = self.nprobe if nprobe is None else nprobe
+        if self._ivf is not None and 0 < nprobe < len(self._ivf["centroids"]):
+            results = [self._search(q, top_k, nprobe, allowed) for q in queries]
+        else:
+            matrix = self._matrix()
+            scores = (matrix if allowed is None else matrix[allowed]) @ queries.T   # (rows, batch)
+            k = min(top_k, len(scores))
+            if k <= 0:
+                return [{"matches": []} for _ in range(len(queries))]
+            top = np.argpartition(-scores, k - 1, axis=0)[:k]                       # (k, batch)
+            top_scores = np.take_along_axis(scores, top, axis=0)
+            ranked = np.argsort(-top_scores, axis=0, kind="stable")
+            top = np.take_along_axis(top, ranked, axis=0).T
+            top_scores = np.take_along_axis(top_scores, ranked, axis=0).T
+            rows = top if allowed is None else allowed[top]
+            results = list(zip(rows, top_scores))
+        return [{"matches": self._matches(rows, scores, include_metadata)} for rows, scores in results]
+
+    # Cluster the vectors into nlist inverted lists with spherical k-means (trained on a sample)
+    def build_ivf(self, nlist: int = None, iterations: int = 10, seed: int = 0):
+        matrix = self._matrix()
+        n = len(matrix)
+        nlist = min(n, nlist or max(1, int(2 * np.sqrt(n))))
+        rng = np.random.default_rng(seed)
+
+        sample = matrix[np.sort(rng.choice(n, size=min(n, 64 * nlist), replace=False))]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assign = _nearest_centroid(sample, centroids)
+            order = np.argsort(assign, kind="stable")
+            counts = np.bincount(assign, minlength=nlist)
+            filled = counts > 0
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            centroids[filled] = np.add.reduceat(sample[order], starts[filled], axis=0)
+            # Reseed empty lists from random sample points
+            centroids[~filled] = sample[rng.choice(len(sample), size=int((~filled).sum()))]
+            centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+
+        assign = _nearest_centroid(matrix, centroids)
+        counts = np.bincount(assign, minlength=nlist)
+        self._ivf = {
+            "centroids": centroids.astype(np.float32),
+            "order": np.argsort(assign, kind="stable").astype(np.int64),
+            "offsets": np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+            "count": np.int64(n),
+        }
+        self._dirty = True
+
+    # Recall@k of the IVF search against exact search, using noisy copies of stored vectors as queries
+    def measure_recall(self, k: int, queries: int = 200, nprobe: int = None, noise: float = 0.05, seed: int = 0) -> dict:
+        matrix = self._matrix()
+        rng = np.random.default_rng(seed)
+        picks = rng.choice(len(matrix), size=min(queries, len(matrix)), replace=False)
+        probes = matrix[picks] + rng.normal(scale=noise, size=(len(picks), matrix.shape[1])).astype(np.float32)
+        probes /= np.linalg.norm(probes, axis=1, keepdims=True)
+
+        hits = 0
+        exact_s = approx_s = 0.0
+        for q in probes:
+            start = time.perf_counter()
+            exact, _ = self._search(q, k, nprobe=0)
+            exact_s += time.perf_counter() - start
+            start = time.perf_counter()
+            approx, _ = self._search(q, k, nprobe)
+            approx_s += time.perf_counter() - start
+            hits += len(np.intersect1d(exact, approx))
+        return {
+            "recall": hits / (k * len(probes)),
+            "exact_ms": 1000 * exact_s / len(probes),
+            "approx_ms": 1000 * approx_s / len(probes),
+            "nprobe": nprobe or self.nprobe,
+            "nlist": len(self._ivf["centroids"]) if self._ivf is not None else 0,
+        }
+
+    # Write the index to disk if anything changed since it was loaded
+    def flush(self):
+        if not self._dirty:
+            return
+        self.path.mkdir(parents=True, exist_ok=True)
+        np.save(self.path / "vectors.tmp.npy", self._matrix())
+        self.version = uuid.uuid4().hex
+        state = {"dimension": self.dimension, "version": self.version, "ids": self._ids, "metadata": self._metadata}
+        (self.path / "index.tmp.json").write_text(json.dumps(state))
+        os.replace(self.path / "vectors.tmp.npy", self.path / "vectors.npy")
+        os.replace(self.path / "index.tmp.json", self.path / "index.json")
+        if self._ivf is not None:
+            np.savez(self.path / "ivf.tmp.npz", **self._ivf)
+            os.replace(self.path / "ivf.tmp.npz", self.path / "ivf.npz")
+        elif (self.path / "ivf.npz").exists():
+            os.remove(self.path / "ivf.npz")
+        self._dirty = False
+
+    # Row numbers and scores of the top_k vectors for a normalized query.
+    # nprobe=0 forces exact search; None uses self.nprobe when an IVF structure exists.
+    # allowed (sorted row numbers from a filter) restricts which vectors are scored at all.
+    def _search(self, query: np.ndarray, top_k: int, nprobe: int = None, allowed: np.ndarray = None):
+        matrix = self._matrix()
+        nprobe = self.nprobe if nprobe is None else nprobe
+        use_ivf = self._ivf is not None and 0 < nprobe < len(self._ivf["centroids"])
+        # A selective filter leaves fewer rows than the probed lists would hold: score them all exactly
+        if use_ivf and allowed is not None and len(allowed) <= len(matrix) * nprobe / len(self._ivf["centroids"]):
+            use_ivf = False
+
+        if use_ivf:
+            centroid_scores = self._ivf["centroids"] @ query
+            probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+            order, offsets = self._ivf["order"], self._ivf["offsets"]
+            # Sorted rows keep the gather from the (possibly memory-mapped) matrix sequential
+            rows = np.sort(np.concatenate([order[offsets[c]:offsets[c + 1]] for c in probe]))
+            if allowed is not None:
+                rows = np.intersect1d(rows, allowed, assume_unique=True)
+        else:
+            rows = allowed
+        scores = matrix @ query if rows is None else matrix[rows] @ query
+
+        k = min(top_k, len(scores))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return (top if rows is None else rows[top]), scores[top]
+
+    # Candidate rows for a metadata filter; bitmap indexes are built per field on first use
+    def _filter_rows(self, filter: dict) -> np.ndarray:
+        if self._bitmaps is None:
+            self._bitmaps = BitmapIndex(len(self._ids), lambda field: [m.get(field) for m in self._metadata])
+        return self._bitmaps.rows(filter)
+
+    def _matches(self, rows: np.ndarray, scores: np.ndarray, include_metadata: bool) -> list:
+        return [
+            {
+                "id": self._ids[pos],
+                "score": float(score),
+                "metadata": self._metadata[pos] if include_metadata else None,
+            }
+            for pos, score in zip(rows, scores)
+        ]
+
+    # All vectors as one matrix, folding in rows appended since the last call
+    def _matrix(self) -> np.ndarray:
+        if self._pending:
+            self._vectors = np.concatenate([self._vectors, np.stack(self._pending)])
+            self._pending = []
+        return self._vectors
+
+    # The memory-mapped matrix is read-only; take an in-memory copy before the first write
+    def _writable(self) -> np.ndarray:
+        matrix = self._matrix()
+        if not matrix.flags.writeable:
+            self._vectors = matrix = np.array(matrix, dtype=np.float32)
+        return matrix
+
+
+# Index of the closest centroid (highest dot product) for every row, scored in batches
+def _nearest_centroid(matrix: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    assign = np.empty(len(matrix), dtype=np.int64)
+    for start in range(0, len(matrix), ASSIGN_BATCH):
+        assign[start:start + ASSIGN_BATCH] = np.argmax(matrix[start:start + ASSIGN_BATCH] @ centroids.T, axis=1)
+    return assign
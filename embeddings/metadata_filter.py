@@ -0,0 +1,136 @@
+# Bitmap indexes over per-vector metadata, so a filter picks candidate rows before any scoring.
+#
+# Filters use Pinecone's metadata filter syntax, so the same dict works with either backend:
+#   {"severity": "high"}                                  equality shorthand
+#   {"severity": {"$in": ["high", "medium"]}}             $eq / $ne / $in / $nin
+#   {"acreage": {"$gte": 1000, "$lt": 50000}}             $gt / $gte / $lt / $lte ranges
+#   {"$and": [...]}, {"$or": [...]}                       combinations
+# Several fields in one dict are ANDed together.
+#
+# Each field is indexed the first time a filter touches it. Equality operators on strings use one
+# packed bitmap per distinct value; range operators, and equality on numbers, use the field's values
+# sorted once, so a range is two searchsorted calls. That keeps numeric ID-like fields (e.g. a
+# metadata key with a distinct value per row) from needing a bitmap per row.
+import numpy as np
+
+RANGE_OPS = {"$gt", "$gte", "$lt", "$lte"}
+
+
+class BitmapIndex:
+    # size: number of rows; column(field) returns that field's value for every row (None if missing)
+    def __init__(self, size: int, column):
+        self.size = size
+        self._column = column
+        self._values = {}   # field -> {value: packed bitmap}
+        self._sorted = {}   # field -> (sorted values without NaN, row order)
+
+    # Sorted row numbers matching the filter
+    def rows(self, filter: dict) -> np.ndarray:
+        return np.flatnonzero(np.unpackbits(self.mask(filter), count=self.size))
+
+    # Packed bitmap (np.packbits layout) of the rows matching the filter
+    def mask(self, filter: dict) -> np.ndarray:
+        bits = self._all()
+        for field, condition in filter.items():
+            if field == "$and":
+                for sub in condition:
+                    bits &= self.mask(sub)
+            elif field == "$or":
+                any_bits = self._none()
+                for sub in condition:
+                    any_bits |= self.mask(sub)
+                bits &= any_bits
+            else:
+                bits &= self._field_mask(field, condition)
+        return bits
+
+    def _field_mask(self, field: str, condition) -> np.ndarray:
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+
+        bits = self._all()
+        bounds = {op: value for op, value in condition.items() if op in RANGE_OPS}
+        if bounds:
+            bits &= self._range_mask(field, bounds)
+        for op, value in condition.items():
+            if op == "$eq":
+                bits &= self._value_mask(field, [value])
+            elif op == "$in":
+                bits &= self._value_mask(field, value)
+            elif op == "$ne":
+                bits &= ~self._value_mask(field, [value])
+            elif op == "$nin":
+                bits &= ~self._value_mask(field, value)
+            elif op not in RANGE_OPS:
+                raise ValueError(f"Unsupported filter operator {op!r} on field {field!r}")
+        return bits
+
+    def _value_mask(self, field: str, values) -> np.ndarray:
+        values = list(values)
+        if values and all(isinstance(v, (int, float, np.number)) and not isinstance(v, bool) for v in values):
+            return self._number_mask(field, values)
+        if field not in self._values:
+            groups = {}
+            for row, value in enumerate(self._column(field)):
+                # A list value (Pinecone allows lists of strings) matches each of its items
+                for item in (value if isinstance(value, list) else [value]):
+                    if item is not None:
+                        groups.setdefault(item, []).append(row)
+            self._values[field] = {value: self._bits(rows) for value, rows in groups.items()}
+        bits = self._none()
+        for value in values:
+            if value in self._values[field]:
+                bits |= self._values[field][value]
+        return bits
+
+    # Rows whose number equals any of values: one searchsorted pair per value
+    def _number_mask(self, field: str, values) -> np.ndarray:
+        sorted_values, order = self._sorted_field(field)
+        wanted = np.unique(np.asarray(values, dtype=np.float64))
+        lo = np.searchsorted(sorted_values, wanted, side="left")
+        hi = np.searchsorted(sorted_values, wanted, side="right")
+        hits = [order[a:b] for a, b in zip(lo, hi) if a < b]
+        return self._bits(np.concatenate(hits) if hits else [])
+
+    def _range_mask(self, field: str, bounds: dict) -> np.ndarray:
+        values, order = self._sorted_field(field)
+
+        lo, hi = 0, len(values)
+        if "$gte" in bounds:
+            lo = max(lo, int(np.searchsorted(values, bounds["$gte"], side="left")))
+        if "$gt" in bounds:
+            lo = max(lo, int(np.searchsorted(values, bounds["$gt"], side="right")))
+        if "$lte" in bounds:
+            hi = min(hi, int(np.searchsorted(values, bounds["$lte"], side="right")))
+        if "$lt" in bounds:
+            hi = min(hi, int(np.searchsorted(values, bounds["$lt"], side="left")))
+        return self._bits(order[lo:hi] if lo < hi else [])
+
+    def _sorted_field(self, field: str):
+        if field not in self._sorted:
+            values = np.array([_to_float(v) for v in self._column(field)], dtype=np.float64)
+            order = np.argsort(values, kind="stable")   # NaN (missing) sorts last
+            valid = int(np.count_nonzero(~np.isnan(values)))
+            self._sorted[field] = (values[order][:valid], order[:valid])
+        return self._sorted[field]
+
+    def _bits(self, rows) -> np.ndarray:
+        flags = np.zeros(self.size, dtype=bool)
+        flags[np.asarray(rows, dtype=np.int64)] = True
+        return np.packbits(flags)
+
+    def _all(self) -> np.ndarray:
+        return np.packbits(np.ones(self.size, dtype=bool))
+
+    def _none(self) -> np.ndarray:
+        return np.zeros((self.size + 7) // 8, dtype=np.uint8)
+
+
+# Metadata numbers may have been stored as strings (e.g. "5000.0"); anything unparsable is missing
+def _to_float(value) -> float:
+    if value is None or isinstance(value, bool):
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
@@ -0,0 +1,133 @@
+# Columnar store for narrative metadata, so index vectors only carry an integer key.
+#
+# Vectors used to carry the full narrative text plus four fields as metadata; the index stored that
+# per vector and sent it back on every include_metadata=True query. Now a vector's metadata is just
+# {"key": <int>} and everything else lives here, in one Parquet file:
+#   key                              int64, 52 bits of the narrative's sha256 (exact as a float64,
+#                                    which is how Pinecone stores metadata numbers)
+#   text                             string
+#   severity, disruption, source_file  categorical
+#   acreage                          float64, NaN when missing
+# Search takes the top-k keys from the index and fetches their rows here. Metadata filters are
+# resolved against these columns (with the same BitmapIndex the local index uses) into a
+# {"key": {"$in": [...]}} filter for the index.
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from metadata_filter import BitmapIndex
+
+COLUMNS = ["key", "text", "severity", "disruption", "acreage", "source_file"]
+CATEGORICAL = ["severity", "disruption", "source_file"]
+
+
+class MetadataStore:
+    def __init__(self, path: str):
+        self.path = Path(path)
+        if self.path.exists():
+            frame = pd.read_parquet(self.path, columns=COLUMNS)
+        else:
+            frame = pd.DataFrame({c: pd.Series(dtype="int64" if c == "key" else "float64" if c == "acreage" else object)
+                                  for c in COLUMNS})
+        self._frame = _typed(frame).set_index("key")
+        self._pending = []   # frames added since the last consolidation
+        self._bitmaps = None
+        self._dirty = False
+
+    def __len__(self):
+        return len(self._table())
+
+    def __contains__(self, key: int) -> bool:
+        return key in self._table().index
+
+    def keys(self) -> np.ndarray:
+        return self._table().index.to_numpy()
+
+    # Add or replace rows; frame has the COLUMNS above
+    def add(self, frame: pd.DataFrame):
+        if len(frame):
+            self._pending.append(frame[COLUMNS])
+            self._bitmaps = None
+            self._dirty = True
+
+    def delete(self, keys):
+        table = self._table()
+        keep = ~table.index.isin(np.asarray(list(keys), dtype=np.int64))
+        if not keep.all():
+            self._frame = table[keep]
+            self._bitmaps = None
+            self._dirty = True
+
+    # Rows for the given keys, in that order (all-NaN rows for keys the store doesn't have)
+    def fetch(self, keys) -> pd.DataFrame:
+        return self._table().reindex(np.asarray(list(keys), dtype=np.int64))
+
+    # Keys of every row matching a Pinecone-style metadata filter
+    def filter_keys(self, filter: dict) -> np.ndarray:
+        table = self._table()
+        if self._bitmaps is None:
+            self._bitmaps = BitmapIndex(len(table), lambda field: _column_values(table, field))
+        return table.index.to_numpy()[self._bitmaps.rows(filter)]
+
+    # Full metadata dicts for index matches. Vectors uploaded before the store existed still carry
+    # their metadata themselves and are passed through unchanged.
+    def resolve(self, matches) -> list:
+        keyed = [m for m in matches if "key" in (m.get("metadata") or {})]
+        rows = self.fetch([int(m["metadata"]["key"]) for m in keyed]) if keyed else None
+        found = iter(rows.itertuples()) if rows is not None else iter(())
+        resolved = []
+        for m in matches:
+            meta = m.get("metadata") or {}
+            if "key" not in meta:
+                resolved.append(dict(meta))
+                continue
+            row = next(found)
+            resolved.append({
+                "key": int(meta["key"]),
+                "text": row.text if isinstance(row.text, str) else "",
+                "severity": row.severity if isinstance(row.severity, str) else "",
+                "disruption": row.disruption if isinstance(row.disruption, str) else "",
+                "acreage": None if pd.isna(row.acreage) else float(row.acreage),
+                "source_file": row.source_file if isinstance(row.source_file, str) else "",
+            })
+        return resolved
+
+    def save(self):
+        if not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp.parquet")
+        self._table().reset_index().to_parquet(tmp, index=False)
+        tmp.replace(self.path)
+        self._dirty = False
+
+    # Fold pending additions into the main frame; later rows win for a repeated key
+    def _table(self) -> pd.DataFrame:
+        if self._pending:
+            added = _typed(pd.concat(self._pending, ignore_index=True)).set_index("key")
+            combined = pd.concat([self._frame.astype(object), added.astype(object)])
+            combined = combined[~combined.index.duplicated(keep="last")]
+            self._frame = _typed(combined.reset_index()).set_index("key")
+            self._pending = []
+        return self._frame
+
+
+def _typed(frame: pd.DataFrame) -> pd.DataFrame:
+    frame = frame[COLUMNS].copy()
+    frame["key"] = frame["key"].astype("int64")
+    frame["text"] = frame["text"].astype(object)
+    frame["acreage"] = pd.to_numeric(frame["acreage"], errors="coerce").astype("float64")
+    for column in CATEGORICAL:
+        frame[column] = frame[column].astype(object).astype("category")
+    return frame
+
+
+# Values of one column as plain Python objects (None when missing), for BitmapIndex
+def _column_values(table: pd.DataFrame, field: str) -> list:
+    if field == "key":
+        return table.index.tolist()
+    if field not in table.columns:
+        return [None] * len(table)
+    values = table[field].astype(object)
+    return values.where(values.notna(), None).tolist()
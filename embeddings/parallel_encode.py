@@ -0,0 +1,102 @@
+# Multi-process passage encoding for full corpus runs.
+#
+# Texts are sorted by length and cut into shards, so each batch inside a shard pads to roughly the
+# same length (character count stands in for token count; the parent process never loads the
+# tokenizer). Shards go to a pool of worker processes that each load the model once. Each finished
+# shard is written to checkpoint_dir before it is reported, so a crashed or interrupted run picks
+# up where it stopped. Results are put back in input order at the end.
+#
+# Every worker holds its own copy of the model (~2GB for Jina v3 fp32, less with int8), and torch
+# gets cpu_count // workers threads per worker so the processes don't oversubscribe the cores.
+#
+#   vectors = encode_parallel(texts, "retrieval.passage", workers=8, checkpoint_dir="./.embed_checkpoints")
+import hashlib
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+
+from embedding_service import JINA_MODEL, load_sentence_transformer, truncate_embeddings
+
+_worker_model = None
+_worker_dimension = None
+
+
+def _init_worker(model_name: str, quantize: str, dimension: int, threads: int):
+    global _worker_model, _worker_dimension
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    _worker_model = load_sentence_transformer(model_name, quantize)
+    _worker_dimension = dimension
+
+
+def _encode_shard(shard: int, texts, task: str, batch_size: int, path: str):
+    vectors = _worker_model.encode(texts, task=task, batch_size=batch_size)
+    vectors = truncate_embeddings(vectors, _worker_dimension)
+    # Write then rename, so a checkpoint file is either complete or absent
+    tmp = f"{path}.tmp.npy"
+    np.save(tmp, vectors)
+    os.replace(tmp, path)
+    return shard, len(texts)
+
+
+# Shards of positions into texts, shortest texts first
+def length_buckets(texts, shard_size: int):
+    order = np.argsort([len(t) for t in texts], kind="stable")
+    return [order[i:i + shard_size] for i in range(0, len(order), shard_size)]
+
+
+# Checkpoints belong to one exact job: same model, mode, task, shard size and texts
+def _job_dir(checkpoint_dir: str, texts, task: str, model_name: str, quantize: str, dimension: int,
+             shard_size: int) -> Path:
+    digest = hashlib.sha256(f"{model_name}\0{quantize}\0{dimension}\0{task}\0{shard_size}".encode("utf-8"))
+    for text in texts:
+        digest.update(text.encode("utf-8") + b"\0")
+    return Path(checkpoint_dir) / digest.hexdigest()[:16]
+
+
+def encode_parallel(texts, task: str, model_name: str = JINA_MODEL, quantize: str = "", dimension: int = None,
+                    workers: int = None, shard_size: int = 2048, batch_size: int = 32,
+                    checkpoint_dir: str = "./.embed_checkpoints") -> np.ndarray:
+    texts = list(texts)
+    if not texts:
+        return np.empty((0, dimension or 0), dtype=np.float32)
+    workers = workers or os.cpu_count() or 1
+    shards = length_buckets(texts, shard_size)
+    job = _job_dir(checkpoint_dir, texts, task, model_name, quantize, dimension, shard_size)
+    job.mkdir(parents=True, exist_ok=True)
+    paths = [job / f"shard_{i:05d}.npy" for i in range(len(shards))]
+
+    todo = [i for i, path in enumerate(paths) if not path.exists()]
+    if len(todo) < len(shards):
+        print(f"  Resuming: {len(shards) - len(todo)}/{len(shards)} shards already checkpointed in {job}")
+
+    if todo:
+        start = time.perf_counter()
+        done_texts = 0
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        # spawn, not fork: torch and tokenizers aren't fork-safe once they've started threads
+        with ProcessPoolExecutor(max_workers=min(workers, len(todo)), mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker, initargs=(model_name, quantize, dimension, threads)) as pool:
+            futures = [pool.submit(_encode_shard, i, [texts[j] for j in shards[i]], task, batch_size, str(paths[i]))
+                       for i in todo]
+            for n, future in enumerate(as_completed(futures), 1):
+                _, count = future.result()
+                done_texts += count
+                rate = done_texts / (time.perf_counter() - start)
+                print(f"  Encoded shard {n}/{len(todo)} ({done_texts:,} texts, {rate:,.1f} texts/s)")
+
+    # Reassemble in input order
+    first = np.load(paths[0])
+    out = np.empty((len(texts), first.shape[1]), dtype=np.float32)
+    for positions, path in zip(shards, paths):
+        out[positions] = np.load(path)
+    shutil.rmtree(job, ignore_errors=True)
+    return out
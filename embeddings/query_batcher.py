@@ -0,0 +1,88 @@
+# Micro-batching front end for search_many.
+#
+# Concurrent callers (e.g. one thread per chatbot request) each submit a single query. A worker
+# thread waits up to max_wait_ms after the first query arrives, collects up to max_batch queries,
+# and answers them with one search_many call, so the model and index work on batches instead of
+# one query at a time.
+#
+#   batcher = QueryBatcher(lambda queries, filter: search_many(model, index, store, queries, filter))
+#   docs = batcher.search("fires needing emergency housing")            # blocks until answered
+#   future = batcher.submit("insurance delays", {"severity": "high"})   # or get a Future
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class QueryBatcher:
+    # search_batch(queries, filter) returns one result per query, in order
+    def __init__(self, search_batch, max_batch: int = 32, max_wait_ms: float = 5.0):
+        self.search_batch = search_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.queries = 0
+        self._queue = queue.Queue()
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="query-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, query: str, filter: dict = None) -> Future:
+        if self._closed:
+            raise RuntimeError("QueryBatcher is closed")
+        future = Future()
+        self._queue.put((query, filter, future))
+        return future
+
+    def search(self, query: str, filter: dict = None, timeout: float = None):
+        return self.submit(query, filter).result(timeout)
+
+    # Stop accepting queries; anything already queued is still answered
+    def close(self):
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            stop = False
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._answer(batch)
+            if stop:
+                return
+
+    # Queries with different filters can't share an index call, so group by filter first
+    def _answer(self, batch):
+        groups = {}
+        for query, filter, future in batch:
+            key = json.dumps(filter, sort_keys=True) if filter else ""
+            groups.setdefault(key, (filter, []))[1].append((query, future))
+
+        for filter, items in groups.values():
+            try:
+                results = self.search_batch([q for q, _ in items], filter)
+            except Exception as e:
+                for _, future in items:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(items, results):
+                future.set_result(result)
+            self.batches += 1
+            self.queries += len(items)
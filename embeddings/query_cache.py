@@ -0,0 +1,113 @@
+# LRU + TTL cache for query embeddings and top-k results, persisted between runs.
+#
+# Chatbot users repeat a small set of questions, and each one would otherwise cost a full Jina
+# forward pass. Keys use the normalized query text (lowercased, whitespace collapsed):
+#   embeddings  keyed by (model, text)                       -- valid until the TTL expires
+#   results     keyed by (model, text, filter, top_k) and tagged with the index version;
+#               all results are dropped as soon as a different index version is seen
+# On disk (save/load): embeddings.npz (keys, vectors, timestamps) and results.json.
+import json
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class QueryCache:
+    def __init__(self, path: str, model_name: str, maxsize: int = 1024, ttl_seconds: float = 7 * 24 * 3600):
+        self.path = Path(path)
+        self.model_name = model_name
+        self.maxsize = maxsize
+        self.ttl = ttl_seconds
+        self.index_version = None
+        self.embedding_hits = self.embedding_misses = 0
+        self.result_hits = self.result_misses = 0
+        self._embeddings = OrderedDict()   # key -> (vector, stored_at)
+        self._results = OrderedDict()      # key -> (docs, stored_at)
+        self._load()
+
+    # Drop cached results if the index changed since they were stored (e.g. after --rebuild or --sync)
+    def set_index_version(self, version: str):
+        if version != self.index_version:
+            self._results.clear()
+            self.index_version = version
+
+    def get_embedding(self, query: str):
+        value = self._get(self._embeddings, self._embedding_key(query))
+        if value is None:
+            self.embedding_misses += 1
+        else:
+            self.embedding_hits += 1
+        return value
+
+    def put_embedding(self, query: str, vector):
+        self._put(self._embeddings, self._embedding_key(query), np.asarray(vector, dtype=np.float32))
+
+    def get_results(self, query: str, filter: dict, top_k: int):
+        value = self._get(self._results, self._result_key(query, filter, top_k))
+        if value is None:
+            self.result_misses += 1
+        else:
+            self.result_hits += 1
+        return value
+
+    def put_results(self, query: str, filter: dict, top_k: int, docs):
+        self._put(self._results, self._result_key(query, filter, top_k), docs)
+
+    def report(self) -> str:
+        return (f"Query cache: embeddings {self.embedding_hits} hits / {self.embedding_misses} misses, "
+                f"results {self.result_hits} hits / {self.result_misses} misses")
+
+    def save(self):
+        self.path.mkdir(parents=True, exist_ok=True)
+        now = time.time()
+        embeddings = [(k, v, t) for k, (v, t) in self._embeddings.items() if now - t < self.ttl]
+        if embeddings:
+            np.savez(self.path / "embeddings.npz",
+                     keys=np.array([k for k, _, _ in embeddings]),
+                     vectors=np.stack([v for _, v, _ in embeddings]),
+                     stored_at=np.array([t for _, _, t in embeddings]))
+        results = [[k, docs, t] for k, (docs, t) in self._results.items() if now - t < self.ttl]
+        (self.path / "results.json").write_text(json.dumps({"index_version": self.index_version, "results": results}))
+
+    def _load(self):
+        now = time.time()
+        if (self.path / "embeddings.npz").exists():
+            saved = np.load(self.path / "embeddings.npz")
+            for key, vector, stored_at in zip(saved["keys"], saved["vectors"], saved["stored_at"]):
+                if now - stored_at < self.ttl:
+                    self._embeddings[str(key)] = (vector, float(stored_at))
+        if (self.path / "results.json").exists():
+            saved = json.loads((self.path / "results.json").read_text())
+            self.index_version = saved["index_version"]
+            for key, docs, stored_at in saved["results"]:
+                if now - stored_at < self.ttl:
+                    self._results[key] = (docs, stored_at)
+
+    def _embedding_key(self, query: str) -> str:
+        return f"{self.model_name}\0{normalize_query(query)}"
+
+    def _result_key(self, query: str, filter: dict, top_k: int) -> str:
+        return f"{self._embedding_key(query)}\0{json.dumps(filter or {}, sort_keys=True)}\0{top_k}"
+
+    def _get(self, entries: OrderedDict, key: str):
+        entry = entries.get(key)
+        if entry is None:
+            return None
+        value, stored_at = entry
+        if time.time() - stored_at >= self.ttl:
+            del entries[key]
+            return None
+        entries.move_to_end(key)
+        return value
+
+    def _put(self, entries: OrderedDict, key: str, value):
+        entries[key] = (value, time.time())
+        entries.move_to_end(key)
+        while len(entries) > self.maxsize:
+            entries.popitem(last=False)
@@ -1,29 +1,48 @@
 #!/usr/bin/env python3
 
-# Search the Pinecone index for wildfire narratives.
-import os, sys
-from pinecone import Pinecone
-from sentence_transformers import SentenceTransformer
+# Search the Pinecone (or local) index for wildfire narratives.
+import os, sys, time
+from embedding_service import LazyEmbeddingModel, mode_suffix
+from metadata_store import MetadataStore
+
+PROCESS_START = time.perf_counter()
 
 # Your Pinecone API key (set via: export PINECONE_API_KEY="your_key")
 PINECONE_API_KEY = os.environ.get("PINECONE_API_KEY", "")
-INDEX_NAME = "wildfire-narratives"  # must match the index you created in Pinecone
 JINA_MODEL = "jinaai/jina-embeddings-v3"  # same model used when uploading
+# Same encoding mode the index was built with (see data.py): Matryoshka dimension and int8 quantization
+EMBED_DIMENSION = int(os.environ.get("EMBED_DIMENSION", 1024))
+EMBED_QUANTIZE = os.environ.get("EMBED_QUANTIZE", "")
+EMBED_MODE = mode_suffix(EMBED_DIMENSION, EMBED_QUANTIZE)
+INDEX_NAME = "wildfire-narratives" + EMBED_MODE  # must match the index you created in Pinecone
 TOP_K = 3  # number of results to return per query
+# "pinecone" or "local" (the index data.py --backend local writes to LOCAL_INDEX_DIR)
+VECTOR_BACKEND = os.environ.get("VECTOR_BACKEND", "pinecone")
+LOCAL_INDEX_DIR = os.environ.get("LOCAL_INDEX_DIR", "./.local_index" + EMBED_MODE)
+IVF_NPROBE = int(os.environ.get("IVF_NPROBE", 8))  # IVF lists scanned per query by the local index
+# Narrative text and fields for each vector key (written by data.py, one store per backend)
+METADATA_STORE_PATH = os.environ.get("METADATA_STORE_PATH", f"./.metadata{EMBED_MODE}/{{backend}}/narratives.parquet")
 
-if not PINECONE_API_KEY:
-    print("ERROR: run export PINECONE_API_KEY='your_key'")
+if VECTOR_BACKEND != "local" and not PINECONE_API_KEY:
+    print("ERROR: run export PINECONE_API_KEY='your_key' (or export VECTOR_BACKEND=local)")
     sys.exit(1)
 
-# Load the Jina model locally (uses cached version after first download)
-print("Loading model...")
-model = SentenceTransformer(JINA_MODEL, trust_remote_code=True)
+# Load the Jina model in the background (or use a running embedding_service.py) so the prompt shows right away
+print("Loading model in the background...")
+model = LazyEmbeddingModel(JINA_MODEL, dimension=EMBED_DIMENSION, quantize=EMBED_QUANTIZE)
 
-# Connect to your Pinecone index
-index = Pinecone(api_key=PINECONE_API_KEY).Index(INDEX_NAME)
+# Connect to your Pinecone index, or open the local one
+if VECTOR_BACKEND == "local":
+    from local_index import LocalIndex
+    index = LocalIndex(LOCAL_INDEX_DIR, nprobe=IVF_NPROBE)
+else:
+    from pinecone import Pinecone
+    index = Pinecone(api_key=PINECONE_API_KEY).Index(INDEX_NAME)
 print(f"Connected. {index.describe_index_stats()['total_vector_count']} vectors in index.\n")
+store = MetadataStore(METADATA_STORE_PATH.format(backend=VECTOR_BACKEND))
 
 # Interactive search loop
+first_result = True
 while True:
     try:
         query = input("🔍 Query: ").strip()
@@ -36,11 +55,14 @@ while True:
     # Embed the query (task="retrieval.query" for search queries, not documents)
     vec = model.encode([query], task="retrieval.query")[0].tolist()
 
-    # Search Pinecone for the most similar narratives
+    # Search the index for the most similar narratives
     results = index.query(vector=vec, top_k=TOP_K, include_metadata=True)
 
-    for i, match in enumerate(results["matches"]):
-        meta = match["metadata"]
+    for i, (match, meta) in enumerate(zip(results["matches"], store.resolve(results["matches"]))):
         print(f"\n[{i+1}] Score: {round(match['score'], 3)} | Severity: {meta.get('severity')} | Disruption: {meta.get('disruption')}")
         print(f"     {meta.get('text', '')[:300]}...")
+    if first_result:
+        print(f"\n(first result {time.perf_counter() - PROCESS_START:.1f}s after startup; "
+              f"model from {model.source} ready in {model.load_seconds:.1f}s)")
+        first_result = False
     print()
\ No newline at end of file
@@ -1,17 +1,31 @@
 #!/usr/bin/env python3
 """
-Tests that Pinecone has vectors and that search is working correctly.
+Tests that Pinecone (or the local index) has vectors and that search is working correctly.
+Set VECTOR_BACKEND=local to run against the index that data.py --backend local writes.
 """
 
 import os
 import sys
 
+from embedding_service import LazyEmbeddingModel, mode_suffix
+from metadata_store import MetadataStore
+
 PINECONE_API_KEY = os.environ.get("PINECONE_API_KEY", "")
-INDEX_NAME = "wildfire-narratives"
 JINA_MODEL = "jinaai/jina-embeddings-v3"
+EMBED_DIMENSION = int(os.environ.get("EMBED_DIMENSION", 1024))   # encoding mode the index was built with
+EMBED_QUANTIZE = os.environ.get("EMBED_QUANTIZE", "")
+EMBED_MODE = mode_suffix(EMBED_DIMENSION, EMBED_QUANTIZE)
+INDEX_NAME = "wildfire-narratives" + EMBED_MODE
+VECTOR_BACKEND = os.environ.get("VECTOR_BACKEND", "pinecone")
+LOCAL_INDEX_DIR = os.environ.get("LOCAL_INDEX_DIR", "./.local_index" + EMBED_MODE)
+IVF_NPROBE = int(os.environ.get("IVF_NPROBE", 8))  # IVF lists scanned per query by the local index
+METADATA_STORE_PATH = os.environ.get("METADATA_STORE_PATH", f"./.metadata{EMBED_MODE}/{{backend}}/narratives.parquet")
 
 
 def get_index():
+    if VECTOR_BACKEND == "local":
+        from local_index import LocalIndex
+        return LocalIndex(LOCAL_INDEX_DIR, nprobe=IVF_NPROBE)
     if not PINECONE_API_KEY:
         print("ERROR: PINECONE_API_KEY not set. Run: export PINECONE_API_KEY='your_key'")
         sys.exit(1)
@@ -21,14 +35,15 @@ def get_index():
 
 
 def load_model():
+    # Uses a running embedding_service.py if there is one, so repeated test runs skip the model load
+    model = LazyEmbeddingModel(JINA_MODEL, preload=False, dimension=EMBED_DIMENSION, quantize=EMBED_QUANTIZE)
     print("Loading Jina model...")
-    from sentence_transformers import SentenceTransformer
-    model = SentenceTransformer(JINA_MODEL, trust_remote_code=True)
-    print("Model loaded.\n")
+    model.load()
+    print(f"Model ready ({model.source}, {model.load_seconds:.1f}s).\n")
     return model
 
 
-def run_tests(model, index):
+def run_tests(model, index, store):
     passed = 0
     failed = 0
 
@@ -59,7 +74,7 @@ def run_tests(model, index):
     print("TEST 3: Does 'massive wildfire thousands of acres' return high-severity docs?")
     query_vec = model.encode(["massive wildfire thousands of acres burned"], task="retrieval.query")[0].tolist()
     results = index.query(vector=query_vec, top_k=5, include_metadata=True)
-    severities = [m["metadata"].get("severity", "") for m in results["matches"]]
+    severities = [meta.get("severity", "") for meta in store.resolve(results["matches"])]
     high_count = severities.count("high")
     print(f"  Severities returned: {severities}")
     if high_count >= 3:
@@ -73,7 +88,7 @@ def run_tests(model, index):
     print("TEST 4: Does 'small contained fire minimal damage' return low-severity docs?")
     query_vec = model.encode(["small contained fire minimal damage quick recovery"], task="retrieval.query")[0].tolist()
     results = index.query(vector=query_vec, top_k=5, include_metadata=True)
-    severities = [m["metadata"].get("severity", "") for m in results["matches"]]
+    severities = [meta.get("severity", "") for meta in store.resolve(results["matches"])]
     low_count = severities.count("low")
     print(f"  Severities returned: {severities}")
     if low_count >= 3:
@@ -87,8 +102,7 @@ def run_tests(model, index):
     print("TEST 5: Eyeball test — searching 'evacuation and housing displacement'")
     query_vec = model.encode(["evacuation and housing displacement"], task="retrieval.query")[0].tolist()
     results = index.query(vector=query_vec, top_k=3, include_metadata=True)
-    for i, match in enumerate(results["matches"]):
-        meta = match["metadata"]
+    for i, (match, meta) in enumerate(zip(results["matches"], store.resolve(results["matches"]))):
         print(f"  [{i+1}] Score: {round(match['score'], 3)} | Severity: {meta.get('severity')} | Disruption: {meta.get('disruption')}")
         print(f"       {meta.get('text', '')[:200]}...")
     print()
@@ -106,12 +120,12 @@ def run_tests(model, index):
 
 def main():
     print("=" * 60)
-    print("Pinecone + Jina Integration Tests")
+    print(f"{'Local index' if VECTOR_BACKEND == 'local' else 'Pinecone'} + Jina Integration Tests")
     print("=" * 60 + "\n")
 
     index = get_index()
     model = load_model()
-    run_tests(model, index)
+    run_tests(model, index, MetadataStore(METADATA_STORE_PATH.format(backend=VECTOR_BACKEND)))
 
 
 if __name__ == "__main__":
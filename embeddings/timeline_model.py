@@ -0,0 +1,198 @@
+# Recovery timeline estimator: per-county quantiles of the changelog milestones, with priors.
+#
+# Milestones (replayed by changelog_replay.py):
+#   fps_to_contained  hours from forward progress stopped to 100% containment, per geo event
+#   order_to_lift     hours an evacuation order stayed in place before it was lifted, per evac zone
+# The model is a quantile table. For every (county FIPS, severity bucket) with fires in it, it stores the
+# P25/P50/P75 of fps_to_contained, shrunk toward that severity's nationwide quantiles by
+# n / (n + PRIOR_WEIGHT) so a county with two fires doesn't get a confident estimate. Counties without
+# fires fall back to the nationwide row. Evac zones only carry WatchDuty's internal region_id (not a
+# FIPS code), so order_to_lift is one nationwide P25/P50/P75.
+#
+# Everything is precomputed at fit time and saved as one small .npz (sorted int64 keys + float32
+# quantiles, plus each geo event's county), so predict() is a searchsorted over a whole frame.
+#
+#   python embeddings/timeline_model.py            # fit on ./data and save to TIMELINE_MODEL_PATH
+#   model = TimelineModel.load(TIMELINE_MODEL_PATH)
+#   hours, local = model.predict(model.row_fips(df), severity_codes)
+#   # hours: (n, 3) P25/P50/P75, NaN if unknown; local: True where the county's own row was used
+import argparse
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from changelog_replay import (EVAC_CHANGELOG, GEOEVENT_CHANGELOG, replay_evac_changelog,
+                              replay_geoevent_changelog, row_geo_event_ids)
+
+TIMELINE_MODEL_PATH = os.environ.get("TIMELINE_MODEL_PATH", "./.timeline_model.npz")
+# geo_event_id -> county FIPS, written by backend/build_canonical_dataframe.py
+WATCHDUTY_MAPPING = "final/watchduty_fema_mapping.csv"
+QUANTILES = [0.25, 0.5, 0.75]
+PRIOR_WEIGHT = 10.0   # pseudo-fires of the nationwide prior mixed into each county's quantiles
+N_SEVERITIES = 3      # severity codes index data.BUCKETS: 0 = high, 1 = medium, 2 = low
+
+
+# P25/P50/P75 per integer key (rows of a (keys, 3) array) and the sample count per key
+def _grouped_quantiles(keys: np.ndarray, hours: np.ndarray):
+    if not len(keys):
+        return np.empty(0, np.int64), np.empty((0, len(QUANTILES))), np.empty(0, np.int64)
+    grouped = pd.Series(hours).groupby(keys)
+    table = grouped.quantile(QUANTILES).unstack()
+    return table.index.to_numpy(np.int64), table.to_numpy(np.float64), grouped.size().to_numpy(np.int64)
+
+
+class TimelineModel:
+    def __init__(self, keys, quantiles, counts, severity_quantiles, evac_quantiles, event_ids, event_fips):
+        self.keys = np.asarray(keys, dtype=np.int64)                       # fips * N_SEVERITIES + severity, sorted
+        self.quantiles = np.asarray(quantiles, dtype=np.float32)           # (len(keys), 3) hours
+        self.counts = np.asarray(counts, dtype=np.int64)                   # fires behind each key
+        self.severity_quantiles = np.asarray(severity_quantiles, dtype=np.float32)   # (N_SEVERITIES, 3)
+        self.evac_quantiles = np.asarray(evac_quantiles, dtype=np.float32)           # (3,) order_to_lift hours
+        self.event_ids = np.asarray(event_ids, dtype=np.int64)             # sorted geo_event_ids
+        self.event_fips = np.asarray(event_fips, dtype=np.float64)         # their county (NaN if unknown)
+
+    # fips, severity and fps_to_contained hours per geo event; order_to_lift hours per lifted evac order.
+    # event_ids / event_fips: every known geo event's county, kept so predict works on WatchDuty rows.
+    @classmethod
+    def fit(cls, fips, severity, fps_to_contained, order_to_lift, event_ids=(), event_fips=()):
+        fips = np.asarray(fips, dtype=np.float64)
+        severity = np.asarray(severity, dtype=np.int64)
+        hours = np.asarray(fps_to_contained, dtype=np.float64)
+        valid = np.isfinite(hours) & (hours >= 0)
+        fips, severity, hours = fips[valid], severity[valid], hours[valid]
+
+        # Nationwide prior per severity; a severity with no fires at all uses every fire
+        overall = np.quantile(hours, QUANTILES) if len(hours) else np.full(len(QUANTILES), np.nan)
+        severity_quantiles = np.tile(overall, (N_SEVERITIES, 1))
+        if len(hours):
+            sev_keys, sev_q, _ = _grouped_quantiles(severity, hours)
+            severity_quantiles[sev_keys] = sev_q
+
+        # County rows, shrunk toward their severity's prior
+        known = np.isfinite(fips)
+        keys, quantiles, counts = _grouped_quantiles(
+            fips[known].astype(np.int64) * N_SEVERITIES + severity[known], hours[known])
+        weight = (counts / (counts + PRIOR_WEIGHT))[:, None]
+        quantiles = weight * quantiles + (1 - weight) * severity_quantiles[keys % N_SEVERITIES]
+
+        lift = np.asarray(order_to_lift, dtype=np.float64)
+        lift = lift[np.isfinite(lift) & (lift >= 0)]
+        evac_quantiles = np.quantile(lift, QUANTILES) if len(lift) else np.full(len(QUANTILES), np.nan)
+
+        event_ids = np.asarray(event_ids, dtype=np.int64)
+        order = np.argsort(event_ids, kind="stable")
+        return cls(keys, quantiles, counts, severity_quantiles, evac_quantiles,
+                   event_ids[order], np.asarray(event_fips, dtype=np.float64)[order])
+
+    def save(self, path=TIMELINE_MODEL_PATH):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.stem + ".tmp.npz")
+        np.savez(tmp, keys=self.keys, quantiles=self.quantiles, counts=self.counts,
+                 severity_quantiles=self.severity_quantiles, evac_quantiles=self.evac_quantiles,
+                 event_ids=self.event_ids, event_fips=self.event_fips)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=TIMELINE_MODEL_PATH):
+        with np.load(path) as saved:
+            return cls(**{name: saved[name] for name in saved.files})
+
+    # The saved model, or None if it hasn't been fitted yet (narratives then only have the bucket text)
+    @classmethod
+    def load_if_exists(cls, path=TIMELINE_MODEL_PATH):
+        return cls.load(path) if Path(path).exists() else None
+
+    # County FIPS per row (NaN if unknown): a "fips" column, FEMA's fipsStateCode + fipsCountyCode, or
+    # for WatchDuty rows the county their geo event was assigned at fit time
+    def row_fips(self, df: pd.DataFrame) -> np.ndarray:
+        fips = np.full(len(df), np.nan)
+        if "fips" in df.columns:
+            fips = pd.to_numeric(df["fips"], errors="coerce").to_numpy(np.float64, copy=True)
+        if "fipsStateCode" in df.columns and "fipsCountyCode" in df.columns:
+            fema = (pd.to_numeric(df["fipsStateCode"], errors="coerce") * 1000
+                    + pd.to_numeric(df["fipsCountyCode"], errors="coerce")).to_numpy(np.float64)
+            fips = np.where(np.isnan(fips), fema, fips)
+
+        event = row_geo_event_ids(df).to_numpy(np.float64)
+        ask = np.isnan(fips) & np.isfinite(event)
+        if ask.any() and len(self.event_ids):
+            wanted = event[ask].astype(np.int64)
+            pos = np.minimum(np.searchsorted(self.event_ids, wanted), len(self.event_ids) - 1)
+            fips[ask] = np.where(self.event_ids[pos] == wanted, self.event_fips[pos], np.nan)
+        return fips
+
+    # (n, 3) P25/P50/P75 hours from FPS to containment for each row's county and severity code, and
+    # whether each row got its county's row (True) or fell back to the nationwide severity prior (False)
+    def predict(self, fips, severity):
+        fips = np.asarray(fips, dtype=np.float64)
+        severity = np.asarray(severity, dtype=np.int64)
+        result = self.severity_quantiles[severity].astype(np.float64)
+        local = np.zeros(len(fips), dtype=bool)
+
+        known = np.flatnonzero(np.isfinite(fips))
+        if len(known) and len(self.keys):
+            wanted = fips[known].astype(np.int64) * N_SEVERITIES + severity[known]
+            pos = np.minimum(np.searchsorted(self.keys, wanted), len(self.keys) - 1)
+            hit = self.keys[pos] == wanted
+            result[known[hit]] = self.quantiles[pos[hit]]
+            local[known[hit]] = True
+        return result, local
+
+
+# Training milestones from the changelogs in data_dir:
+# (fires, lifts) where fires has geo_event_id, fips, severity, fps_to_contained per geo event and lifts is
+# the order_to_lift hours of every evac order that was lifted before the end of the log
+def load_milestones(data_dir: str = "./data"):
+    # Severity uses the same acreage buckets as the narratives (data imports this module, so import here)
+    from data import BUCKETS, compute_recovery_features
+
+    data_path = Path(data_dir)
+    _, timelines = replay_geoevent_changelog(data_path / GEOEVENT_CHANGELOG)
+    events = pd.read_csv(data_path / "geo_events_geoevent.csv", usecols=["id", "data"])
+    events["_source_file"] = "geo_events_geoevent.csv"
+    events = compute_recovery_features(events, timelines)
+
+    fires = pd.DataFrame({
+        "geo_event_id": events["id"].to_numpy(np.int64),
+        "severity": pd.Categorical(events["severity"], categories=BUCKETS).codes.astype(np.int64),
+        "fps_to_contained": (events["_hours_to_contained"] - events["_hours_to_fps"]).to_numpy(np.float64),
+    })
+    fires["fips"] = np.nan
+    mapping_path = data_path / WATCHDUTY_MAPPING
+    if mapping_path.exists():
+        mapping = pd.read_csv(mapping_path, usecols=["geo_event_id", "fips"], dtype={"fips": str})
+        county = pd.to_numeric(mapping["fips"], errors="coerce").groupby(mapping["geo_event_id"]).first()
+        fires["fips"] = county.reindex(fires["geo_event_id"]).to_numpy(np.float64)
+    else:
+        print(f"No {mapping_path}: fitting nationwide priors only (run backend/build.py for county priors)")
+
+    lifts = np.empty(0)
+    if (data_path / EVAC_CHANGELOG).exists():
+        intervals, _ = replay_evac_changelog(data_path / EVAC_CHANGELOG)
+        lifted = intervals[(intervals["status"] == "order") & ~intervals["is_open"]]
+        lifts = lifted["hours"].to_numpy(np.float64)
+    return fires, lifts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit the recovery timeline quantile table")
+    parser.add_argument("--data-dir", default="./data")
+    parser.add_argument("--out", default=TIMELINE_MODEL_PATH)
+    args = parser.parse_args()
+
+    fires, lifts = load_milestones(args.data_dir)
+    model = TimelineModel.fit(fires["fips"], fires["severity"], fires["fps_to_contained"], lifts,
+                              fires["geo_event_id"], fires["fips"])
+    model.save(args.out)
+
+    trained = np.isfinite(fires["fps_to_contained"]).sum()
+    print(f"Fitted on {trained:,} FPS -> containment milestones and {len(lifts):,} lifted evac orders")
+    print(f"  county/severity rows: {len(model.keys):,}, saved to {args.out} ({Path(args.out).stat().st_size:,} bytes)")
+    print(f"  nationwide P50 hours by severity (high/medium/low): {np.round(model.severity_quantiles[:, 1].astype(float), 1).tolist()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# Concurrent, retrying uploader for index.upsert.
+#
+# The producer (upload_to_pinecone) puts upsert batches on a bounded queue as soon as each chunk of
+# narratives is embedded, and uploader threads take them off the queue and upsert them, so encoding
+# the next chunk overlaps with network I/O for the previous one. A full queue blocks the producer,
+# which caps memory at max_pending batches. A failed upsert is retried with exponential backoff and
+# jitter; a batch that still fails after `retries` retries is counted (and its IDs kept) instead of
+# aborting the whole upload.
+#
+#   with UpsertPipeline(index, workers=4) as uploader:
+#       for batch in batches:
+#           uploader.put(batch)
+#   print(uploader.report())
+import queue
+import random
+import threading
+import time
+
+
+class UpsertPipeline:
+    def __init__(self, index, workers: int = 4, max_pending: int = 16, retries: int = 5, backoff: float = 0.5,
+                 total: int = None):
+        self.index = index
+        self.retries = retries
+        self.backoff = backoff
+        self.total = total   # only used for progress lines
+        self.succeeded = 0
+        self.failed = 0
+        self.retried = 0
+        self.failed_ids = []
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._start = time.perf_counter()
+        self._threads = [threading.Thread(target=self._run, name=f"upsert-{i}", daemon=True) for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Blocks while max_pending batches are already waiting
+    def put(self, batch):
+        self._queue.put(batch)
+
+    # Wait for every queued batch to be upserted (or given up on), then stop the threads
+    def close(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self.seconds = time.perf_counter() - self._start
+
+    def report(self) -> str:
+        rate = self.succeeded / self.seconds if self.seconds else 0.0
+        return (f"Upserted {self.succeeded:,} vectors, {self.failed:,} failed ({self.retried} retries) "
+                f"in {self.seconds:.1f}s ({rate:,.0f} vectors/s)")
+
+    def _run(self):
+        while True:
+            batch = self._queue.get()
+            if batch is None:
+                return
+            self._upsert(batch)
+
+    def _upsert(self, batch):
+        for attempt in range(self.retries + 1):
+            try:
+                self.index.upsert(vectors=batch)
+                break
+            except Exception as e:
+                if attempt == self.retries:
+                    with self._lock:
+                        self.failed += len(batch)
+                        self.failed_ids.extend(v["id"] for v in batch)
+                    print(f"  Upsert of {len(batch)} vectors failed after {attempt + 1} attempts: {e}\n", end="")
+                    return
+                with self._lock:
+                    self.retried += 1
+                time.sleep(self.backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+
+        with self._lock:
+            self.succeeded += len(batch)
+            done = self.succeeded + self.failed
+        # One write per line, so lines from concurrent uploader threads don't interleave
+        print(f"  Uploaded {done}/{self.total if self.total is not None else '?'} vectors\n", end="")
@@ -0,0 +1,8 @@
+# The pipelines are flat script directories (run as `python embeddings/data.py`, `python backend/build.py`),
+# so put both on sys.path the same way running one of their scripts would
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+for directory in ("embeddings", "backend"):
+    sys.path.insert(0, str(ROOT / directory))
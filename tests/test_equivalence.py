@@ -0,0 +1,191 @@
+# Equivalence checks for the fast paths against their straightforward reference versions:
+# columnar vs row-wise recovery features, eager vs streamed narratives, the WatchDuty-to-FEMA interval
+# join vs a nested loop, and CountyIndex vs plain ray casting. benchmark.py runs the same comparisons
+# at scale; these keep them on small inputs with the edge cases spelled out.
+import numpy as np
+import pandas as pd
+import pytest
+
+import benchmark
+import data as pipeline
+from build_canonical_dataframe import fema_match_windows, match_watchduty_to_fema
+from county_index import CountyIndex
+
+
+# STAGE 2: compute_recovery_features vs compute_recovery_features_rowwise
+
+@pytest.mark.parametrize("rows", [1, 50, 5_000])
+def test_features_match_rowwise(rows):
+    df = benchmark.make_synthetic_frame(rows, seed=rows)
+    pd.testing.assert_frame_equal(pipeline.compute_recovery_features(df),
+                                  pipeline.compute_recovery_features_rowwise(df))
+
+
+@pytest.mark.parametrize("kind", ["geoevent", "perimeter", "fema", "hud"])
+def test_features_match_rowwise_single_source(kind):
+    # One file's rows on their own, as a streamed chunk sees them (e.g. no acreage anywhere for HUD rows)
+    df = benchmark.make_synthetic_frame(2_000)
+    df = df[df["_source_file"] == kind].dropna(axis=1, how="all").reset_index(drop=True)
+    pd.testing.assert_frame_equal(pipeline.compute_recovery_features(df),
+                                  pipeline.compute_recovery_features_rowwise(df))
+
+
+def test_features_on_empty_frame():
+    df = benchmark.make_synthetic_frame(0)
+    fast = pipeline.compute_recovery_features(df)
+    slow = pipeline.compute_recovery_features_rowwise(df)
+    assert list(fast.columns) == list(slow.columns)
+    for column in ["_acreage", "_containment"]:
+        assert fast[column].dtype == slow[column].dtype == "float64"
+
+
+# STAGE 3: render_recovery_narratives vs generate_recovery_narrative, and eager vs streamed runs
+
+def test_narratives_match_rowwise():
+    df = pipeline.compute_recovery_features(benchmark.make_synthetic_frame(5_000))
+    fast = pipeline.render_recovery_narratives(df)
+    slow = df.apply(pipeline.generate_recovery_narrative, axis=1)
+    assert fast.astype(object).tolist() == slow.tolist()
+
+
+def test_streamed_narratives_match_eager(tmp_path, monkeypatch):
+    monkeypatch.setattr(pipeline, "DEMO_MAX_ROWS_PER_FILE", None)
+    monkeypatch.setattr(pipeline, "TIMELINE_MODEL_PATH", str(tmp_path / "no_model.npz"))
+
+    # One CSV per source, each with only its own columns, like the real exports
+    df = benchmark.make_synthetic_frame(3_000)
+    df["declarationTitle"] = np.where(df["_source_file"] == "fema", "Some Fire", None)
+    df["fmr_2br"] = np.where(df["_source_file"] == "hud", 1500.0, np.nan)
+    for kind, part in df.groupby("_source_file"):
+        part.drop(columns="_source_file").dropna(axis=1, how="all").to_csv(tmp_path / f"{kind}.csv", index=False)
+
+    eager = pipeline.compute_recovery_features(pipeline.load_all_csvs(str(tmp_path)))
+    eager["recovery_narrative"] = pipeline.render_recovery_narratives(eager)
+    streamed = pd.concat(pipeline.iter_recovery_chunks(str(tmp_path), chunksize=97), ignore_index=True)
+
+    assert len(streamed) == len(eager) == len(df)
+    for column in ["_source_file", "severity", "disruption", "recovery_narrative"]:
+        assert streamed[column].astype(object).tolist() == eager[column].astype(object).tolist(), column
+
+
+# WatchDuty-to-FEMA matching: match_watchduty_to_fema vs every (event, declaration) pair
+
+def make_fema_and_events(declarations: int, events: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    counties = np.array(["06037", "06059", "24005", "24510", "41039"])
+    day = pd.Timestamp("2020-01-01")
+
+    begin = day + pd.to_timedelta(rng.integers(0, 1500, declarations), unit="D")
+    end = begin + pd.to_timedelta(rng.integers(0, 90, declarations), unit="D")
+    declared = begin + pd.to_timedelta(rng.integers(0, 30, declarations), unit="D")
+    fema_df = pd.DataFrame({
+        "fema_declaration_id": [f"FM-{5000 + i}-XX" for i in range(declarations)],
+        "fema_disaster_number": np.arange(5000, 5000 + declarations, dtype="int32"),
+        "declaration_type": rng.choice(["DR", "EM", "FM"], declarations),
+        "fips": pd.Series(rng.choice(counties[:4], declarations), dtype=object),
+        "incident_begin_date": pd.Series(begin).mask(rng.random(declarations) < 0.1),
+        "incident_end_date": pd.Series(end).mask(rng.random(declarations) < 0.2),   # ongoing incidents
+        "declaration_date": pd.Series(declared).mask(rng.random(declarations) < 0.1),
+    })
+    fema_df.loc[rng.random(declarations) < 0.05, "fips"] = None
+
+    events_df = pd.DataFrame({
+        "geo_event_id": np.arange(events),
+        "name": [f"Fire {i}" for i in range(events)],
+        "fips": pd.Series(rng.choice(counties, events), dtype=object),   # 41039 has no declarations
+        "event_date": pd.Series(day + pd.to_timedelta(rng.integers(-60, 1700, events) * 3600 * 24
+                                                      + rng.integers(0, 86400, events), unit="s")),
+    })
+    events_df.loc[rng.random(events) < 0.05, "fips"] = None
+    events_df.loc[rng.random(events) < 0.05, "event_date"] = pd.NaT
+    return fema_df, events_df
+
+
+def brute_force_matches(events, fema_df):
+    window_start, window_end = fema_match_windows(fema_df)
+    pairs = set()
+    for event in events.itertuples():
+        for i, declaration in enumerate(fema_df.itertuples()):
+            if pd.isna(event.fips) or pd.isna(event.event_date) or pd.isna(window_start.iloc[i]):
+                continue
+            if declaration.fips != event.fips or event.event_date < window_start.iloc[i]:
+                continue
+            if pd.isna(window_end.iloc[i]) or event.event_date <= window_end.iloc[i]:
+                pairs.add((event.geo_event_id, declaration.fema_declaration_id))
+    return pairs
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_interval_join_matches_brute_force(seed):
+    fema_df, events = make_fema_and_events(60, 400, seed)
+    mapping = match_watchduty_to_fema(events, fema_df)
+
+    matched = mapping[mapping["match_status"] == "matched"]
+    pairs = set(zip(matched["geo_event_id"], matched["fema_declaration_id"]))
+    expected = brute_force_matches(events, fema_df)
+    assert pairs == expected
+    assert len(matched) == len(expected)
+
+    unmatched = mapping.loc[mapping["match_status"] == "no_fema_declaration", "geo_event_id"]
+    assert set(unmatched) == set(events["geo_event_id"]) - {event for event, _ in expected}
+    assert unmatched.is_unique
+
+
+# CountyIndex.lookup vs ray casting every ring of every county
+
+def star_polygon(rng, cx, cy, radius, vertices):
+    angles = np.sort(rng.uniform(0, 2 * np.pi, vertices))
+    radii = rng.uniform(0.5 * radius, radius, vertices)
+    return np.column_stack([cx + radii * np.cos(angles), cy + radii * np.sin(angles)])
+
+
+def make_counties(seed: int = 0):
+    # Star-shaped counties on a grid, so none overlap; some have a hole and some a second, detached part
+    rng = np.random.default_rng(seed)
+    fips, parts = [], []
+    for gx in range(6):
+        for gy in range(4):
+            county = len(fips)
+            fips.append(f"{gx + 1:02d}{gy + 1:03d}")
+            cx, cy = -120 + gx * 1.0, 35 + gy * 1.0
+            rings = [star_polygon(rng, cx, cy, 0.45, int(rng.integers(5, 40)))]
+            if rng.random() < 0.3:
+                rings.append(star_polygon(rng, cx, cy, 0.2, 6))
+            parts.append((county, rings))
+            if rng.random() < 0.2:
+                parts.append((county, [star_polygon(rng, cx + 0.4, cy + 0.4, 0.08, 5)]))
+    return fips, parts
+
+
+def ray_cast(x, y, ring):
+    inside = False
+    x0, y0 = ring[:, 0], ring[:, 1]
+    x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+    for ax, ay, bx, by in zip(x0, y0, x1, y1):
+        if (ay > y) != (by > y) and x < ax + (y - ay) * (bx - ax) / (by - ay):
+            inside = not inside
+    return inside
+
+
+def reference_lookup(fips, parts, lng, lat):
+    out = []
+    for x, y in zip(lng, lat):
+        hit = None
+        if np.isfinite(x) and np.isfinite(y):
+            for county, rings in parts:
+                if sum(ray_cast(x, y, ring) for ring in rings) % 2 == 1:
+                    hit = fips[county]
+                    break
+        out.append(hit)
+    return out
+
+
+@pytest.mark.parametrize("cell_size", [0.05, 0.1, 1.0])
+def test_county_index_matches_ray_cast(cell_size):
+    fips, parts = make_counties()
+    rng = np.random.default_rng(1)
+    lng = rng.uniform(-121, -114, 3_000)
+    lat = rng.uniform(34, 39.5, 3_000)
+    lng[:5] = np.nan   # missing coordinates
+    index = CountyIndex(fips, parts, cell_size=cell_size)
+    assert index.lookup(lng, lat, chunk_size=700).tolist() == reference_lookup(fips, parts, lng, lat)